@@ -0,0 +1,81 @@
+"""Per-worker cache of the active season, invalidated through change versions."""
+import threading
+import time
+
+from flask import current_app
+
+from events import SEASONS_CHANGED, publish
+from models import db, Season
+from versions import bump_version, get_version
+
+
+SEASONS_SCOPE = 'seasons'
+
+
+class _ActiveSeasonCache:
+    """The active season ID and the 'seasons' version it was read at."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entry = None
+
+    def get(self, ttl):
+        """Return the active season ID, re-checking the version after ttl seconds."""
+        with self._lock:
+            entry = self._entry
+        if entry is not None and time.monotonic() - entry['checked_at'] < ttl:
+            return entry['season_id']
+
+        version = get_version(SEASONS_SCOPE)
+        if entry is not None and entry['version'] == version:
+            season_id = entry['season_id']
+        else:
+            season_id = db.session.query(Season.id).filter_by(is_active=True).scalar()
+
+        with self._lock:
+            self._entry = {
+                'version': version,
+                'season_id': season_id,
+                'checked_at': time.monotonic()
+            }
+        return season_id
+
+    def clear(self):
+        """Forget the cached season."""
+        with self._lock:
+            self._entry = None
+
+
+_cache = _ActiveSeasonCache()
+
+
+def get_active_season_id(max_age=None):
+    """
+    Return the ID of the active season, or None if there is none.
+
+    The result is reused for ACTIVE_SEASON_CACHE_TTL seconds; after that the
+    'seasons' change version is read and the season is only looked up again
+    if another request (in any worker) changed seasons since.
+
+    Args:
+        max_age: Override the TTL; 0 always confirms the version, which
+            writes such as rolls should do
+
+    Returns:
+        Season ID or None
+    """
+    if max_age is None:
+        max_age = current_app.config.get('ACTIVE_SEASON_CACHE_TTL', 0)
+    return _cache.get(max_age)
+
+
+def seasons_changed():
+    """
+    Record a change to seasons in the current transaction.
+
+    Bumps the shared version so every worker re-reads the active season,
+    drops this worker's copy straight away, and tells /api/events clients.
+    """
+    bump_version(SEASONS_SCOPE)
+    publish(SEASONS_CHANGED)
+    _cache.clear()
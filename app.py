@@ -1,52 +1,181 @@
 """Main Flask application for Movie Night Web."""
+import base64
+import binascii
+import hmac
+import json
 import os
+from datetime import datetime
+from functools import wraps
 
-from flask import Flask, render_template, request, jsonify
+from flask import (
+    Flask, Response, abort, redirect, render_template, request, jsonify, send_file
+)
+from sqlalchemy import tuple_
+from sqlalchemy.orm import defer, joinedload
 
+from active_season import SEASONS_SCOPE, get_active_season_id, seasons_changed
+from background import run_in_background, run_periodically
+from conditional_get import conditional_get
+from idempotency import idempotent, run_scheduled_prune as run_scheduled_idempotency_prune
 from config import config
-from models import db, Season, Participant, Roll
+from events import ROLL_DELETED, ROLL_UPDATED, init_events, publish, stream_events
+from image_cache import (
+    ImageNotFoundError,
+    ImageUnavailableError,
+    get_cached_image,
+    get_image_cache_stats,
+    is_valid_image,
+    prune_image_cache,
+    run_scheduled_prune as run_scheduled_image_prune,
+    source_url
+)
+from json_provider import init_json_provider
+from metrics import init_metrics, render_metrics
+from request_profiling import (
+    REPORT_SORTS,
+    init_profiling,
+    list_profiles,
+    profile_file,
+    profile_report
+)
+from response_compression import init_compression
+from models import db, Season, Participant, Roll, ROLL_FIELDS
 from database import init_db
+from db_instrumentation import init_query_instrumentation, query_budget
+from enrichment import (
+    ENRICHMENT_DONE,
+    ENRICHMENT_PENDING,
+    get_backfill_status,
+    mark_enrichment_pending,
+    queue_enrichment,
+    run_scheduled_requeue,
+    start_backfill
+)
+from season_roster import roster_changed, season_roster_scope
 from roll_logic import (
     perform_roll,
     get_eligible_participants,
     get_season_roster,
     reset_season_roster
 )
+from sheet_cache import SheetsUnavailableError
 from sheets_integration import (
-    get_participants_from_sheet,
-    get_movies_by_participant
+    get_movies_by_participant,
+    get_sheet_cache_stats
+)
+from submissions import get_submission_snapshot, run_scheduled_sync, warm_season_tabs
+from tmdb_cache import get_tmdb_cache_stats, prune_tmdb_cache, run_scheduled_prune
+from tmdb_integration import get_tmdb_client_stats
+from versions import (
+    ROLLS_SCOPE,
+    SUBMISSIONS_SCOPE,
+    rolls_changed,
+    season_rolls_scope
 )
-from tmdb_integration import enrich_movie_data
 
 
 def create_app(config_name='default'):
     """Application factory pattern."""
     flask_app = Flask(__name__)
     flask_app.config.from_object(config[config_name])
+    # First, so that their after_request hooks run last
+    init_profiling(flask_app)
+    init_metrics(flask_app)
+    init_json_provider(flask_app)
 
     # Initialize database
     init_db(flask_app)
+    init_query_instrumentation(flask_app)
+    init_compression(flask_app)
+    init_events(flask_app)
+
+    if flask_app.config['BACKGROUND_TASKS']:
+        start_background_tasks(flask_app)
 
     return flask_app
 
 
+def start_background_tasks(flask_app):
+    """Start this worker's startup and periodic jobs."""
+    syncing = flask_app.config['SUBMISSION_SYNC_INTERVAL'] > 0
+    # Rolls read the synced rows, and the sync's batch read fills the Sheets
+    # cache anyway, so warming it as well would read every tab twice
+    skip_warmup = syncing and flask_app.config['SUBMISSIONS_SOURCE'] == 'database'
+    if flask_app.config['SHEETS_WARMUP'] in ('all', 'active') and not skip_warmup:
+        active_only = flask_app.config['SHEETS_WARMUP'] == 'active'
+        run_in_background(
+            flask_app, 'sheets-warmup', lambda: warm_season_tabs(active_only)
+        )
+
+    if syncing:
+        run_periodically(
+            flask_app, 'submission-sync',
+            flask_app.config['SUBMISSION_SYNC_INTERVAL'], run_scheduled_sync,
+            initial_delay=0
+        )
+
+    if flask_app.config['TMDB_API_KEY']:
+        run_periodically(
+            flask_app, 'enrichment-requeue',
+            flask_app.config['ENRICHMENT_RETRY_AFTER'], run_scheduled_requeue
+        )
+
+    if flask_app.config['TMDB_CACHE_PRUNE_INTERVAL'] > 0:
+        run_periodically(
+            flask_app, 'tmdb-cache-prune',
+            flask_app.config['TMDB_CACHE_PRUNE_INTERVAL'], run_scheduled_prune
+        )
+
+    if flask_app.config['IDEMPOTENCY_PRUNE_INTERVAL'] > 0:
+        run_periodically(
+            flask_app, 'idempotency-prune',
+            flask_app.config['IDEMPOTENCY_PRUNE_INTERVAL'], run_scheduled_idempotency_prune
+        )
+
+    if flask_app.config['IMAGE_CACHE_DIR'] and flask_app.config['IMAGE_CACHE_PRUNE_INTERVAL'] > 0:
+        run_periodically(
+            flask_app, 'image-cache-prune',
+            flask_app.config['IMAGE_CACHE_PRUNE_INTERVAL'], run_scheduled_image_prune
+        )
+
+
 app = create_app(os.getenv('FLASK_ENV', 'development'))
 
 
+def admin_required(view):
+    """
+    Require the X-Admin-Token header to match ADMIN_TOKEN.
+
+    Without an ADMIN_TOKEN the admin API is disabled and answers 503.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = app.config.get('ADMIN_TOKEN')
+        if not token:
+            return jsonify({'error': 'Admin API disabled, set ADMIN_TOKEN to enable it'}), 503
+        supplied = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return jsonify({'error': 'Admin token required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
 # ============================================================================
 # Web Routes (HTML Pages)
 # ============================================================================
 
 @app.route('/')
+@query_budget(3)
 def index():
     """Main page."""
     # Get the active season
-    season = Season.query.filter_by(is_active=True).first()
+    season_id = get_active_season_id()
     
     # Get the most recent roll for the active season
     latest_roll = None
-    if season:
-        latest_roll = Roll.query.filter_by(season_id=season.id)\
+    if season_id:
+        latest_roll = Roll.query.options(joinedload(Roll.participant))\
+            .filter_by(season_id=season_id)\
             .order_by(Roll.roll_date.desc())\
             .first()
     
@@ -65,11 +194,54 @@ def seasons_page():
     return render_template('seasons.html')
 
 
+# ============================================================================
+# Images
+# ============================================================================
+
+# Cached images never change under their URL, so browsers may keep them for a year
+IMAGE_MAX_AGE = 365 * 24 * 3600
+
+
+@app.route('/images/<size>/<filename>')
+def cached_image(size, filename):
+    """
+    Serve a TMDB poster or backdrop from the local image cache.
+
+    The first request for an image linked from a roll downloads it from
+    TMDB. Responses carry the content hash as ETag and may be cached
+    forever. Clients are redirected to TMDB instead when the image is not
+    cached and cannot be (TMDB is unreachable or nothing links to it), and
+    when a prune removes its file before it is sent.
+    """
+    path = f'/{filename}'
+    if not is_valid_image(size, path):
+        abort(404)
+    if not app.config['IMAGE_CACHE_DIR']:
+        return redirect(source_url(size, path))
+
+    try:
+        file_path, content_type, content_hash = get_cached_image(size, path)
+    except ImageNotFoundError:
+        abort(404)
+    except ImageUnavailableError:
+        return redirect(source_url(size, path))
+
+    try:
+        response = send_file(file_path, mimetype=content_type, etag=content_hash,
+                             max_age=IMAGE_MAX_AGE, conditional=True)
+    except FileNotFoundError:
+        return redirect(source_url(size, path))
+    response.cache_control.immutable = True
+    return response
+
+
 # ============================================================================
 # API Routes - Seasons
 # ============================================================================
 
 @app.route('/api/seasons', methods=['GET'])
+@conditional_get([SEASONS_SCOPE])
+@query_budget(1)
 def api_get_seasons():
     """Get all seasons."""
     all_seasons = Season.query.order_by(Season.created_at.desc()).all()
@@ -77,6 +249,7 @@ def api_get_seasons():
 
 
 @app.route('/api/seasons', methods=['POST'])
+@idempotent
 def api_create_season():
     """Create a new season."""
     data = request.json
@@ -91,12 +264,14 @@ def api_create_season():
         is_active=data.get('is_active', True)
     )
     db.session.add(season)
+    seasons_changed()
     db.session.commit()
 
     return jsonify(season.to_dict()), 201
 
 
 @app.route('/api/seasons/<int:season_id>', methods=['GET'])
+@conditional_get([SEASONS_SCOPE])
 def api_get_season(season_id):
     """Get a specific season."""
     season = Season.query.get_or_404(season_id)
@@ -119,15 +294,18 @@ def api_update_season(season_id):
             Season.query.filter(Season.id != season_id).update({'is_active': False})
         season.is_active = data['is_active']
 
+    seasons_changed()
     db.session.commit()
     return jsonify(season.to_dict())
 
 
 @app.route('/api/seasons/<int:season_id>/roster', methods=['GET'])
+@conditional_get(lambda season_id: [season_roster_scope(season_id)])
+@query_budget(2)
 def api_get_season_roster(season_id):
     """Get the roster for a season."""
     roster = get_season_roster(season_id)
-    return jsonify({'roster': roster})
+    return jsonify({'roster': roster, 'count': len(roster)})
 
 
 @app.route('/api/seasons/<int:season_id>/roster', methods=['DELETE'])
@@ -152,7 +330,7 @@ def api_get_participants():
 
 @app.route('/api/participants/sheet', methods=['GET'])
 def api_get_participants_from_sheet():
-    """Get participants from Google Sheets."""
+    """Get participants from the synced submissions (or Google Sheets)."""
     season_id = request.args.get('season_id', type=int)
 
     if season_id:
@@ -161,7 +339,7 @@ def api_get_participants_from_sheet():
     else:
         tab = 'General'
 
-    participants = get_participants_from_sheet(tab)
+    participants = list(get_submission_snapshot(tab).participants)
     return jsonify({'participants': participants})
 
 
@@ -177,7 +355,7 @@ def api_get_participant_movies(participant_id):
     else:
         tab = 'General'
 
-    movies = get_movies_by_participant(participant.name, tab)
+    movies = get_movies_by_participant(participant.name, get_submission_snapshot(tab))
     return jsonify({'movies': movies})
 
 
@@ -185,20 +363,101 @@ def api_get_participant_movies(participant_id):
 # API Routes - Rolls
 # ============================================================================
 
+ROLLS_PAGE_SIZE = 50
+ROLLS_MAX_PAGE_SIZE = 200
+
+
+def _encode_roll_cursor(roll):
+    """Opaque cursor pointing just past roll in (roll_date, id) order."""
+    raw = json.dumps([roll.roll_date.isoformat(), roll.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_roll_cursor(cursor):
+    """Decode a cursor from _encode_roll_cursor, or return None if invalid."""
+    try:
+        roll_date, roll_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(roll_date), int(roll_id)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def _requested_roll_fields():
+    """
+    Parse the fields query parameter.
+
+    Returns:
+        Tuple of (set of fields or None for all, error response or None)
+    """
+    if not request.args.get('fields'):
+        return None, None
+    fields = {f.strip() for f in request.args['fields'].split(',') if f.strip()}
+    unknown = fields - ROLL_FIELDS
+    if unknown:
+        return None, (jsonify({'error': f"Unknown fields: {', '.join(sorted(unknown))}"}), 400)
+    return fields, None
+
+
+def _roll_query(fields):
+    """Roll query loading only what to_dict(fields) reads."""
+    query = Roll.query
+    if fields is None or 'participant_name' in fields:
+        query = query.options(joinedload(Roll.participant))
+    for column in ('tmdb_data', 'notes'):
+        if fields is not None and column not in fields:
+            query = query.options(defer(getattr(Roll, column)))
+    return query
+
+
+def _roll_list_scopes():
+    """Version scopes of GET /api/rolls: one season's rolls, or all rolls."""
+    season_id = request.args.get('season_id', type=int)
+    return [season_rolls_scope(season_id) if season_id else ROLLS_SCOPE]
+
+
 @app.route('/api/rolls', methods=['GET'])
+@conditional_get(_roll_list_scopes)
+@query_budget(1)
 def api_get_rolls():
-    """Get all rolls, optionally filtered by season."""
+    """
+    Get a page of rolls, newest first, optionally filtered by season.
+
+    Query parameters:
+        season_id: Only rolls from this season
+        limit: Page size (default 50, max 200)
+        cursor: next_cursor from the previous page
+        fields: Comma-separated subset of roll fields to return
+    """
     season_id = request.args.get('season_id', type=int)
+    limit = min(max(request.args.get('limit', ROLLS_PAGE_SIZE, type=int), 1),
+                ROLLS_MAX_PAGE_SIZE)
 
-    query = Roll.query
+    fields, error = _requested_roll_fields()
+    if error:
+        return error
+
+    query = _roll_query(fields)
     if season_id:
         query = query.filter_by(season_id=season_id)
 
-    rolls = query.order_by(Roll.roll_date.desc()).all()
-    return jsonify([r.to_dict() for r in rolls])
+    if request.args.get('cursor'):
+        position = _decode_roll_cursor(request.args['cursor'])
+        if position is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(tuple_(Roll.roll_date, Roll.id) < position)
+
+    rolls = query.order_by(Roll.roll_date.desc(), Roll.id.desc()).limit(limit + 1).all()
+    page = rolls[:limit]
+
+    return jsonify({
+        'rolls': [r.to_dict(fields) for r in page],
+        'next_cursor': _encode_roll_cursor(page[-1]) if len(rolls) > limit else None
+    })
 
 
 @app.route('/api/rolls', methods=['POST'])
+@idempotent
+@query_budget(14)
 def api_perform_roll():
     """Perform a new roll."""
     data = request.json
@@ -206,14 +465,15 @@ def api_perform_roll():
     custom_participants = data.get('participants')
 
     if not season_id:
-        # Get active season
-        season = Season.query.filter_by(is_active=True).first()
-        if not season:
+        # Get active season, confirming it has not changed in another worker
+        season_id = get_active_season_id(max_age=0)
+        if not season_id:
             return jsonify({'error': 'No active season found'}), 400
-        season_id = season.id
 
     result = perform_roll(season_id, custom_participants)
 
+    if result.pop('conflict', False):
+        return jsonify(result), 409
     if 'error' in result:
         return jsonify(result), 400
 
@@ -221,10 +481,21 @@ def api_perform_roll():
 
 
 @app.route('/api/rolls/<int:roll_id>', methods=['GET'])
+@conditional_get([ROLLS_SCOPE])
+@query_budget(1)
 def api_get_roll(roll_id):
-    """Get a specific roll."""
-    roll = Roll.query.get_or_404(roll_id)
-    return jsonify(roll.to_dict())
+    """
+    Get a specific roll.
+
+    Query parameters:
+        fields: Comma-separated subset of roll fields to return, e.g.
+            enrichment_status,tmdb_data when polling for enrichment
+    """
+    fields, error = _requested_roll_fields()
+    if error:
+        return error
+    roll = _roll_query(fields).filter_by(id=roll_id).first_or_404()
+    return jsonify(roll.to_dict(fields))
 
 
 @app.route('/api/rolls/<int:roll_id>', methods=['PUT'])
@@ -235,29 +506,61 @@ def api_update_roll(roll_id):
 
     if 'notes' in data:
         roll.notes = data['notes']
-    if 'tmdb_id' in data:
+
+    # A corrected TMDB ID without accompanying data is fetched directly
+    refetch = False
+    if 'tmdb_id' in data and data['tmdb_id'] != roll.tmdb_id:
         roll.tmdb_id = data['tmdb_id']
+        if 'tmdb_data' not in data:
+            roll.tmdb_data = None
+            refetch = bool(roll.tmdb_id) and mark_enrichment_pending(roll)
     if 'tmdb_data' in data:
         roll.tmdb_data = data['tmdb_data']
+        if data['tmdb_data']:
+            roll.enrichment_status = ENRICHMENT_DONE
+            roll.enrichment_updated_at = datetime.utcnow()
 
+    rolls_changed(roll.season_id)
+    publish(ROLL_UPDATED, roll_id=roll.id, season_id=roll.season_id)
     db.session.commit()
+    if refetch:
+        queue_enrichment(roll.id)
     return jsonify(roll.to_dict())
 
 
 @app.route('/api/rolls/<int:roll_id>/enrich', methods=['POST'])
 def api_enrich_roll(roll_id):
-    """Enrich a roll with TMDB data."""
+    """
+    Enrich a roll with TMDB data in the background.
+
+    Returns 202 with the enrichment status to poll on GET /api/rolls/<id>
+    while enrichment is pending, and the roll once it has finished, either
+    way (its enrichment_status is then 'done' or 'failed'). Failed
+    enrichments are retried; pending ones are not queued twice.
+    """
     roll = Roll.query.get_or_404(roll_id)
 
-    tmdb_data = enrich_movie_data(roll.movie_title)
+    if roll.enrichment_status == ENRICHMENT_DONE:
+        return jsonify(roll.to_dict())
 
-    if tmdb_data:
-        roll.tmdb_id = tmdb_data.get('tmdb_id')
-        roll.tmdb_data = tmdb_data
+    if roll.enrichment_status != ENRICHMENT_PENDING:
+        if not mark_enrichment_pending(roll):
+            return jsonify({'error': 'TMDB API key not configured'}), 503
+        rolls_changed(roll.season_id)
+        publish(ROLL_UPDATED, roll_id=roll.id, season_id=roll.season_id)
         db.session.commit()
+    queue_enrichment(roll.id)
+
+    # Enrichment may already have finished, or failed (it runs inline when
+    # ENRICHMENT_WORKERS is 0); only a pending one is worth polling
+    db.session.refresh(roll)
+    if roll.enrichment_status != ENRICHMENT_PENDING:
         return jsonify(roll.to_dict())
 
-    return jsonify({'error': 'Could not fetch TMDB data'}), 404
+    return jsonify({
+        'roll_id': roll.id,
+        'enrichment_status': roll.enrichment_status
+    }), 202, {'Location': f'/api/rolls/{roll.id}'}
 
 
 @app.route('/api/rolls/<int:roll_id>', methods=['DELETE'])
@@ -265,33 +568,224 @@ def api_delete_roll(roll_id):
     """Delete a roll."""
     roll = Roll.query.get_or_404(roll_id)
     db.session.delete(roll)
+    rolls_changed(roll.season_id)
+    roster_changed(roll.season_id)
+    publish(ROLL_DELETED, roll_id=roll.id, season_id=roll.season_id)
     db.session.commit()
     return jsonify({'message': 'Roll deleted successfully'})
 
 
+# ============================================================================
+# API Routes - Live Events
+# ============================================================================
+
+@app.route('/api/events', methods=['GET'])
+def api_events():
+    """
+    Stream roll and season changes as Server-Sent Events.
+
+    Events: roll_created, roll_updated and roll_enriched (data: the roll),
+    roll_deleted (roll_id, season_id), roster_reset (season_id),
+    seasons_changed, and resync when events may have been missed.
+    """
+    stream = stream_events()
+    if stream is None:
+        return jsonify({'error': 'Too many live event clients, try again later'}), 503, {
+            'Retry-After': '30'
+        }
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop nginx-style proxies from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+
+
 # ============================================================================
 # API Routes - Utilities
 # ============================================================================
 
+def _eligible_scopes():
+    """
+    Version scopes of GET /api/eligible, or None when submissions are read
+    from Google Sheets, which has no change version. Responses for a tab
+    never synced also come from Sheets and are left untagged (see
+    get_submission_snapshot).
+    """
+    if app.config.get('SUBMISSIONS_SOURCE') != 'database':
+        return None
+    season_id = request.args.get('season_id', type=int) or get_active_season_id()
+    if not season_id:
+        return None
+    return [SEASONS_SCOPE, season_roster_scope(season_id), SUBMISSIONS_SCOPE]
+
+
 @app.route('/api/eligible', methods=['GET'])
+@conditional_get(_eligible_scopes)
+@query_budget(5)
 def api_get_eligible():
     """Get eligible participants for rolling."""
     season_id = request.args.get('season_id', type=int)
 
     if not season_id:
-        season = Season.query.filter_by(is_active=True).first()
-        if not season:
+        season_id = get_active_season_id()
+        if not season_id:
             return jsonify({'error': 'No active season found'}), 400
-        season_id = season.id
 
     eligible = get_eligible_participants(season_id)
     return jsonify({'eligible': eligible, 'count': len(eligible)})
 
 
+@app.route('/api/cache/sheets', methods=['GET'])
+def api_get_sheet_cache_stats():
+    """Get Google Sheets cache hit/miss counters and entry ages."""
+    stats = get_sheet_cache_stats()
+    stats['ttl'] = app.config['SHEETS_CACHE_TTL']
+    stats['stale_ttl'] = app.config['SHEETS_CACHE_STALE_TTL']
+    return jsonify(stats)
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics of every worker."""
+    body, content_type = render_metrics()
+    if body is None:
+        abort(404)
+    return Response(body, content_type=content_type)
+
+
+# ============================================================================
+# API Routes - Admin
+# ============================================================================
+
+@app.route('/api/admin/sheets/warm', methods=['POST'])
+@admin_required
+def api_warm_sheets():
+    """Load every season tab (or only the active one) into the Sheets cache."""
+    data = request.get_json(silent=True) or {}
+    result = warm_season_tabs(active_only=data.get('scope') == 'active')
+    return jsonify(result)
+
+
+@app.route('/api/admin/tmdb-backfill', methods=['GET'])
+@admin_required
+def api_get_tmdb_backfill():
+    """Get this worker's backfill progress and the rolls still without TMDB data."""
+    return jsonify(get_backfill_status())
+
+
+@app.route('/api/admin/tmdb-backfill', methods=['POST'])
+@admin_required
+def api_start_tmdb_backfill():
+    """
+    Enrich every roll without TMDB data in the background.
+
+    JSON body (all optional): batch_size, concurrency, after_id, limit,
+    retry_failed. Poll GET /api/admin/tmdb-backfill for progress.
+    """
+    data = request.get_json(silent=True) or {}
+    options = {}
+    for name, default, minimum in (('batch_size', 100, 1), ('concurrency', 4, 1),
+                                   ('after_id', 0, 0), ('limit', None, 1)):
+        value = data.get(name, default)
+        if value is not None and (not isinstance(value, int) or value < minimum):
+            return jsonify({'error': f'{name} must be an integer of at least {minimum}'}), 400
+        options[name] = value
+    options['retry_failed'] = bool(data.get('retry_failed', False))
+
+    if not app.config['TMDB_API_KEY']:
+        return jsonify({'error': 'TMDB API key not configured'}), 503
+    if not start_backfill(**options):
+        return jsonify({'error': 'A backfill is already running'}), 409
+    return jsonify(get_backfill_status()), 202, {'Location': '/api/admin/tmdb-backfill'}
+
+
+@app.route('/api/admin/tmdb-cache', methods=['GET'])
+@admin_required
+def api_get_tmdb_cache_stats():
+    """Get TMDB cache hit rate and size."""
+    return jsonify(get_tmdb_cache_stats())
+
+
+@app.route('/api/admin/tmdb-client', methods=['GET'])
+@admin_required
+def api_get_tmdb_client_stats():
+    """Get this worker's TMDB request, retry and latency counters per endpoint."""
+    return jsonify(get_tmdb_client_stats())
+
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def api_list_profiles():
+    """List stored request profiles, newest first."""
+    return jsonify(list_profiles())
+
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def api_get_profile(profile_id):
+    """
+    Download a request profile, for pstats or snakeviz.
+
+    Query parameters:
+        format: 'text' for a pstats report instead of the binary profile
+        sort: Order of the report: cumulative (default), tottime or calls
+    """
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in REPORT_SORTS:
+            return jsonify({'error': f"sort must be one of {', '.join(sorted(REPORT_SORTS))}"}), 400
+        report = profile_report(profile_id, sort)
+        if report is None:
+            abort(404)
+        return Response(report, mimetype='text/plain')
+
+    path = profile_file(profile_id)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{profile_id}.prof')
+
+
+@app.route('/api/admin/image-cache', methods=['GET'])
+@admin_required
+def api_get_image_cache_stats():
+    """Get image cache hit rate and size on disk."""
+    return jsonify(get_image_cache_stats())
+
+
+@app.route('/api/admin/image-cache/prune', methods=['POST'])
+@admin_required
+def api_prune_image_cache():
+    """Evict least recently used images until the cache fits in IMAGE_CACHE_MAX_MB."""
+    data = request.get_json(silent=True) or {}
+    max_mb = data.get('max_mb')
+    if max_mb is not None and (not isinstance(max_mb, int) or max_mb < 0):
+        return jsonify({'error': 'max_mb must be a non-negative integer'}), 400
+    return jsonify(prune_image_cache(None if max_mb is None else max_mb * 1024 * 1024))
+
+
+@app.route('/api/admin/tmdb-cache/prune', methods=['POST'])
+@admin_required
+def api_prune_tmdb_cache():
+    """Delete expired and least recently used TMDB cache entries."""
+    data = request.get_json(silent=True) or {}
+    max_entries = data.get('max_entries')
+    if max_entries is not None and (not isinstance(max_entries, int) or max_entries < 0):
+        return jsonify({'error': 'max_entries must be a non-negative integer'}), 400
+    return jsonify(prune_tmdb_cache(max_entries))
+
+
 # ============================================================================
 # Error Handlers
 # ============================================================================
 
+@app.errorhandler(SheetsUnavailableError)
+def sheets_unavailable(_error):
+    """Handle Google Sheets outages with no cached copy to fall back on."""
+    db.session.rollback()
+    return jsonify({'error': 'Google Sheets is currently unavailable'}), 503
+
+
 @app.errorhandler(404)
 def not_found(_error):
     """Handle 404 errors."""
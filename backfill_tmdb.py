@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Enrich every roll that has no TMDB data yet."""
+
+import argparse
+import os
+import sys
+
+# Scripts share the web app's setup but must not start its background threads
+os.environ.setdefault('BACKGROUND_TASKS', 'false')
+
+# pylint: disable=wrong-import-position
+from app import app
+from enrichment import run_backfill
+
+
+def print_progress(report):
+    """Print one line per committed batch."""
+    rate = report['processed'] / report['elapsed_s'] if report['elapsed_s'] else 0
+    print(f"✓ {report['processed']} rolls ({report['enriched']} enriched, "
+          f"{report['failed']} failed, {report['skipped']} changed meanwhile), "
+          f"up to id {report['last_id']}, "
+          f"{rate:.1f} rolls/s")
+
+
+def main():
+    """Main backfill function."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Rolls per batch and transaction (default 100)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='TMDB lookups in flight at once (default 4)')
+    parser.add_argument('--after-id', type=int, default=0,
+                        help='Resume after this roll id (see the last progress line)')
+    parser.add_argument('--limit', type=int, help='Stop after this many rolls')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='Also retry rolls whose enrichment failed before')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if not app.config['TMDB_API_KEY']:
+            print("✗ TMDB_API_KEY is not configured")
+            sys.exit(1)
+
+        report = run_backfill(
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            after_id=args.after_id,
+            limit=args.limit,
+            retry_failed=args.retry_failed,
+            progress=print_progress
+        )
+
+    if report is None:
+        print("Another process is already backfilling.")
+        return
+
+    print(f"\n🎉 Backfill complete: {report['enriched']} of {report['processed']} rolls "
+          f"enriched from {report['titles']} titles in {report['elapsed_s']} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Helpers for running periodic jobs inside a worker process."""
+import threading
+import time
+import traceback
+
+
+def run_periodically(app, name, interval, func, initial_delay=None):
+    """
+    Call func every interval seconds on a daemon thread.
+
+    Each call runs inside an app context. Exceptions are printed and do not
+    stop the schedule.
+
+    Args:
+        app: Flask application
+        name: Thread name, used in error output
+        interval: Seconds between calls
+        func: Callable taking no arguments
+        initial_delay: Seconds to wait before the first call (defaults to interval)
+
+    Returns:
+        The started thread
+    """
+    def loop():
+        time.sleep(interval if initial_delay is None else initial_delay)
+        while True:
+            with app.app_context():
+                try:
+                    func()
+                except Exception:  # pylint: disable=broad-exception-caught
+                    print(f"Error in background task {name}:")
+                    traceback.print_exc()
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def run_in_background(app, name, func):
+    """
+    Call func once on a daemon thread inside an app context.
+
+    Args:
+        app: Flask application
+        name: Thread name, used in error output
+        func: Callable taking no arguments
+
+    Returns:
+        The started thread
+    """
+    def run():
+        with app.app_context():
+            try:
+                func()
+            except Exception:  # pylint: disable=broad-exception-caught
+                print(f"Error in background task {name}:")
+                traceback.print_exc()
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
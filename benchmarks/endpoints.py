@@ -0,0 +1,475 @@
+"""
+Drive every route in app.py concurrently against local Sheets and TMDB stand-ins.
+
+Seeds a scratch database with --participants submitters, a tab of
+--submissions movies (synced into the submissions mirror) and --rolls
+rolls, nine in ten of them enriched, spread over past seasons and a
+half-rolled active season. The app is pointed at stand-in Sheets and TMDB
+servers answering after --sheets-latency and --tmdb-latency seconds.
+Enrichment runs inline, so enrich requests include their TMDB time. Every
+endpoint then gets --requests requests from --concurrency threads: reads
+first, then writes, then the destructive ones.
+
+The JSON report lists, per endpoint: p50/p95/p99 latency, throughput,
+status codes and SQL statements per request (X-Query-Count). It also
+records the commit the run was made at. With --compare, a report saved
+earlier with --output is diffed against this run, so performance changes
+can be compared between commits. Exits non-zero if an endpoint answered
+with an unexpected status, or before running if a route in app.py has no
+scenario.
+
+Usage:
+    python -m benchmarks.endpoints [--database-url URL] [--concurrency 8]
+        [--requests 200] [--only /api/rolls] [--output report.json]
+        [--compare baseline.json]
+
+Without --database-url a temporary SQLite database is used. A Postgres URL
+must point at a scratch database: every table except schema_migrations is
+emptied first.
+"""
+import argparse
+import base64
+import contextlib
+import json
+import math
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ACCEPT_ENCODING = 'gzip, deflate, br'
+# Sent with every request, so the admin endpoints are benchmarked too
+ADMIN_TOKEN = 'benchmark'
+TAB = 'General'
+# Fields the history page asks for
+LIST_FIELDS = 'id,movie_title,participant_name,roll_date,tmdb_id'
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 2)[1])
+    parser.add_argument('--database-url')
+    parser.add_argument('--participants', type=int, default=50)
+    parser.add_argument('--submissions', type=int, default=5000)
+    parser.add_argument('--rolls', type=int, default=20000)
+    parser.add_argument('--sheets-latency', type=float, default=0.2)
+    parser.add_argument('--tmdb-latency', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Requests per endpoint')
+    parser.add_argument('--only', action='append', default=[],
+                        help='Only endpoints whose name contains this (repeatable)')
+    parser.add_argument('--output', help='Also write the report to this file')
+    parser.add_argument('--compare', help='Report from an earlier run to diff against')
+    return parser.parse_args()
+
+
+class Scenario:  # pylint: disable=too-few-public-methods
+    """
+    Requests to one endpoint.
+
+    ``path`` and ``body`` take the request number, so consecutive requests
+    can address different rows. ``stream`` responses are timed to their
+    first chunk and then closed.
+    """
+
+    def __init__(self, name, path, *, method='GET', body=None, expected=(200,),
+                 stream=False):
+        self.name = name
+        self.method = method
+        self.path = path if callable(path) else lambda _i: path
+        self.body = body
+        self.expected = frozenset(expected)
+        self.stream = stream
+
+
+def _tmdb_data(i):
+    """An enrichment payload shaped like the ones stored on rolls."""
+    return {
+        'tmdb_id': i,
+        'title': f'Movie {i:05d}',
+        'overview': f'Overview of movie {i}. ' * 10,
+        'release_date': f'{1950 + i % 75}-01-01',
+        'poster_url': f'/images/w500/poster{i}.jpg',
+        'poster_thumb_url': f'/images/w342/poster{i}.jpg',
+        'backdrop_url': f'/images/w1280/backdrop{i}.jpg',
+        'vote_average': 7.0,
+        'runtime': 100,
+        'genres': ['Drama'],
+    }
+
+
+def _empty_tables(db, models):
+    """Delete every row except the record of applied migrations."""
+    for table in reversed(db.metadata.sorted_tables):
+        if table.name != models.SchemaMigration.__tablename__:
+            db.session.execute(table.delete())
+    db.session.commit()
+
+
+def _seed(db, models, rows, args):
+    """
+    Insert participants, seasons and rolls, and sync the submissions tab.
+
+    Returns:
+        Dictionary of the IDs the scenarios address
+    """
+    # pylint: disable=import-outside-toplevel
+    from submissions import sync_all_submissions
+
+    _empty_tables(db, models)
+    start = datetime(2015, 1, 1)
+    participants = args.participants
+    active_rolls = min(participants // 2, args.rolls)
+    past_seasons = math.ceil((args.rolls - active_rolls) / participants)
+    # Fresh seasons for POST /api/rolls, each with room for every participant
+    roll_seasons = math.ceil(args.requests / participants)
+
+    db.session.execute(db.insert(models.Participant), [
+        {'name': f'Participant {i:03d}', 'created_at': start} for i in range(participants)
+    ])
+    db.session.execute(db.insert(models.Season), [
+        {'name': f'Season {i}', 'spreadsheet_tab': TAB, 'is_active': i == past_seasons,
+         'start_date': start + timedelta(days=30 * i),
+         'created_at': start + timedelta(days=30 * i)}
+        for i in range(past_seasons + 1)
+    ] + [
+        {'name': f'Benchmark rolls {i}', 'spreadsheet_tab': TAB, 'is_active': False,
+         'created_at': start}
+        for i in range(roll_seasons)
+    ])
+    participant_ids = [i for (i,) in db.session.query(models.Participant.id)
+                       .order_by(models.Participant.id)]
+    season_ids = [i for (i,) in db.session.query(models.Season.id).order_by(models.Season.id)]
+
+    roll_rows = []
+    for i in range(args.rolls):
+        # Past seasons are filled up in order, the rest goes to the active one
+        season = min(i // participants, past_seasons)
+        movie_title = rows[1 + i % (len(rows) - 1)][0]
+        enriched = i % 10 != 0
+        tmdb_id = int(movie_title[6:11]) + 1 if enriched else None
+        roll_date = start + timedelta(hours=i)
+        roll_rows.append({
+            'season_id': season_ids[season],
+            'participant_id': participant_ids[i % participants],
+            'movie_title': movie_title,
+            'roll_date': roll_date,
+            'created_at': roll_date,
+            'tmdb_id': tmdb_id,
+            'tmdb_data': _tmdb_data(tmdb_id) if enriched else None,
+            'enrichment_status': 'done' if enriched else None,
+            'enrichment_updated_at': roll_date if enriched else None,
+        })
+    db.session.execute(db.insert(models.Roll), roll_rows)
+    db.session.commit()
+    sync_all_submissions()
+
+    roll_ids = [i for (i,) in db.session.query(models.Roll.id).order_by(models.Roll.id)]
+    middle = db.session.query(models.Roll.roll_date, models.Roll.id)\
+        .order_by(models.Roll.id).offset(len(roll_ids) // 2).first()
+    return {
+        'participant_ids': participant_ids,
+        'past_season_ids': season_ids[:past_seasons] or season_ids[:1],
+        'active_season_id': season_ids[past_seasons],
+        'roll_season_ids': season_ids[past_seasons + 1:],
+        'roll_ids': roll_ids,
+        'unenriched_roll_ids': roll_ids[::10],
+        'enriched_roll_ids': [roll_id for i, roll_id in enumerate(roll_ids) if i % 10],
+        # Posters linked from enriched rolls, the only ones /images downloads
+        'poster_ids': sorted({row['tmdb_id'] for row in roll_rows if row['tmdb_data']})[:50],
+        # Halfway down the history, as reached by scrolling
+        'cursor': base64.urlsafe_b64encode(
+            json.dumps([middle[0].isoformat(), middle[1]]).encode()
+        ).decode() if middle else '',
+    }
+
+
+def _scenarios(ids, args):
+    """Every endpoint in the order it is benchmarked."""
+    def cycle(values):
+        return lambda i: values[i % len(values)]
+
+    past, active = ids['past_season_ids'], ids['active_season_id']
+    participant, roll = cycle(ids['participant_ids']), cycle(ids['roll_ids'])
+    enriched = ids['enriched_roll_ids']
+    # Enriched rolls from the end of the list are edited, from the start deleted
+    updated = cycle(enriched[len(enriched) // 2:])
+    deleted = cycle(enriched[:len(enriched) // 2])
+    roll_seasons = ids['roll_season_ids']
+    posters = ids['poster_ids']
+
+    return [
+        # Pages
+        Scenario('GET /', '/'),
+        Scenario('GET /history', '/history'),
+        Scenario('GET /seasons', '/seasons'),
+        Scenario('GET /images/<size>/<filename>',
+                 lambda i: f'/images/w500/poster{posters[i % len(posters)]}.jpg'),
+        # Reads
+        Scenario('GET /api/seasons', '/api/seasons'),
+        Scenario('GET /api/seasons/<id>', f'/api/seasons/{active}'),
+        Scenario('GET /api/seasons/<id>/roster',
+                 lambda i: f'/api/seasons/{past[i % len(past)]}/roster'),
+        Scenario('GET /api/participants', '/api/participants'),
+        Scenario('GET /api/participants/sheet', f'/api/participants/sheet?season_id={active}'),
+        Scenario('GET /api/participants/<id>/movies',
+                 lambda i: f'/api/participants/{participant(i)}/movies?season_id={active}'),
+        Scenario('GET /api/rolls', '/api/rolls'),
+        Scenario('GET /api/rolls?fields', f'/api/rolls?fields={LIST_FIELDS}'),
+        Scenario('GET /api/rolls?season_id',
+                 lambda i: f'/api/rolls?fields={LIST_FIELDS}&season_id={past[i % len(past)]}'),
+        Scenario('GET /api/rolls?cursor',
+                 f"/api/rolls?fields={LIST_FIELDS}&cursor={ids['cursor']}"),
+        Scenario('GET /api/rolls/<id>', lambda i: f'/api/rolls/{roll(i)}'),
+        Scenario('GET /api/eligible', '/api/eligible'),
+        Scenario('GET /api/events', '/api/events', stream=True),
+        Scenario('GET /api/cache/sheets', '/api/cache/sheets'),
+        Scenario('GET /api/admin/tmdb-backfill', '/api/admin/tmdb-backfill'),
+        Scenario('GET /api/admin/tmdb-cache', '/api/admin/tmdb-cache'),
+        Scenario('GET /api/admin/tmdb-client', '/api/admin/tmdb-client'),
+        Scenario('GET /api/admin/image-cache', '/api/admin/image-cache'),
+        Scenario('GET /api/admin/profiles', '/api/admin/profiles'),
+        Scenario('GET /api/admin/profiles/<id>', f"/api/admin/profiles/{ids['profile_id']}"),
+        Scenario('GET /metrics', '/metrics'),
+        # Writes
+        Scenario('POST /api/admin/sheets/warm', '/api/admin/sheets/warm',
+                 method='POST', body=lambda i: {}),
+        Scenario('POST /api/seasons', '/api/seasons', method='POST', expected=(201,),
+                 body=lambda i: {'name': f'Benchmark season {i}', 'spreadsheet_tab': TAB,
+                                 'is_active': False}),
+        Scenario('PUT /api/seasons/<id>', lambda i: f'/api/seasons/{past[i % len(past)]}',
+                 method='PUT', body=lambda i: {'name': f'Season renamed {i}'}),
+        # Spread so that no season runs out of eligible participants
+        Scenario('POST /api/rolls', '/api/rolls', method='POST', expected=(201, 409),
+                 body=lambda i: {'season_id': roll_seasons[i % len(roll_seasons)]}),
+        Scenario('PUT /api/rolls/<id>', lambda i: f'/api/rolls/{updated(i)}', method='PUT',
+                 body=lambda i: {'notes': f'Benchmark note {i}'}),
+        Scenario('POST /api/rolls/<id>/enrich',
+                 lambda i: f"/api/rolls/{cycle(ids['unenriched_roll_ids'])(i)}/enrich",
+                 method='POST', expected=(200, 202)),
+        Scenario('POST /api/admin/image-cache/prune', '/api/admin/image-cache/prune',
+                 method='POST'),
+        Scenario('POST /api/admin/tmdb-cache/prune', '/api/admin/tmdb-cache/prune',
+                 method='POST'),
+        # Destructive
+        Scenario('DELETE /api/rolls/<id>', lambda i: f'/api/rolls/{deleted(i)}',
+                 method='DELETE', expected=(200,) if args.requests <= len(enriched) // 2
+                 else (200, 404)),
+        Scenario('DELETE /api/seasons/<id>/roster',
+                 lambda i: f'/api/seasons/{past[i % len(past)]}/roster', method='DELETE'),
+        # Last, as it keeps enriching in the background
+        Scenario('POST /api/admin/tmdb-backfill', '/api/admin/tmdb-backfill', method='POST',
+                 expected=(202, 409), body=lambda i: {'limit': 10}),
+    ]
+
+
+def _route_key(method, path):
+    """'GET /api/rolls/<id>' for a method and a route or scenario path."""
+    path = re.sub(r'<[^>]*>', '<>', path.split('?', 1)[0])
+    return f'{method} {path}'
+
+
+def _uncovered_routes(app, scenarios):
+    """Routes of the app (Flask's static files aside) no scenario requests."""
+    covered = {_route_key(*scenario.name.split(' ', 1)) for scenario in scenarios}
+    return sorted(
+        key
+        for rule in app.url_map.iter_rules() if rule.endpoint != 'static'
+        for key in (_route_key(method, rule.rule)
+                    for method in rule.methods - {'HEAD', 'OPTIONS'})
+        if key not in covered
+    )
+
+
+def _profile_id(app):
+    """Profile one request, giving GET /api/admin/profiles/<id> something to serve."""
+    response = app.test_client().get(
+        '/api/seasons', headers={'X-Profile': '1', 'X-Admin-Token': ADMIN_TOKEN}
+    )
+    return response.headers['X-Profile-Id']
+
+
+def _request(app, scenario, i):
+    """Send one request; returns (milliseconds, status, SQL statements or None)."""
+    client = app.test_client()
+    kwargs = {'method': scenario.method,
+              'headers': {'Accept-Encoding': ACCEPT_ENCODING, 'X-Admin-Token': ADMIN_TOKEN}}
+    if scenario.body is not None:
+        kwargs['json'] = scenario.body(i)
+
+    start = time.perf_counter()
+    if scenario.stream:
+        response = client.open(scenario.path(i), buffered=False, **kwargs)
+        next(iter(response.response), None)
+        elapsed = time.perf_counter() - start
+        response.close()
+    else:
+        response = client.open(scenario.path(i), **kwargs)
+        response.get_data()
+        elapsed = time.perf_counter() - start
+
+    statements = response.headers.get('X-Query-Count')
+    return elapsed * 1000, response.status_code, \
+        int(statements) if statements is not None else None
+
+
+def _percentile(ordered, percent):
+    """Nearest-rank percentile of a sorted list."""
+    return ordered[max(0, math.ceil(len(ordered) * percent / 100) - 1)]
+
+
+def _run(app, scenario, requests, concurrency):
+    """Fire requests at one endpoint and summarize them."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(lambda i: _request(app, scenario, i), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    durations = sorted(ms for ms, _status, _statements in results)
+    statuses = Counter(status for _ms, status, _statements in results)
+    statements = [count for _ms, _status, count in results if count is not None]
+    return {
+        'requests': requests,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'unexpected': sum(count for status, count in statuses.items()
+                          if status not in scenario.expected),
+        'mean_ms': round(statistics.fmean(durations), 3),
+        'p50_ms': round(_percentile(durations, 50), 3),
+        'p95_ms': round(_percentile(durations, 95), 3),
+        'p99_ms': round(_percentile(durations, 99), 3),
+        'max_ms': round(durations[-1], 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'sql_statements': {
+            'mean': round(statistics.fmean(statements), 2),
+            'max': max(statements),
+        } if statements else None,
+    }
+
+
+def _compare(report, baseline):
+    """Per-endpoint changes from a baseline report, in percent (SQL statements absolute)."""
+    def change(new, old):
+        return round((new - old) / old * 100, 1) if old else None
+
+    endpoints = {}
+    for name, result in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        endpoints[name] = {
+            f'{key}_change_pct': change(result[key], before[key])
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')
+        }
+        if result['sql_statements'] and before.get('sql_statements'):
+            endpoints[name]['sql_statements_change'] = round(
+                result['sql_statements']['mean'] - before['sql_statements']['mean'], 2
+            )
+    return {'baseline_commit': baseline.get('commit'), 'endpoints': endpoints}
+
+
+def _commit():
+    """Short hash of the checked out commit, marked when there are local changes."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True,
+                                capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if dirty else commit
+
+
+def main():
+    """Seed, benchmark every endpoint and print a JSON report."""
+    args = _parse_args()
+
+    # pylint: disable=import-outside-toplevel
+    from benchmarks.stand_ins import FakeSheetsServer, FakeTMDBServer, make_sheet_rows
+
+    rows = make_sheet_rows(participants=args.participants, submissions=args.submissions)
+    sheets = FakeSheetsServer({TAB: rows}, latency=args.sheets_latency).start()
+    tmdb = FakeTMDBServer(movies=args.submissions, latency=args.tmdb_latency).start()
+
+    scratch = tempfile.mkdtemp()
+    os.environ.update({
+        'DATABASE_URL': args.database_url or 'sqlite:///' + os.path.join(scratch, 'bench.db'),
+        'FLASK_ENV': 'production',
+        'BACKGROUND_TASKS': 'false',
+        'SQL_QUERY_COUNT_HEADER': 'true',
+        'ADMIN_TOKEN': ADMIN_TOKEN,
+        'SUBMISSIONS_SOURCE': 'database',
+        'GOOGLE_SHEETS_ENDPOINT': sheets.url,
+        'TMDB_API_KEY': 'benchmark',
+        'TMDB_BASE_URL': tmdb.url,
+        'TMDB_RATE_LIMIT': '0',
+        'ENRICHMENT_WORKERS': '0',
+        'IMAGE_SOURCE_URL': tmdb.image_url,
+        'IMAGE_CACHE_DIR': os.path.join(scratch, 'images'),
+        'PROFILE_DIR': os.path.join(scratch, 'profiles'),
+    })
+
+    # The app prints while starting (table creation, migrations); keep
+    # stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        from google.auth.credentials import AnonymousCredentials
+
+        import models
+        from app import app
+        from sheets_integration import reset_sheets_service
+
+        try:
+            with app.app_context():
+                reset_sheets_service(AnonymousCredentials())
+                ids = _seed(models.db, models, rows, args)
+                dialect = models.db.engine.dialect.name
+            ids['profile_id'] = _profile_id(app)
+            sheets.reset_hits()
+            tmdb.reset_hits()
+
+            scenarios = _scenarios(ids, args)
+            uncovered = _uncovered_routes(app, scenarios)
+            if uncovered:
+                sys.exit(f"No benchmark scenario for: {', '.join(uncovered)}")
+
+            results = {}
+            for scenario in scenarios:
+                if args.only and not any(part in scenario.name for part in args.only):
+                    continue
+                results[scenario.name] = _run(app, scenario, args.requests, args.concurrency)
+                print(f"{scenario.name}: p50 {results[scenario.name]['p50_ms']} ms",
+                      file=sys.stderr)
+        finally:
+            sheets.stop()
+            tmdb.stop()
+
+    report = {
+        'commit': _commit(),
+        'database': dialect,
+        'participants': args.participants,
+        'submissions': args.submissions,
+        'rolls': args.rolls,
+        'sheets_latency_s': args.sheets_latency,
+        'tmdb_latency_s': args.tmdb_latency,
+        'concurrency': args.concurrency,
+        'upstream_requests': {'sheets': sheets.total_hits, 'tmdb': tmdb.total_hits},
+        'endpoints': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline:
+            report['comparison'] = _compare(report, json.load(baseline))
+
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if any(result['unexpected'] for result in results.values()) else 0)
+
+
+if __name__ == '__main__':
+    main()
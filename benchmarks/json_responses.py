@@ -0,0 +1,177 @@
+"""
+Compare JSON serialization and bytes on the wire for GET /api/rolls.
+
+Seeds a temporary SQLite database with enriched rolls, then measures the
+standard json module without compression ("before") against orjson with
+brotli/gzip negotiation ("after"):
+
+- serialize: building one response with every roll, to_dict() included
+- pages: walking all of GET /api/rolls?limit=N through the test client
+  with a browser's Accept-Encoding
+
+Exits non-zero if the two configurations return different data.
+
+Usage:
+    python -m benchmarks.json_responses [--rolls 10000] [--repeat 5] [--page-size 200]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ACCEPT_ENCODING = 'gzip, deflate, br'
+WORDS = ('a', 'crew', 'of', 'the', 'night', 'finds', 'lost', 'city', 'where',
+         'every', 'secret', 'must', 'face', 'their', 'past', 'before', 'dawn')
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 2)[1])
+    parser.add_argument('--rolls', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--page-size', type=int, default=200)
+    return parser.parse_args()
+
+
+def _tmdb_data(rng, i):
+    """An enrichment payload shaped like the ones stored on rolls."""
+    return {
+        'tmdb_id': 1000 + i,
+        'title': f'Movie {i}',
+        'overview': ' '.join(rng.choice(WORDS) for _ in range(60)).capitalize() + '.',
+        'release_date': f'{rng.randint(1950, 2024)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}',
+        'poster_url': f'/images/w500/poster{i}.jpg',
+        'poster_thumb_url': f'/images/w342/poster{i}.jpg',
+        'backdrop_url': f'/images/w1280/backdrop{i}.jpg',
+        'vote_average': round(rng.uniform(4, 9), 3),
+        'runtime': rng.randint(80, 180),
+        'genres': rng.sample(['Drama', 'Comedy', 'Horror', 'Thriller', 'Sci-Fi'], 2),
+    }
+
+
+def _seed(db, models, rolls):
+    """Insert one season, its participants and enriched rolls."""
+    rng = random.Random(1)
+    start = datetime(2015, 1, 1)
+    db.session.add(models.Season(name='Season 1', spreadsheet_tab='General'))
+    # One participant per roll: each can only be rolled once per season
+    db.session.execute(db.insert(models.Participant), [
+        {'name': f'Participant {i:05d}', 'created_at': start} for i in range(rolls)
+    ])
+    participant_ids = [i for (i,) in db.session.query(models.Participant.id)]
+    season_id = db.session.query(models.Season.id).scalar()
+    db.session.execute(db.insert(models.Roll), [
+        {'season_id': season_id,
+         'participant_id': participant_ids[i],
+         'movie_title': f'Movie {i}',
+         'roll_date': start + timedelta(hours=i),
+         'tmdb_id': 1000 + i,
+         'tmdb_data': _tmdb_data(rng, i),
+         'enrichment_status': 'done',
+         'enrichment_updated_at': start + timedelta(hours=i, minutes=1),
+         'created_at': start + timedelta(hours=i)}
+        for i in range(rolls)
+    ])
+    db.session.commit()
+
+
+def _configure(app, init_json_provider, backend, compression):
+    app.config.update(JSON_BACKEND=backend, RESPONSE_COMPRESSION=compression)
+    init_json_provider(app)
+
+
+def _serialize(app, models, repeat):
+    """Median time to build a response holding every roll, and its sizes."""
+    rolls = models.Roll.query.options(
+        models.db.joinedload(models.Roll.participant)
+    ).order_by(models.Roll.roll_date.desc()).all()
+
+    durations, body = [], b''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = app.json.response({'rolls': [roll.to_dict() for roll in rolls]}).get_data()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    # pylint: disable=import-outside-toplevel
+    from response_compression import brotli, compress
+    sizes = {'identity_bytes': len(body), 'gzip_bytes': len(compress(body, 'gzip'))}
+    if brotli is not None:
+        sizes['br_bytes'] = len(compress(body, 'br'))
+    return {'median_ms': round(statistics.median(durations), 1), **sizes}, body
+
+
+def _walk_pages(client, page_size):
+    """Fetch every page of /api/rolls; returns timings, wire bytes and the rolls."""
+    url = f'/api/rolls?limit={page_size}'
+    rolls, wire_bytes, pages = [], 0, 0
+    start = time.perf_counter()
+    while url:
+        response = client.get(url, headers={'Accept-Encoding': ACCEPT_ENCODING})
+        wire_bytes += len(response.data)
+        body = response.data
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        elif response.headers.get('Content-Encoding') == 'br':
+            import brotli  # pylint: disable=import-outside-toplevel
+            body = brotli.decompress(body)
+        page = json.loads(body)
+        rolls.extend(page['rolls'])
+        pages += 1
+        url = (f"/api/rolls?limit={page_size}&cursor={page['next_cursor']}"
+               if page['next_cursor'] else None)
+    elapsed = (time.perf_counter() - start) * 1000
+    return {
+        'pages': pages,
+        'total_ms': round(elapsed, 1),
+        'per_page_ms': round(elapsed / pages, 2),
+        'wire_bytes': wire_bytes,
+        'encoding': response.headers.get('Content-Encoding', 'identity'),
+    }, rolls
+
+
+def main():
+    """Seed, measure both configurations and report."""
+    args = _parse_args()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'json.db')
+    os.environ['BACKGROUND_TASKS'] = 'false'
+    os.environ['FLASK_ENV'] = 'production'
+
+    # pylint: disable=import-outside-toplevel
+    import models
+    from app import app
+    from json_provider import init_json_provider, orjson
+
+    report = {'rolls': args.rolls, 'orjson_installed': orjson is not None}
+    results = {}
+    with app.app_context():
+        _seed(models.db, models, args.rolls)
+
+        for name, backend, compression in (('before', 'stdlib', False),
+                                           ('after', 'auto', True)):
+            _configure(app, init_json_provider, backend, compression)
+            with app.test_request_context():
+                serialize, body = _serialize(app, models, args.repeat)
+            pages, rolls = _walk_pages(app.test_client(), args.page_size)
+            report[name] = {'json_backend': type(app.json).__name__,
+                            'serialize': serialize, 'pages': pages}
+            results[name] = (json.loads(body), rolls)
+
+    before, after = report['before'], report['after']
+    report['speedup'] = {
+        'serialize': round(before['serialize']['median_ms'] / after['serialize']['median_ms'], 2),
+        'pages': round(before['pages']['total_ms'] / after['pages']['total_ms'], 2),
+        'wire_bytes_ratio': round(after['pages']['wire_bytes'] / before['pages']['wire_bytes'], 3),
+    }
+    report['identical_data'] = results['before'] == results['after']
+
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['identical_data'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Micro-benchmark of Sheets client overhead, cold versus warm.
+
+"cold" rebuilds credentials and the discovery-built service before every
+call, which is what every Sheets read used to do. "warm" reuses the
+per-worker service and its pooled connections. The sheet cache is cleared
+before each call in both modes so every call performs a real
+``values().get`` against a local stand-in server.
+
+With --concurrency N, warm reads are also made by N callers reading
+different tabs at once (so the reads are not coalesced). Like requests,
+every read runs on a fresh thread, and the report counts the connections
+the stand-in saw. --gevent monkey-patches the process first, as gunicorn's
+gevent workers do, so every read runs on a fresh greenlet: they should
+share at most SHEETS_HTTP_POOL_SIZE connections, not open one each.
+
+Usage:
+    python -m benchmarks.sheets_service [--iterations 50] [--rows 500]
+        [--concurrency 1] [--gevent]
+"""
+# pylint: disable=wrong-import-position,wrong-import-order
+import sys
+
+if __name__ == '__main__' and '--gevent' in sys.argv:
+    from gevent import monkey
+
+    monkey.patch_all()
+
+import argparse
+import json
+import statistics
+import threading
+import time
+
+from flask import Flask
+from google.auth.credentials import AnonymousCredentials
+
+from benchmarks.stand_ins import FakeSheetsServer, make_sheet_rows
+from config import Config
+from sheets_integration import (
+    SHEETS_HTTP_POOL_SIZE,
+    clear_sheet_cache,
+    get_movies_from_sheet,
+    reset_sheets_service
+)
+
+
+def _time_calls(app, iterations, cold):
+    """Return per-call durations in milliseconds."""
+    durations = []
+    with app.app_context():
+        reset_sheets_service(AnonymousCredentials())
+        for _ in range(iterations):
+            if cold:
+                reset_sheets_service(AnonymousCredentials())
+            clear_sheet_cache()
+            start = time.perf_counter()
+            get_movies_from_sheet('Tab 0')
+            durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def _time_concurrent_calls(app, server, iterations, concurrency):
+    """
+    Warm reads from concurrency callers, each read on a new thread.
+
+    Returns:
+        Summary including the number of connections the stand-in saw
+    """
+    with app.app_context():
+        reset_sheets_service(AnonymousCredentials())
+    server.reset_hits()
+    durations = []
+
+    def read(tab):
+        with app.app_context():
+            clear_sheet_cache()
+            start = time.perf_counter()
+            get_movies_from_sheet(tab)
+            durations.append((time.perf_counter() - start) * 1000)
+
+    def caller(tab):
+        for _ in range(iterations):
+            request = threading.Thread(target=read, args=(tab,))
+            request.start()
+            request.join()
+
+    callers = [threading.Thread(target=caller, args=(f'Tab {i}',))
+               for i in range(concurrency)]
+    for thread in callers:
+        thread.start()
+    for thread in callers:
+        thread.join()
+
+    summary = _summary(durations)
+    summary['connections'] = len(server.clients)
+    return summary
+
+
+def _summary(durations):
+    """Summarize durations in milliseconds."""
+    ordered = sorted(durations)
+    return {
+        'calls': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'p50_ms': round(ordered[len(ordered) // 2], 3),
+        'p95_ms': round(ordered[int(len(ordered) * 0.95) - 1], 3),
+        'min_ms': round(ordered[0], 3),
+    }
+
+
+def main():
+    """Run the benchmark and print a JSON report."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 2)[1])
+    parser.add_argument('--iterations', type=int, default=50,
+                        help='Calls per mode and caller')
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Also time warm reads from this many callers at once')
+    parser.add_argument('--gevent', action='store_true',
+                        help='Monkey-patch with gevent, as gunicorn gevent workers do')
+    args = parser.parse_args()
+
+    rows = make_sheet_rows(submissions=args.rows)
+    server = FakeSheetsServer(
+        {f'Tab {i}': rows for i in range(max(args.concurrency, 1))}
+    ).start()
+    try:
+        app = Flask(__name__)
+        app.config.from_object(Config)
+        app.config['GOOGLE_SHEETS_ENDPOINT'] = server.url
+
+        report = {
+            'rows': args.rows,
+            'gevent': args.gevent,
+            'pool_size': SHEETS_HTTP_POOL_SIZE,
+            'cold': _summary(_time_calls(app, args.iterations, cold=True)),
+            'warm': _summary(_time_calls(app, args.iterations, cold=False)),
+        }
+        report['warm_speedup'] = round(
+            report['cold']['mean_ms'] / report['warm']['mean_ms'], 2
+        )
+        if args.concurrency > 1:
+            report['concurrent_warm'] = _time_concurrent_calls(
+                app, server, args.iterations, args.concurrency
+            )
+        print(json.dumps(report, indent=2))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Local HTTP stand-ins for Google Sheets and TMDB used by the benchmarks."""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Served for every image; only the content type is checked
+IMAGE_BYTES = b'\xff\xd8\xff\xe0' + bytes(2048)
+
+
+class StandInServer:
+    """
+    Threaded HTTP server on a free local port.
+
+    Subclasses implement ``handle(method, path, query, headers)`` returning
+    ``(status, payload, extra_headers)``. Every request is delayed by
+    ``latency`` seconds and counted in ``hits`` by path; ``clients``
+    collects the client addresses, i.e. the distinct connections used.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.hits = Counter()
+        self.clients = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL of the running server, with a trailing slash."""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    @property
+    def total_hits(self):
+        """Total number of requests served."""
+        with self._lock:
+            return sum(self.hits.values())
+
+    def reset_hits(self):
+        """Clear the request counters."""
+        with self._lock:
+            self.hits.clear()
+            self.clients.clear()
+
+    def start(self):
+        """Start serving in a daemon thread and return self."""
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Dispatch every request to the stand-in."""
+
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Handle GET requests."""
+                stand_in.dispatch(self)
+
+            def log_message(self, *_args):  # pylint: disable=arguments-differ
+                """Keep benchmark output clean."""
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def dispatch(self, request):
+        """Count, delay and answer one request."""
+        parsed = urlparse(request.path)
+        path = unquote(parsed.path)
+        with self._lock:
+            self.hits[path] += 1
+            self.clients.add(request.client_address)
+        if self.latency:
+            time.sleep(self.latency)
+
+        status, payload, extra_headers = self.handle(
+            request.command, path, parse_qs(parsed.query), request.headers
+        )
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+
+        request.send_response(status)
+        headers = {'Content-Type': 'application/json', **(extra_headers or {})}
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def handle(self, method, path, query, headers):
+        """Return (status, payload, extra_headers) for a request."""
+        raise NotImplementedError
+
+
+def make_sheet_rows(participants=50, submissions=5000, seed=1):
+    """
+    Build A:B values for a submissions tab, header row included.
+
+    Args:
+        participants: Number of distinct submitters
+        submissions: Number of movie rows
+        seed: Random seed so runs are comparable
+
+    Returns:
+        List of [movie_title, participant_name] rows
+    """
+    rng = random.Random(seed)
+    names = [f'Participant {i:03d}' for i in range(participants)]
+    rows = [['Movie', 'Submitted By']]
+    for i in range(submissions):
+        rows.append([f'Movie {i:05d} ({rng.randint(1950, 2024)})', rng.choice(names)])
+    return rows
+
+
+class FakeSheetsServer(StandInServer):
+    """
+    Serves ``values.get`` and ``values.batchGet`` for a fixed set of tabs.
+
+    Like the Sheets API, a range naming an unknown tab fails the whole
+    request with 400.
+    """
+
+    def __init__(self, tabs, latency=0.0):
+        super().__init__(latency)
+        self.tabs = tabs
+
+    def handle(self, method, path, query, headers):
+        if path.endswith('/values:batchGet'):
+            ranges = query.get('ranges', [])
+            unknown = [name for name in ranges if self._tab(name) not in self.tabs]
+            if unknown:
+                return self._unparsable(unknown[0])
+            return 200, {'valueRanges': [self._value_range(name) for name in ranges]}, None
+
+        prefix, _, range_name = path.partition('/values/')
+        if not prefix.startswith('/v4/spreadsheets/') or not range_name:
+            return 404, {'error': {'code': 404, 'message': 'Not found'}}, None
+        if self._tab(range_name) not in self.tabs:
+            return self._unparsable(range_name)
+        return 200, self._value_range(range_name), None
+
+    @staticmethod
+    def _tab(range_name):
+        return range_name.split('!', 1)[0].strip("'")
+
+    @staticmethod
+    def _unparsable(range_name):
+        message = f'Unable to parse range: {range_name}'
+        return 400, {'error': {'code': 400, 'message': message,
+                               'status': 'INVALID_ARGUMENT'}}, None
+
+    def _value_range(self, range_name):
+        """Return the ValueRange payload for an ``Tab!A:B`` range."""
+        tab = self._tab(range_name)
+        return {
+            'range': range_name,
+            'majorDimension': 'ROWS',
+            'values': self.tabs.get(tab, [])
+        }
+
+
+class FakeTMDBServer(StandInServer):
+    """
+    Serves TMDB ``/search/movie`` and ``/movie/<id>`` for generated movies,
+    and placeholder images under ``image_url`` (TMDB's image server).
+
+    Queue failures with ``fail_next`` to exercise retries.
+    """
+
+    def __init__(self, movies=100, latency=0.0):
+        super().__init__(latency)
+        self.movies = {
+            i: {'id': i, 'title': f'Movie {i:05d}', 'release_date': f'{1950 + i % 75}-01-01',
+                'overview': f'Overview of movie {i}', 'poster_path': f'/poster{i}.jpg',
+                'backdrop_path': f'/backdrop{i}.jpg', 'vote_average': 7.0, 'runtime': 100,
+                'genres': [{'id': 18, 'name': 'Drama'}]}
+            for i in range(1, movies + 1)
+        }
+        self._failures = []
+
+    @property
+    def url(self):
+        """Base URL to use as TMDB_BASE_URL."""
+        return super().url + '3'
+
+    @property
+    def image_url(self):
+        """Base URL to use as IMAGE_SOURCE_URL."""
+        return super().url + 't/p'
+
+    def fail_next(self, status, count=1, retry_after=None):
+        """Answer the next count requests with status (and a Retry-After header)."""
+        headers = {'Retry-After': str(retry_after)} if retry_after is not None else None
+        with self._lock:
+            self._failures.extend([(status, headers)] * count)
+
+    def handle(self, method, path, query, headers):
+        with self._lock:
+            failure = self._failures.pop(0) if self._failures else None
+        if failure:
+            status, extra_headers = failure
+            return status, {'status_message': 'Injected failure'}, extra_headers
+
+        if path.startswith('/t/p/'):
+            return 200, IMAGE_BYTES, {'Content-Type': 'image/jpeg'}
+
+        if path == '/3/search/movie':
+            title = query.get('query', [''])[0].lower()
+            results = [
+                {'id': movie['id'], 'title': movie['title'],
+                 'release_date': movie['release_date']}
+                for movie in self.movies.values() if title in movie['title'].lower()
+            ]
+            return 200, {'page': 1, 'results': results[:20],
+                         'total_results': len(results)}, None
+
+        movie_id = path.rpartition('/movie/')[2]
+        if path.startswith('/3/movie/') and movie_id.isdigit() \
+                and int(movie_id) in self.movies:
+            return 200, self.movies[int(movie_id)], None
+        return 404, {'status_code': 34, 'status_message': 'Not found'}, None
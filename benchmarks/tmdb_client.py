@@ -0,0 +1,108 @@
+"""
+Check the pooled TMDB client against a local stand-in server.
+
+Times lookups with a fresh session per call ("unpooled", what every
+lookup used to do) and with the shared keep-alive session ("pooled"),
+then checks that 429/5xx responses are retried and that the token bucket
+holds bulk work to the configured rate. Exits non-zero if a check fails.
+
+Usage:
+    python -m benchmarks.tmdb_client [--iterations 100] [--latency 0.005]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from flask import Flask
+
+from benchmarks.stand_ins import FakeTMDBServer
+from config import Config
+from tmdb_integration import TMDBClient
+
+
+def _make_app(server, **overrides):
+    """Flask app configured to talk to the stand-in server."""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update({'TMDB_API_KEY': 'benchmark', 'TMDB_BASE_URL': server.url,
+                       'TMDB_RETRY_BACKOFF': 0.01, 'TMDB_RATE_LIMIT': 0, **overrides})
+    return app
+
+
+def _time_lookups(app, server, iterations, pooled):
+    """Return per-call durations in milliseconds and connections opened."""
+    server.reset_hits()
+    client = TMDBClient()
+    durations = []
+    with app.app_context():
+        for i in range(iterations):
+            if not pooled:
+                client.reset()
+            start = time.perf_counter()
+            client.get_movie_details(i % 100 + 1)
+            durations.append((time.perf_counter() - start) * 1000)
+    client.reset()
+    return {
+        'mean_ms': round(statistics.fmean(durations), 3),
+        'p50_ms': round(sorted(durations)[len(durations) // 2], 3),
+        'connections': len(server.clients),
+    }
+
+
+def _check_retries(app, server):
+    """A search answered by 429 then 503 succeeds on the third attempt."""
+    client = TMDBClient()
+    server.fail_next(429, retry_after=0)
+    server.fail_next(503)
+    with app.app_context():
+        results = client.search_movie('Movie 00042')
+    stats = client.stats.snapshot()['search']
+    client.reset()
+    return {
+        'ok': bool(results and results['results']) and stats['retries'] == 2,
+        'stats': stats,
+    }
+
+
+def _check_rate_limit(server, rate, burst, calls):
+    """calls lookups take at least (calls - burst) / rate seconds."""
+    app = _make_app(server, TMDB_RATE_LIMIT=rate, TMDB_RATE_BURST=burst)
+    client = TMDBClient()
+    start = time.perf_counter()
+    with app.app_context():
+        for i in range(calls):
+            client.get_movie_details(i % 100 + 1)
+    elapsed = time.perf_counter() - start
+    client.reset()
+    minimum = (calls - burst) / rate
+    return {'ok': elapsed >= minimum * 0.95, 'elapsed_s': round(elapsed, 3),
+            'minimum_s': round(minimum, 3)}
+
+
+def main():
+    """Run the benchmark and checks and print a JSON report."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 2)[1])
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.005)
+    args = parser.parse_args()
+
+    server = FakeTMDBServer(latency=args.latency).start()
+    try:
+        app = _make_app(server)
+        report = {
+            'unpooled': _time_lookups(app, server, args.iterations, pooled=False),
+            'pooled': _time_lookups(app, server, args.iterations, pooled=True),
+            'retries': _check_retries(app, server),
+            'rate_limit': _check_rate_limit(server, rate=50, burst=5, calls=30),
+        }
+    finally:
+        server.stop()
+
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['retries']['ok'] and report['rate_limit']['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main()
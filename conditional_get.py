@@ -0,0 +1,73 @@
+"""ETags for JSON API responses, derived from change versions instead of rows."""
+import hashlib
+from functools import wraps
+
+from flask import g, has_request_context, make_response, request
+
+from versions import get_versions
+
+
+def versioned_etag(versions):
+    """
+    ETag of the current request's URL at the given scope versions.
+
+    Args:
+        versions: Dictionary of {scope: version}
+
+    Returns:
+        Unquoted ETag value
+    """
+    state = ','.join(f'{scope}={version}' for scope, version in sorted(versions.items()))
+    return hashlib.sha1(f'{request.full_path}|{state}'.encode('utf-8')).hexdigest()
+
+
+def mark_unversioned():
+    """
+    Keep the current response from being tagged by conditional_get.
+
+    Called by code that served data the change versions do not cover, such
+    as a season tab read from Google Sheets because it was never synced.
+    Without a tag no client can later get a 304 for that data.
+    """
+    if has_request_context():
+        g.unversioned_response = True
+
+
+def conditional_get(scopes):
+    """
+    Validate a GET view's response with an ETag built from change versions.
+
+    The versions of the scopes the response depends on are read in one
+    query. If the client's If-None-Match already holds the resulting ETag
+    the view is skipped and 304 Not Modified is returned, so no rows are
+    loaded or serialized. Otherwise the view's response is tagged, unless
+    it called mark_unversioned(). Writes must bump the scopes (see
+    versions.py) in the same transaction.
+
+    Tags are weak, because the body may be sent in different encodings.
+    Responses carry Cache-Control: no-cache so browsers revalidate each use.
+
+    Args:
+        scopes: List of scope names, or a callable taking the view's keyword
+            arguments and returning the list (or None to skip validation)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            names = scopes(**kwargs) if callable(scopes) else scopes
+            if names is None:
+                return view(*args, **kwargs)
+
+            etag = versioned_etag(get_versions(*names))
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or g.pop('unversioned_response', False):
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
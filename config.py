@@ -10,6 +10,9 @@ class Config:  # pylint: disable=too-few-public-methods
 
     # Flask
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    # Required in the X-Admin-Token header of /api/admin/* requests, which
+    # are disabled while it is empty
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
 
     # Database
     SQLALCHEMY_DATABASE_URI = os.getenv(
@@ -21,6 +24,55 @@ class Config:  # pylint: disable=too-few-public-methods
     # TMDB API
     TMDB_API_KEY = os.getenv('TMDB_API_KEY', '')
     TMDB_BASE_URL = os.getenv('TMDB_BASE_URL', 'https://api.themoviedb.org/3')
+    TMDB_TIMEOUT = float(os.getenv('TMDB_TIMEOUT', '10'))
+    # Kept-alive connections per worker
+    TMDB_POOL_SIZE = int(os.getenv('TMDB_POOL_SIZE', '10'))
+    # Retries of 429/5xx responses and connection errors, with jittered
+    # exponential backoff starting at TMDB_RETRY_BACKOFF seconds (Retry-After
+    # is honored), never waiting longer than TMDB_RETRY_MAX_BACKOFF
+    TMDB_MAX_RETRIES = int(os.getenv('TMDB_MAX_RETRIES', '3'))
+    TMDB_RETRY_BACKOFF = float(os.getenv('TMDB_RETRY_BACKOFF', '0.5'))
+    TMDB_RETRY_MAX_BACKOFF = float(os.getenv('TMDB_RETRY_MAX_BACKOFF', '10'))
+    # Requests per second each worker may send on average, and the burst
+    # allowed above that (0 disables the limiter). The default keeps two
+    # workers within the free tier's 40 requests per 10 seconds
+    TMDB_RATE_LIMIT = float(os.getenv('TMDB_RATE_LIMIT', '2'))
+    TMDB_RATE_BURST = int(os.getenv('TMDB_RATE_BURST', '10'))
+    # Background threads per worker enriching new rolls (0 enriches before
+    # responding), rolls each worker may have queued, and seconds a roll may
+    # stay pending before it is queued again
+    ENRICHMENT_WORKERS = int(os.getenv('ENRICHMENT_WORKERS', '2'))
+    ENRICHMENT_QUEUE_SIZE = int(os.getenv('ENRICHMENT_QUEUE_SIZE', '100'))
+    ENRICHMENT_RETRY_AFTER = int(os.getenv('ENRICHMENT_RETRY_AFTER', '300'))
+    # Days a cached TMDB lookup is reused, the number of entries kept by
+    # least-recently-used pruning, and seconds between prunes (0 disables)
+    TMDB_CACHE_TTL_DAYS = int(os.getenv('TMDB_CACHE_TTL_DAYS', '30'))
+    TMDB_CACHE_MAX_ENTRIES = int(os.getenv('TMDB_CACHE_MAX_ENTRIES', '5000'))
+    TMDB_CACHE_PRUNE_INTERVAL = int(os.getenv('TMDB_CACHE_PRUNE_INTERVAL', '86400'))
+    # Posters and backdrops are downloaded once into IMAGE_CACHE_DIR (shared
+    # by every worker; empty redirects /images/* to TMDB instead) when a
+    # roll or cached lookup links to them. Every IMAGE_CACHE_PRUNE_INTERVAL
+    # seconds (0 disables) the least recently used images are evicted until
+    # the cache fits in IMAGE_CACHE_MAX_MB
+    IMAGE_SOURCE_URL = os.getenv('IMAGE_SOURCE_URL', 'https://image.tmdb.org/t/p')
+    IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', 'image_cache')
+    IMAGE_CACHE_MAX_MB = int(os.getenv('IMAGE_CACHE_MAX_MB', '500'))
+    IMAGE_CACHE_PRUNE_INTERVAL = int(os.getenv('IMAGE_CACHE_PRUNE_INTERVAL', '3600'))
+
+    # Seconds the response to a request with an Idempotency-Key header is
+    # replayed to retries, and seconds between prunes of expired keys
+    # (0 disables)
+    IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
+    IDEMPOTENCY_PRUNE_INTERVAL = int(os.getenv('IDEMPOTENCY_PRUNE_INTERVAL', '3600'))
+
+    # /api/events: seconds between keepalive comments on idle streams, and
+    # clients each worker streams to at once (more get 503)
+    EVENTS_KEEPALIVE = int(os.getenv('EVENTS_KEEPALIVE', '15'))
+    EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', '200'))
+
+    # Seconds a worker reuses the active season before re-checking whether
+    # seasons changed (rolls always re-check)
+    ACTIVE_SEASON_CACHE_TTL = int(os.getenv('ACTIVE_SEASON_CACHE_TTL', '5'))
 
     # Google Sheets
     GOOGLE_SPREADSHEET_ID = os.getenv(
@@ -31,12 +83,80 @@ class Config:  # pylint: disable=too-few-public-methods
         'GOOGLE_CREDENTIALS_PATH',
         '/app/credentials/credentials.json'
     )
+    # Override the Sheets API root URL, e.g. to point at a local stand-in
+    GOOGLE_SHEETS_ENDPOINT = os.getenv('GOOGLE_SHEETS_ENDPOINT', '')
+    # Seconds a fetched tab is served from memory, and how much longer a stale
+    # copy may be served while it is refreshed in the background
+    SHEETS_CACHE_TTL = int(os.getenv('SHEETS_CACHE_TTL', '60'))
+    SHEETS_CACHE_STALE_TTL = int(os.getenv('SHEETS_CACHE_STALE_TTL', '3600'))
+
+    # Season tabs loaded into the Sheets cache when a worker starts:
+    # 'all', 'active' or 'off'. Skipped while SUBMISSIONS_SOURCE is
+    # 'database' and the sync below is on: its first run reads every tab
+    SHEETS_WARMUP = os.getenv('SHEETS_WARMUP', 'all')
+
+    # Submissions mirror: 'database' reads synced rows (falling back to
+    # Sheets for tabs never synced), 'sheet' always reads Google Sheets
+    SUBMISSIONS_SOURCE = os.getenv('SUBMISSIONS_SOURCE', 'database')
+    # Seconds between background syncs of every season tab (0 disables)
+    SUBMISSION_SYNC_INTERVAL = int(os.getenv('SUBMISSION_SYNC_INTERVAL', '300'))
+
+    # JSON serializer for responses: 'auto' (orjson if installed), 'orjson'
+    # or 'stdlib'
+    JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+    # Compress JSON and HTML responses of at least COMPRESSION_MIN_SIZE bytes
+    # with brotli (if installed) or gzip, as the client accepts
+    RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+
+    # Serve Prometheus metrics on /metrics (needs the metrics extra), and
+    # break every response's time down in a Server-Timing header
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'true').lower() == 'true'
+
+    # Report the number of SQL statements per request in X-Query-Count
+    SQL_QUERY_COUNT_HEADER = os.getenv('SQL_QUERY_COUNT_HEADER', 'false').lower() == 'true'
+    # Raise instead of warning when a view exceeds its @query_budget
+    SQL_QUERY_BUDGET_STRICT = False
+    # Log SQL statements taking at least this many milliseconds, with the
+    # route that ran them (0 disables). Their bound parameters hold names,
+    # titles and request bodies, so they are only logged when
+    # SLOW_QUERY_LOG_PARAMETERS is set
+    SLOW_QUERY_THRESHOLD_MS = int(os.getenv('SLOW_QUERY_THRESHOLD_MS', '250'))
+    SLOW_QUERY_LOG_PARAMETERS = os.getenv('SLOW_QUERY_LOG_PARAMETERS',
+                                          'false').lower() == 'true'
+
+    # Profile single requests sent with an X-Profile: 1 header or ?profile=1:
+    # 'admin' (only requests carrying ADMIN_TOKEN, which must be set),
+    # 'open' (anyone; only set it explicitly, for local use) or 'off'. The
+    # newest PROFILE_MAX_FILES profiles are kept in PROFILE_DIR, shared by
+    # every worker, for /api/admin/profiles
+    PROFILING = os.getenv('PROFILING', 'admin')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '50'))
+
+    # Start per-worker background threads (CLI scripts turn this off)
+    BACKGROUND_TASKS = os.getenv('BACKGROUND_TASKS', 'true').lower() == 'true'
+
+    # Apply pending schema migrations at startup (repair scripts turn this off)
+    RUN_MIGRATIONS = os.getenv('RUN_MIGRATIONS', 'true').lower() == 'true'
 
 
 class DevelopmentConfig(Config):  # pylint: disable=too-few-public-methods
     """Development configuration."""
     DEBUG = True
     FLASK_ENV = 'development'
+    SQL_QUERY_COUNT_HEADER = True
+
+
+class TestingConfig(Config):  # pylint: disable=too-few-public-methods
+    """Testing configuration."""
+    TESTING = True
+    FLASK_ENV = 'testing'
+    SQL_QUERY_COUNT_HEADER = True
+    SQL_QUERY_BUDGET_STRICT = True
+    BACKGROUND_TASKS = False
+    ENRICHMENT_WORKERS = 0
 
 
 class ProductionConfig(Config):  # pylint: disable=too-few-public-methods
@@ -48,5 +168,6 @@ class ProductionConfig(Config):  # pylint: disable=too-few-public-methods
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
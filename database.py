@@ -1,9 +1,44 @@
 """Database initialization and migration utilities."""
+from migrations import run_migrations
 from models import db
 
 
+def _use_gevent_wait_callback():
+    """
+    Let psycopg2 yield to other greenlets while it waits on Postgres.
+
+    gunicorn's gevent workers patch sockets, but psycopg2 talks to the
+    server through libpq, which would block the whole worker during every
+    query. Does nothing unless gevent has patched this process.
+    """
+    # pylint: disable=import-outside-toplevel
+    try:
+        from gevent import monkey
+        from gevent.socket import wait_read, wait_write
+        from psycopg2 import OperationalError, extensions
+    except ImportError:
+        return
+    if not monkey.is_module_patched('socket'):
+        return
+
+    def wait_callback(conn, timeout=None):
+        while True:
+            state = conn.poll()
+            if state == extensions.POLL_OK:
+                return
+            if state == extensions.POLL_READ:
+                wait_read(conn.fileno(), timeout=timeout)
+            elif state == extensions.POLL_WRITE:
+                wait_write(conn.fileno(), timeout=timeout)
+            else:
+                raise OperationalError(f"Bad result from poll: {state}")
+
+    extensions.set_wait_callback(wait_callback)
+
+
 def init_db(app):
     """Initialize the database with the Flask app."""
+    _use_gevent_wait_callback()
     db.init_app(app)
 
     with app.app_context():
@@ -11,12 +46,17 @@ def init_db(app):
         db.create_all()
         print("Database tables created successfully!")
 
+        # Bring tables created by older versions up to date
+        if app.config['RUN_MIGRATIONS']:
+            run_migrations()
+
 
 def reset_db(app):
     """Drop all tables and recreate them. USE WITH CAUTION!"""
     with app.app_context():
         db.drop_all()
         db.create_all()
+        run_migrations()
         print("Database reset successfully!")
 
 
@@ -24,6 +64,7 @@ def seed_db(app):
     """Seed the database with initial data."""
     from datetime import datetime  # pylint: disable=import-outside-toplevel
     from models import Season  # pylint: disable=import-outside-toplevel
+    from active_season import seasons_changed  # pylint: disable=import-outside-toplevel
 
     with app.app_context():
         # Check if data already exists
@@ -39,6 +80,7 @@ def seed_db(app):
             spreadsheet_tab="General"
         )
         db.session.add(season)
+        seasons_changed()
 
         # Create some example participants (optional)
         # participants = ['Alice', 'Bob', 'Charlie']
@@ -0,0 +1,216 @@
+"""SQL statement counting, per-endpoint query budgets and the slow-query log."""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# Logged parameters are cut off after this many characters
+MAX_LOGGED_PARAMETERS = 500
+
+# Set from SLOW_QUERY_THRESHOLD_MS and SLOW_QUERY_LOG_PARAMETERS by
+# init_query_instrumentation()
+_slow_query = {'seconds': 0.0, 'parameters': False}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block of code runs more SQL statements than allowed."""
+
+
+def _active_counters():
+    """Return the counters currently open on this thread."""
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+    return counters
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _count_statement(_conn, _cursor, statement, _parameters, _context, _executemany):
+    """Credit every executed statement to each open counter on this thread."""
+    unbudgeted_block = getattr(_local, 'unbudgeted', 0) > 0
+    for counter in _active_counters():
+        if counter.budget and unbudgeted_block:
+            continue
+        counter.count += 1
+        if counter.statements is not None:
+            counter.statements.append(statement)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement_timer(_conn, _cursor, _statement, _parameters, context, _executemany):
+    if context is not None and _slow_query['seconds']:
+        context.slow_query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _log_slow_statement(_conn, _cursor, statement, parameters, context, _executemany):
+    """
+    Log statements that took at least SLOW_QUERY_THRESHOLD_MS.
+
+    Bound parameters carry user data, so they are left out unless
+    SLOW_QUERY_LOG_PARAMETERS is set.
+    """
+    started = getattr(context, 'slow_query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if elapsed < _slow_query['seconds']:
+        return
+
+    if not _slow_query['parameters']:
+        logger.warning('Slow query (%.0f ms) in %s: %s', elapsed * 1000,
+                       _statement_origin(), ' '.join(statement.split()))
+        return
+
+    logged_parameters = repr(parameters)
+    if len(logged_parameters) > MAX_LOGGED_PARAMETERS:
+        logged_parameters = logged_parameters[:MAX_LOGGED_PARAMETERS] + '...'
+    logger.warning('Slow query (%.0f ms) in %s: %s -- parameters: %s',
+                   elapsed * 1000, _statement_origin(), ' '.join(statement.split()),
+                   logged_parameters)
+
+
+def _statement_origin():
+    """The request (method, path and view) or background thread running a statement."""
+    if has_request_context():
+        return f'{request.method} {request.path} ({request.endpoint})'
+    return f'thread {threading.current_thread().name}'
+
+
+class QueryCounter:
+    """
+    Context manager counting SQL statements executed on the current thread.
+
+    Counters nest, so a request-wide counter and a per-view budget can be
+    open at the same time. Budget counters skip statements run inside
+    unbudgeted().
+    """
+
+    def __init__(self, record=False, budget=False):
+        self.count = 0
+        self.statements = [] if record else None
+        self.budget = budget
+
+    def start(self):
+        """Start counting statements on this thread."""
+        _active_counters().append(self)
+        return self
+
+    def stop(self):
+        """Stop counting."""
+        _active_counters().remove(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_exc):
+        self.stop()
+
+
+@contextmanager
+def assert_max_queries(max_queries):
+    """
+    Fail if the enclosed block runs more than max_queries SQL statements.
+
+    Intended for tests, e.g.::
+
+        with assert_max_queries(2):
+            client.get('/api/rolls')
+
+    Raises:
+        QueryBudgetExceeded: Listing every statement that was executed
+    """
+    with QueryCounter(record=True) as counter:
+        yield counter
+    if counter.count > max_queries:
+        raise QueryBudgetExceeded(
+            f'{counter.count} SQL statements executed, budget is {max_queries}:\n'
+            + '\n'.join(counter.statements)
+        )
+
+
+@contextmanager
+def unbudgeted():
+    """
+    Leave the enclosed statements out of the current view's @query_budget.
+
+    For work whose cost does not depend on the view itself, such as a
+    transaction retried after losing a race, or TMDB enrichment run inline
+    when ENRICHMENT_WORKERS is 0. The statements still count in
+    X-Query-Count, the metrics and assert_max_queries().
+    """
+    _local.unbudgeted = getattr(_local, 'unbudgeted', 0) + 1
+    try:
+        yield
+    finally:
+        _local.unbudgeted -= 1
+
+
+def query_budget(max_queries):
+    """
+    Declare the most SQL statements a view is expected to run.
+
+    Going over budget raises QueryBudgetExceeded when SQL_QUERY_BUDGET_STRICT
+    is set (as in testing, see tests/test_query_budgets.py) and logs a
+    warning otherwise.
+
+    Args:
+        max_queries: Maximum number of statements per request
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with QueryCounter(budget=True) as counter:
+                response = view(*args, **kwargs)
+
+            if counter.count > max_queries:
+                message = (f'{request.endpoint} ran {counter.count} SQL statements '
+                           f'(budget {max_queries})')
+                if current_app.config.get('SQL_QUERY_BUDGET_STRICT'):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+
+            return response
+        return wrapper
+    return decorator
+
+
+def init_query_instrumentation(app):
+    """
+    Count SQL statements for every request and log slow ones.
+
+    When SQL_QUERY_COUNT_HEADER is set the count is returned in an
+    X-Query-Count response header. Statements taking at least
+    SLOW_QUERY_THRESHOLD_MS are logged as warnings with the route or
+    background thread that ran them, and with their parameters when
+    SLOW_QUERY_LOG_PARAMETERS is set.
+    """
+    _slow_query['seconds'] = app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000
+    _slow_query['parameters'] = app.config.get('SLOW_QUERY_LOG_PARAMETERS', False)
+
+    @app.before_request
+    def start_query_counter():
+        g.query_counter = QueryCounter().start()
+
+    @app.after_request
+    def add_query_count_header(response):
+        counter = g.get('query_counter')
+        if counter is not None and app.config.get('SQL_QUERY_COUNT_HEADER'):
+            response.headers['X-Query-Count'] = str(counter.count)
+        return response
+
+    @app.teardown_request
+    def stop_query_counter(_exc):
+        counter = g.pop('query_counter', None)
+        if counter is not None:
+            counter.stop()
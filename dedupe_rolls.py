@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Remove rolls that repeat a participant within a season, keeping the first."""
+
+import argparse
+import os
+
+# Scripts share the web app's setup but must not start its background threads.
+# Migrations stay off: the one-roll-per-season migration refuses to run
+# while the duplicates this script removes exist
+os.environ.setdefault('BACKGROUND_TASKS', 'false')
+os.environ.setdefault('RUN_MIGRATIONS', 'false')
+
+# pylint: disable=wrong-import-position
+from app import app
+from migrations import find_duplicate_rolls, run_migrations
+from models import db, Roll
+from season_roster import roster_changed
+from versions import rolls_changed
+
+
+def describe(row):
+    """One line per duplicate, with what deleting it loses."""
+    lost = []
+    if row.has_tmdb_data:
+        lost.append('TMDB data')
+    if row.notes:
+        lost.append(f'notes: {row.notes!r}')
+    extra = f" [{'; '.join(lost)}]" if lost else ''
+    return (f"roll {row.id}: season {row.season_id}, participant {row.participant_id}, "
+            f"{row.movie_title!r} on {row.roll_date}{extra} (repeats roll {row.kept_id})")
+
+
+def main():
+    """Main dedupe function."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--delete', action='store_true',
+                        help='Delete the duplicates (default: only list them)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        duplicates = find_duplicate_rolls(db.session.connection())
+        if not duplicates:
+            print("✓ No duplicate rolls.")
+        else:
+            for row in duplicates:
+                print(describe(row))
+
+            if not args.delete:
+                print(f"\n{len(duplicates)} duplicate roll(s) found. "
+                      "Run again with --delete to remove them.")
+                return
+
+            season_ids = {row.season_id for row in duplicates}
+            Roll.query.filter(Roll.id.in_([row.id for row in duplicates]))\
+                .delete(synchronize_session=False)
+            rolls_changed(*season_ids)
+            for season_id in season_ids:
+                roster_changed(season_id)
+            db.session.commit()
+            print(f"\n✓ Deleted {len(duplicates)} duplicate roll(s).")
+
+        # Builds the unique index now that nothing stands in its way
+        run_migrations()
+
+    print("\n🎉 Rolls are unique per participant and season.")
+
+
+if __name__ == '__main__':
+    main()
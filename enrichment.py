@@ -0,0 +1,425 @@
+"""Background TMDB enrichment of rolls on a bounded per-worker executor."""
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import text
+
+from db_instrumentation import unbudgeted
+from events import ROLL_ENRICHED, publish
+from models import db, Roll
+from tmdb_integration import enrich_movie_data
+from versions import rolls_changed
+
+
+ENRICHMENT_PENDING = 'pending'
+ENRICHMENT_DONE = 'done'
+ENRICHMENT_FAILED = 'failed'
+
+
+def enrich_roll(roll_id):
+    """
+    Fetch TMDB data for a pending roll and record the outcome.
+
+    Only pending rolls are enriched, so running this twice for the same roll
+    is harmless. A tmdb_id set on the roll is fetched directly instead of
+    searching by title. No transaction is held open during the TMDB call,
+    and the result is only written if the roll is still pending with the
+    same tmdb_id, so edits made meanwhile are not overwritten.
+
+    Args:
+        roll_id: ID of the roll
+
+    Returns:
+        The roll's enrichment status, or None if the roll no longer exists
+    """
+    row = db.session.query(
+        Roll.movie_title, Roll.tmdb_id, Roll.season_id, Roll.enrichment_status
+    ).filter_by(id=roll_id).first()
+    # Release the connection before the (possibly slow) TMDB call
+    db.session.commit()
+    if row is None:
+        return None
+    movie_title, tmdb_id, season_id, status = row
+    if status != ENRICHMENT_PENDING:
+        return status
+
+    tmdb_data = enrich_movie_data(movie_title, tmdb_id)
+
+    values = {'enrichment_status': ENRICHMENT_FAILED,
+              'enrichment_updated_at': datetime.utcnow()}
+    if tmdb_data:
+        values.update(tmdb_id=tmdb_data.get('tmdb_id'), tmdb_data=tmdb_data,
+                      enrichment_status=ENRICHMENT_DONE)
+    updated = Roll.query.filter(
+        Roll.id == roll_id,
+        Roll.enrichment_status == ENRICHMENT_PENDING,
+        Roll.tmdb_id.is_not_distinct_from(tmdb_id)
+    ).update(values, synchronize_session=False)
+    if updated:
+        rolls_changed(season_id)
+        publish(ROLL_ENRICHED, roll_id=roll_id, season_id=season_id)
+        status = values['enrichment_status']
+    else:
+        status = db.session.query(Roll.enrichment_status).filter_by(id=roll_id).scalar()
+    # Also keeps the TMDB cache entries written by the lookup
+    db.session.commit()
+    return status
+
+
+class _EnrichmentExecutor:  # pylint: disable=too-few-public-methods
+    """
+    Thread pool running enrich_roll, bounded to ENRICHMENT_QUEUE_SIZE rolls.
+
+    A roll is queued at most once per worker at a time. Rolls that do not
+    fit stay pending and are picked up by requeue_stale_enrichments().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._queued = set()
+
+    def submit(self, app, roll_id):
+        """Queue roll_id; returns False if the queue is full."""
+        with self._lock:
+            if roll_id in self._queued:
+                return True
+            if len(self._queued) >= app.config['ENRICHMENT_QUEUE_SIZE']:
+                return False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=app.config['ENRICHMENT_WORKERS'],
+                    thread_name_prefix='enrichment'
+                )
+            self._queued.add(roll_id)
+
+        self._executor.submit(self._run, app, roll_id)
+        return True
+
+    def _run(self, app, roll_id):
+        try:
+            with app.app_context():
+                enrich_roll(roll_id)
+        except Exception:  # pylint: disable=broad-exception-caught
+            print(f"Error enriching roll {roll_id}:")
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self._queued.discard(roll_id)
+
+
+_executor = _EnrichmentExecutor()
+
+
+def mark_enrichment_pending(roll):
+    """
+    Flag a roll for enrichment in the caller's transaction.
+
+    Args:
+        roll: Roll to enrich once committed
+
+    Returns:
+        False (leaving the roll unchanged) if no TMDB API key is configured
+    """
+    if not current_app.config.get('TMDB_API_KEY'):
+        return False
+    roll.enrichment_status = ENRICHMENT_PENDING
+    roll.enrichment_updated_at = datetime.utcnow()
+    return True
+
+
+def queue_enrichment(roll_id):
+    """
+    Enrich a committed, pending roll in the background.
+
+    With ENRICHMENT_WORKERS set to 0 the roll is enriched before returning.
+
+    Args:
+        roll_id: ID of the roll
+
+    Returns:
+        False if the queue is full; the roll then stays pending until
+        requeue_stale_enrichments() picks it up
+    """
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    if app.config['ENRICHMENT_WORKERS'] <= 0:
+        # Background work done inline; not part of the calling view's budget
+        with unbudgeted():
+            enrich_roll(roll_id)
+        return True
+    return _executor.submit(app, roll_id)
+
+
+def requeue_stale_enrichments():
+    """
+    Queue rolls left pending for ENRICHMENT_RETRY_AFTER seconds.
+
+    Covers rolls queued by a worker that has since restarted and rolls that
+    did not fit in the queue. Each roll is claimed with a conditional update
+    so only one worker requeues it.
+
+    Returns:
+        Number of rolls queued
+    """
+    stale_before = datetime.utcnow() - timedelta(
+        seconds=current_app.config['ENRICHMENT_RETRY_AFTER']
+    )
+    stale = db.session.query(Roll.id, Roll.season_id, Roll.enrichment_updated_at).filter(
+        Roll.enrichment_status == ENRICHMENT_PENDING,
+        Roll.enrichment_updated_at < stale_before
+    ).order_by(Roll.id).limit(current_app.config['ENRICHMENT_QUEUE_SIZE']).all()
+
+    claimed, seasons = [], set()
+    for roll_id, season_id, updated_at in stale:
+        claimed_rows = Roll.query.filter_by(
+            id=roll_id, enrichment_status=ENRICHMENT_PENDING,
+            enrichment_updated_at=updated_at
+        ).update({'enrichment_updated_at': datetime.utcnow()},
+                 synchronize_session=False)
+        if claimed_rows:
+            claimed.append(roll_id)
+            seasons.add(season_id)
+    if claimed:
+        rolls_changed(*seasons)
+    db.session.commit()
+
+    return sum(1 for roll_id in claimed if queue_enrichment(roll_id))
+
+
+def run_scheduled_requeue():
+    """Background task entry point: requeue stale rolls and print a summary."""
+    queued = requeue_stale_enrichments()
+    if queued:
+        print(f"Requeued enrichment of {queued} pending roll(s)")
+
+
+# Arbitrary key for the Postgres advisory lock that keeps two backfills
+# from running at once
+BACKFILL_LOCK_KEY = 4_640_003
+
+
+def _unenriched_rolls(after_id, batch_size, retry_failed):
+    """
+    Next batch of (id, movie_title, season_id, enrichment_status) without
+    TMDB data, in id order.
+    """
+    query = db.session.query(
+        Roll.id, Roll.movie_title, Roll.season_id, Roll.enrichment_status
+    ).filter(
+        Roll.tmdb_id.is_(None), Roll.id > after_id
+    )
+    if not retry_failed:
+        query = query.filter(db.or_(
+            Roll.enrichment_status.is_(None), Roll.enrichment_status != ENRICHMENT_FAILED
+        ))
+    return query.order_by(Roll.id).limit(batch_size).all()
+
+
+def _lookup_titles(app, titles, executor):
+    """Enrich each title on the executor; returns {title: movie data or None}."""
+    def lookup(title):
+        with app.app_context():
+            tmdb_data = enrich_movie_data(title)
+            # Keep the TMDB cache entries written by the lookup
+            db.session.commit()
+            return tmdb_data
+
+    return dict(zip(titles, executor.map(lookup, titles)))
+
+
+def _apply_results(batch, results):
+    """
+    Write lookup results to a batch of rolls in one transaction.
+
+    Rolls given a tmdb_id or a new enrichment status since the batch was
+    read (corrected by hand, or queued by POST /api/rolls/<id>/enrich) are
+    left alone.
+
+    Returns:
+        Tuple of the number of rolls enriched, failed and skipped
+    """
+    now = datetime.utcnow()
+    enriched = failed = 0
+    seasons = set()
+    for roll_id, title, season_id, status in batch:
+        tmdb_data = results[title]
+        values = {'enrichment_status': ENRICHMENT_FAILED, 'enrichment_updated_at': now}
+        if tmdb_data:
+            values.update(tmdb_id=tmdb_data.get('tmdb_id'), tmdb_data=tmdb_data,
+                          enrichment_status=ENRICHMENT_DONE)
+        updated = Roll.query.filter(
+            Roll.id == roll_id,
+            Roll.tmdb_id.is_(None),
+            Roll.enrichment_status.is_not_distinct_from(status)
+        ).update(values, synchronize_session=False)
+        if not updated:
+            continue
+        if tmdb_data:
+            enriched += 1
+        else:
+            failed += 1
+        seasons.add(season_id)
+        publish(ROLL_ENRICHED, roll_id=roll_id, season_id=season_id)
+    if seasons:
+        rolls_changed(*seasons)
+    db.session.commit()
+    return enriched, failed, len(batch) - enriched - failed
+
+
+def backfill_enrichment(*, batch_size=100, concurrency=4, after_id=0,  # pylint: disable=too-many-arguments
+                        limit=None, retry_failed=False, progress=None):
+    """
+    Enrich every roll without TMDB data, a batch at a time.
+
+    Rolls are read in id order, titles are looked up once per batch across
+    concurrency threads (the shared TMDB client keeps them within
+    TMDB_RATE_LIMIT), and each batch is committed in one transaction.
+    Enriched rolls drop out of the query, so rerunning resumes; after_id
+    skips ahead explicitly.
+
+    Args:
+        batch_size: Rolls per batch and transaction
+        concurrency: TMDB lookups in flight at once
+        after_id: Only rolls with a greater id
+        limit: Stop after this many rolls
+        retry_failed: Include rolls whose enrichment already failed
+        progress: Optional callable receiving the report after every batch
+
+    Returns:
+        Report with rolls processed, enriched, failed and skipped (changed
+        while being looked up), distinct titles looked up, the last roll id
+        and the elapsed seconds
+    """
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    started = time.perf_counter()
+    report = {'processed': 0, 'enriched': 0, 'failed': 0, 'skipped': 0, 'titles': 0,
+              'last_id': after_id, 'elapsed_s': 0.0}
+
+    with ThreadPoolExecutor(max_workers=concurrency,
+                            thread_name_prefix='backfill') as executor:
+        while limit is None or report['processed'] < limit:
+            size = batch_size if limit is None else min(batch_size, limit - report['processed'])
+            batch = _unenriched_rolls(report['last_id'], size, retry_failed)
+            if not batch:
+                break
+            # The lookups run in other sessions; don't hold this one open
+            db.session.commit()
+
+            results = _lookup_titles(
+                app, sorted({title for _id, title, _season_id, _status in batch}), executor
+            )
+
+            for key, count in zip(('enriched', 'failed', 'skipped'),
+                                  _apply_results(batch, results)):
+                report[key] += count
+            report['processed'] += len(batch)
+            report['titles'] += len(results)
+            report['last_id'] = batch[-1][0]
+            report['elapsed_s'] = round(time.perf_counter() - started, 1)
+            if progress:
+                progress(dict(report))
+
+    report['elapsed_s'] = round(time.perf_counter() - started, 1)
+    return report
+
+
+def run_backfill(**kwargs):
+    """
+    Run backfill_enrichment() unless another process is already backfilling.
+
+    On Postgres an advisory lock is held for the duration; other databases
+    have no cross-process guard.
+
+    Returns:
+        The backfill report, or None if another process holds the lock
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return backfill_enrichment(**kwargs)
+
+    with db.engine.connect() as lock_conn:
+        locked = lock_conn.execute(
+            text('SELECT pg_try_advisory_lock(:key)'), {'key': BACKFILL_LOCK_KEY}
+        ).scalar()
+        if not locked:
+            return None
+        try:
+            return backfill_enrichment(**kwargs)
+        finally:
+            lock_conn.execute(text('SELECT pg_advisory_unlock(:key)'),
+                              {'key': BACKFILL_LOCK_KEY})
+
+
+def count_unenriched_rolls():
+    """Number of rolls without TMDB data, split by enrichment status."""
+    counts = db.session.query(Roll.enrichment_status, db.func.count(Roll.id))\
+        .filter(Roll.tmdb_id.is_(None))\
+        .group_by(Roll.enrichment_status)
+    return {status or 'never': count for status, count in counts}
+
+
+class _BackfillJob:
+    """The backfill started from the admin API in this worker, if any."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {'running': False, 'progress': None, 'result': None}
+
+    def start(self, app, **kwargs):
+        """Start a backfill on a background thread; returns False if one is running."""
+        with self._lock:
+            if self._state['running']:
+                return False
+            self._state = {'running': True, 'progress': None, 'result': None,
+                           'options': kwargs, 'started_at': datetime.utcnow().isoformat()}
+
+        def update(progress):
+            with self._lock:
+                self._state['progress'] = progress
+
+        def run():
+            result = None
+            try:
+                with app.app_context():
+                    result = run_backfill(progress=update, **kwargs)
+                    if result is None:
+                        result = {'error': 'Another process is already backfilling'}
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                print("Error in TMDB backfill:")
+                traceback.print_exc()
+                result = {'error': str(e)}
+            finally:
+                with self._lock:
+                    self._state.update(running=False, result=result)
+
+        threading.Thread(target=run, name='tmdb-backfill', daemon=True).start()
+        return True
+
+    def status(self):
+        """Copy of the job state."""
+        with self._lock:
+            return dict(self._state)
+
+
+_backfill_job = _BackfillJob()
+
+
+def start_backfill(**kwargs):
+    """
+    Start run_backfill() on a background thread of this worker.
+
+    Returns:
+        False if this worker is already running one
+    """
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    return _backfill_job.start(app, **kwargs)
+
+
+def get_backfill_status():
+    """This worker's backfill state plus the rolls still without TMDB data."""
+    status = _backfill_job.status()
+    status['unenriched'] = count_unenriched_rolls()
+    return status
@@ -0,0 +1,268 @@
+"""Live roll and season events for /api/events, shared across workers via Postgres NOTIFY."""
+import json
+import queue
+import select
+import threading
+import time
+import traceback
+
+from flask import current_app
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, joinedload
+
+from models import db, Roll
+
+
+# Postgres channel every worker LISTENs on
+CHANNEL = 'movie_night_events'
+
+ROLL_CREATED = 'roll_created'
+ROLL_UPDATED = 'roll_updated'
+ROLL_ENRICHED = 'roll_enriched'
+ROLL_DELETED = 'roll_deleted'
+ROSTER_RESET = 'roster_reset'
+SEASONS_CHANGED = 'seasons_changed'
+# Sent when events may have been missed (e.g. the LISTEN connection dropped);
+# clients reload instead of patching their view
+RESYNC = 'resync'
+# Events published with a roll_id and sent with the roll's to_dict()
+ROLL_EVENTS = frozenset({ROLL_CREATED, ROLL_UPDATED, ROLL_ENRICHED})
+
+# Messages a slow client may fall behind by before it is disconnected
+SUBSCRIBER_QUEUE_SIZE = 100
+# Milliseconds browsers wait before reconnecting a dropped stream
+CLIENT_RETRY_MS = 3000
+# Seconds between checks that the LISTEN connection is still alive, and
+# before reconnecting it after an error
+LISTEN_HEALTH_CHECK = 30
+LISTEN_RECONNECT_DELAY = 5
+
+_PENDING_KEY = 'pending_events'
+
+
+def publish(name, **data):
+    """
+    Send an event to /api/events subscribers once the current transaction commits.
+
+    On Postgres the event is a NOTIFY in the caller's transaction, delivered
+    to every worker on commit and dropped on rollback. Other databases only
+    reach this worker's subscribers, after commit.
+
+    Args:
+        name: Event name, e.g. ROLL_CREATED
+        data: JSON-serializable fields; roll events need roll_id
+    """
+    payload = json.dumps({'event': name, **data})
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_notify(:channel, :payload)'),
+                           {'channel': CHANNEL, 'payload': payload})
+    else:
+        db.session.info.setdefault(_PENDING_KEY, []).append(payload)
+
+
+class _Subscription:  # pylint: disable=too-few-public-methods
+    """Messages waiting to be sent to one /api/events client."""
+
+    def __init__(self):
+        self.queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = False
+
+
+class EventBroker:
+    """
+    Fans events out to this worker's /api/events streams.
+
+    A single listener thread receives events, on Postgres over one
+    dedicated LISTEN connection outside the pool, loads the rolls they
+    refer to once, and queues the formatted messages for every subscriber.
+    The thread starts with the first subscriber.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._local_events = queue.Queue()
+        self._app = None
+        self._listener = None
+
+    def init_app(self, app):
+        """Remember the app the listener thread works in."""
+        self._app = app
+
+    def subscribe(self):
+        """Register a client and return its subscription."""
+        with self._lock:
+            subscription = _Subscription()
+            self._subscribers.add(subscription)
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name='event-listener', daemon=True
+                )
+                self._listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Forget a client whose stream has closed."""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        """Number of clients connected to this worker."""
+        with self._lock:
+            return len(self._subscribers)
+
+    def deliver_local(self, payloads):
+        """Queue payloads committed in this worker (databases without NOTIFY)."""
+        if self.subscriber_count():
+            self._local_events.put(payloads)
+
+    def format_message(self, name, data):
+        """Format one Server-Sent Events message."""
+        return f'event: {name}\ndata: {self._app.json.dumps(data)}\n\n'
+
+    def _broadcast(self, messages):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                for message in messages:
+                    subscription.queue.put_nowait(message)
+            except queue.Full:
+                # Too far behind; it reconnects and resyncs
+                subscription.dropped = True
+                self.unsubscribe(subscription)
+
+    def _dispatch(self, payloads):
+        """Turn event payloads into SSE messages and broadcast them."""
+        if not self.subscriber_count():
+            return
+        events = [json.loads(payload) for payload in payloads]
+        roll_ids = {e['roll_id'] for e in events if e['event'] in ROLL_EVENTS}
+
+        with self._app.app_context():
+            rolls = {}
+            if roll_ids:
+                rolls = {roll.id: roll.to_dict() for roll in Roll.query.options(
+                    joinedload(Roll.participant)
+                ).filter(Roll.id.in_(roll_ids))}
+
+            messages = []
+            for data in events:
+                name = data.pop('event')
+                if name in ROLL_EVENTS:
+                    data = rolls.get(data['roll_id'])
+                    if data is None:
+                        # Deleted since; its roll_deleted event follows
+                        continue
+                messages.append(self.format_message(name, data))
+        self._broadcast(messages)
+
+    def _listen(self):
+        """Listener thread: receive events and dispatch them, forever."""
+        with self._app.app_context():
+            engine = db.engine
+        if engine.dialect.name != 'postgresql':
+            while True:
+                self._run_safely(self._dispatch, self._local_events.get())
+
+        reconnecting = False
+        while True:
+            connection = None
+            try:
+                connection = self._connect_listener(engine)
+                if reconnecting:
+                    self._broadcast([self.format_message(RESYNC, {})])
+                self._receive(connection)
+            except Exception:  # pylint: disable=broad-exception-caught
+                print("Event listener connection failed, reconnecting:")
+                traceback.print_exc()
+            finally:
+                if connection is not None:
+                    connection.close()
+            reconnecting = True
+            time.sleep(LISTEN_RECONNECT_DELAY)
+
+    @staticmethod
+    def _connect_listener(engine):
+        """Open an unpooled autocommit connection LISTENing on CHANNEL."""
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        connection = engine.dialect.connect(*cargs, **cparams)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        return connection
+
+    def _receive(self, connection):
+        """Dispatch notifications from connection until it fails."""
+        while True:
+            readable, _writable, _errors = select.select(
+                [connection], [], [], LISTEN_HEALTH_CHECK
+            )
+            if not readable:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            connection.poll()
+            if connection.notifies:
+                payloads = [notify.payload for notify in connection.notifies]
+                connection.notifies.clear()
+                self._run_safely(self._dispatch, payloads)
+
+    @staticmethod
+    def _run_safely(func, *args):
+        try:
+            func(*args)
+        except Exception:  # pylint: disable=broad-exception-caught
+            print("Error dispatching events:")
+            traceback.print_exc()
+
+
+broker = EventBroker()
+
+
+def stream_events():
+    """
+    Generate the /api/events stream for one client.
+
+    Returns None instead if EVENTS_MAX_SUBSCRIBERS clients are already
+    connected to this worker. The generator holds no database connection
+    or app context while it waits, and sends a comment every
+    EVENTS_KEEPALIVE seconds so proxies keep the connection open. It ends
+    if the client falls too far behind; browsers then reconnect on their
+    own.
+    """
+    if broker.subscriber_count() >= current_app.config['EVENTS_MAX_SUBSCRIBERS']:
+        return None
+    keepalive = current_app.config['EVENTS_KEEPALIVE']
+
+    def generate():
+        # Subscribed here so the finally clause always unsubscribes
+        subscription = broker.subscribe()
+        try:
+            yield f'retry: {CLIENT_RETRY_MS}\n\n'
+            while not subscription.dropped:
+                try:
+                    yield subscription.queue.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+
+    return generate()
+
+
+def _deliver_pending(session):
+    payloads = session.info.pop(_PENDING_KEY, None)
+    if payloads:
+        broker.deliver_local(payloads)
+
+
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_events(app):
+    """Set up the event broker for app."""
+    broker.init_app(app)
+    if not event.contains(Session, 'after_commit', _deliver_pending):
+        event.listen(Session, 'after_commit', _deliver_pending)
+        event.listen(Session, 'after_rollback', _discard_pending)
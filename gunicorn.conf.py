@@ -0,0 +1,11 @@
+"""Gunicorn hooks; the rest of the settings are on the command line in the Dockerfile."""
+import os
+import shutil
+
+
+def on_starting(_server):
+    """Start every run with an empty Prometheus multiprocess directory."""
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
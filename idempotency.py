@@ -0,0 +1,155 @@
+"""Idempotency-Key support for mutating API endpoints."""
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+
+from models import db, dialect_insert, IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+# Seconds a key stays claimed by a request that has not answered yet; a
+# worker that dies mid-request frees its keys after this
+PENDING_TIMEOUT = 300
+
+
+def _request_hash():
+    """SHA-256 of the current request's method, path and body."""
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode('utf-8'))
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _claim(key, request_hash):
+    """
+    Record key as in progress, unless a live record for it already exists.
+
+    Expired records, and claims abandoned for PENDING_TIMEOUT seconds, are
+    taken over. The claim is committed at once so concurrent requests with
+    the same key see it.
+
+    Returns:
+        True if this request now owns key
+    """
+    now = datetime.utcnow()
+    claim = {
+        'request_hash': request_hash,
+        'status_code': None,
+        'content_type': None,
+        'response_body': None,
+        'created_at': now,
+        'expires_at': now + timedelta(seconds=PENDING_TIMEOUT),
+    }
+    stmt = dialect_insert(IdempotencyKey).values(key=key, **claim)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['key'], set_=claim, where=IdempotencyKey.expires_at < now
+    )
+    claimed = db.session.execute(stmt).rowcount == 1
+    db.session.commit()
+    return claimed
+
+
+def _store(key, response):
+    """Save the response to the request that claimed key."""
+    db.session.query(IdempotencyKey).filter_by(key=key).update({
+        'status_code': response.status_code,
+        'content_type': response.content_type,
+        'response_body': response.get_data(),
+        'expires_at': datetime.utcnow() + timedelta(
+            seconds=current_app.config['IDEMPOTENCY_KEY_TTL']
+        ),
+    })
+    db.session.commit()
+
+
+def _release(key):
+    """Forget the claim on key so the request can be retried."""
+    db.session.rollback()
+    db.session.query(IdempotencyKey).filter_by(key=key).delete()
+    db.session.commit()
+
+
+def _replay(record):
+    """Rebuild the stored response of record."""
+    response = current_app.response_class(
+        record.response_body, status=record.status_code, content_type=record.content_type
+    )
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Let clients retry a mutating view safely with an Idempotency-Key header.
+
+    The first request with a key runs the view and its response is stored
+    for IDEMPOTENCY_KEY_TTL seconds. Requests repeating the key get the
+    stored response back, marked with Idempotent-Replayed: true, without
+    running the view again. Reusing a key for a different method, path or
+    body is rejected with 422, and a repeat arriving while the first
+    request is still running gets 409.
+
+    Responses that ask the client to try again (409 and 5xx), and views
+    that raise, are not stored, so a retry with the same key runs the
+    view again. Requests without the header are not affected.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({
+                'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'
+            }), 400
+
+        request_hash = _request_hash()
+        if not _claim(key, request_hash):
+            # None if the owner released the key since; the client retries
+            record = db.session.get(IdempotencyKey, key)
+            if record is not None and record.request_hash != request_hash:
+                return jsonify({
+                    'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'
+                }), 422
+            if record is not None and record.status_code is not None:
+                return _replay(record)
+            return jsonify({
+                'error': f'A request with this {IDEMPOTENCY_HEADER} is still in progress'
+            }), 409, {'Retry-After': '1'}
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(key)
+            raise
+
+        if response.status_code == 409 or response.status_code >= 500:
+            _release(key)
+        else:
+            _store(key, response)
+        return response
+    return wrapper
+
+
+def prune_idempotency_keys():
+    """
+    Delete expired idempotency records.
+
+    Returns:
+        Number of records deleted
+    """
+    deleted = IdempotencyKey.query.filter(
+        IdempotencyKey.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def run_scheduled_prune():
+    """Background task entry point: prune expired keys and print a summary."""
+    deleted = prune_idempotency_keys()
+    if deleted:
+        print(f"Pruned {deleted} expired idempotency keys")
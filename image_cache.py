@@ -0,0 +1,408 @@
+"""Local, content-addressed cache of TMDB poster and backdrop images."""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import requests
+from flask import current_app
+from sqlalchemy import func
+
+from metrics import record_cache, timed, upstream_call
+from models import db, dialect_insert, ImageCacheEntry, Roll, TMDBCacheEntry
+from versions import get_version, ROLLS_SCOPE
+
+
+# TMDB renditions that may be cached. TMDB serves each image pre-resized in
+# these widths, so thumbnails are fetched rather than generated locally, and
+# 'original' (often several MB) is never served
+IMAGE_SIZES = frozenset({'w92', 'w154', 'w185', 'w342', 'w500', 'w780', 'w1280'})
+POSTER_SIZE = 'w500'
+POSTER_THUMB_SIZE = 'w342'
+BACKDROP_SIZE = 'w1280'
+
+# TMDB image file names, e.g. "/kqjL17yufvn9OVLyXYpvtyrFfak.jpg"
+IMAGE_PATH_PATTERN = re.compile(r'^/[A-Za-z0-9_-]+\.(?:jpg|jpeg|png|webp)$')
+TMDB_IMAGE_URL_PATTERN = re.compile(
+    r'^https?://image\.tmdb\.org/t/p/[a-z0-9]+(?P<path>/[^/?#]+)$'
+)
+
+# Images larger than this are not cached
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+# Access times are only rewritten when older than this, so serving a cached
+# image does not cost a database write every time
+ACCESS_UPDATE_INTERVAL = timedelta(hours=1)
+# Entries read per query while pruning
+PRUNE_BATCH_SIZE = 500
+# Seconds a worker reuses its set of linked images while rolls are
+# unchanged (cached TMDB lookups do not bump a version)
+LINKED_IMAGES_TTL = 60
+# Keys of enrichment payloads holding local image URLs
+IMAGE_URL_KEYS = ('poster_url', 'poster_thumb_url', 'backdrop_url')
+
+
+class ImageNotFoundError(Exception):
+    """Raised when TMDB has no image at the requested path."""
+
+
+class ImageUnavailableError(Exception):
+    """Raised when an uncached image cannot be fetched from TMDB."""
+
+
+class ImageNotReferencedError(ImageUnavailableError):
+    """Raised when no roll or cached TMDB lookup links to an uncached image."""
+
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+_session = requests.Session()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+    record_cache('images', name)
+
+
+def is_valid_image(size, path):
+    """Whether size and path name a cacheable TMDB image."""
+    return size in IMAGE_SIZES and bool(IMAGE_PATH_PATTERN.match(path))
+
+
+def image_url(path, size):
+    """
+    Local URL of a TMDB image variant.
+
+    Args:
+        path: Image path from TMDB, e.g. a details response's poster_path
+        size: One of IMAGE_SIZES
+
+    Returns:
+        URL served by the /images route, or None without a path
+    """
+    if not path:
+        return None
+    return f'/images/{size}{path}'
+
+
+def source_url(size, path):
+    """URL of the image on TMDB's image server."""
+    return f"{current_app.config['IMAGE_SOURCE_URL']}/{size}{path}"
+
+
+def localize_image_urls(tmdb_data):
+    """
+    Point the image URLs of an enrichment payload stored by older versions
+    (direct image.tmdb.org links) at the local image cache.
+
+    Args:
+        tmdb_data: Enrichment dictionary, or None
+
+    Returns:
+        The payload with local poster, poster thumbnail and backdrop URLs
+    """
+    if not isinstance(tmdb_data, dict):
+        return tmdb_data
+
+    localized = dict(tmdb_data)
+    for key, size in (('poster_url', POSTER_SIZE), ('backdrop_url', BACKDROP_SIZE)):
+        match = TMDB_IMAGE_URL_PATTERN.match(tmdb_data.get(key) or '')
+        if match:
+            localized[key] = image_url(match.group('path'), size)
+            if key == 'poster_url':
+                localized['poster_thumb_url'] = image_url(match.group('path'),
+                                                          POSTER_THUMB_SIZE)
+    return localized
+
+
+def _cache_dir():
+    return os.path.abspath(current_app.config['IMAGE_CACHE_DIR'])
+
+
+def _blob_path(content_hash):
+    """File holding the image with this SHA-256, fanned out by its first byte."""
+    return os.path.join(_cache_dir(), content_hash[:2], content_hash)
+
+
+def _download(size, path):
+    """
+    Stream an image from TMDB into the cache directory.
+
+    The file is hashed while it is written and then moved to its
+    content-addressed name, so readers never see a partial file.
+
+    Returns:
+        Tuple of (content hash, content type, byte size)
+    """
+    try:
+        response = _session.get(source_url(size, path), stream=True,
+                                timeout=current_app.config['TMDB_TIMEOUT'])
+    except requests.exceptions.RequestException as e:
+        raise ImageUnavailableError(str(e)) from e
+
+    with response:
+        if response.status_code == 404:
+            raise ImageNotFoundError(path)
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+        if response.status_code != 200 or not content_type.startswith('image/'):
+            raise ImageUnavailableError(
+                f'TMDB answered {response.status_code} ({content_type or "no type"})'
+            )
+
+        os.makedirs(_cache_dir(), exist_ok=True)
+        digest = hashlib.sha256()
+        byte_size = 0
+        with tempfile.NamedTemporaryFile(dir=_cache_dir(), prefix='.download-',
+                                         delete=False) as tmp:
+            try:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    byte_size += len(chunk)
+                    if byte_size > MAX_IMAGE_BYTES:
+                        raise ImageUnavailableError(f'{path} is larger than '
+                                                    f'{MAX_IMAGE_BYTES} bytes')
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            except (requests.exceptions.RequestException, ImageUnavailableError) as e:
+                tmp.close()
+                os.unlink(tmp.name)
+                if isinstance(e, ImageUnavailableError):
+                    raise
+                raise ImageUnavailableError(str(e)) from e
+
+    content_hash = digest.hexdigest()
+    blob = _blob_path(content_hash)
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+    os.replace(tmp.name, blob)
+    return content_hash, content_type, byte_size
+
+
+class _LinkedImages:  # pylint: disable=too-few-public-methods
+    """
+    Local URLs of every image a roll's enrichment or a cached TMDB lookup
+    links to, with the rolls version they were read at.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._urls = frozenset()
+        self._version = None
+        self._loaded_at = 0.0
+
+    def contains(self, url):
+        """
+        Whether url is linked, re-reading the links only after rolls changed
+        or LINKED_IMAGES_TTL passed.
+        """
+        version = get_version(ROLLS_SCOPE)
+        with self._lock:
+            if (self._version == version
+                    and time.monotonic() - self._loaded_at < LINKED_IMAGES_TTL):
+                return url in self._urls
+
+        urls = frozenset(
+            payload[key]
+            for column in (Roll.tmdb_data, TMDBCacheEntry.payload)
+            for (payload,) in db.session.query(column).filter(column.isnot(None))
+            if isinstance(payload, dict)
+            for key in IMAGE_URL_KEYS if payload.get(key)
+        )
+        with self._lock:
+            self._urls, self._version, self._loaded_at = urls, version, time.monotonic()
+        return url in urls
+
+
+_linked_images = _LinkedImages()
+
+
+def _is_referenced(size, path):
+    """
+    Whether a roll's enrichment or a cached TMDB lookup links to an image.
+
+    Only such images are downloaded, so /images cannot be used to fill the
+    cache with arbitrary TMDB files. Each worker keeps the set of linked
+    images, so most checks cost one primary key lookup of the rolls
+    version rather than a scan of the enrichment payloads.
+    """
+    return _linked_images.contains(image_url(path, size))
+
+
+def _store(size, path, content_hash, content_type, byte_size):
+    """Record a downloaded image, replacing any older entry for the variant."""
+    now = datetime.utcnow()
+    statement = dialect_insert(ImageCacheEntry).values(
+        size=size,
+        source_path=path,
+        content_hash=content_hash,
+        content_type=content_type,
+        byte_size=byte_size,
+        fetched_at=now,
+        last_accessed_at=now
+    )
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[ImageCacheEntry.size, ImageCacheEntry.source_path],
+        set_={
+            'content_hash': statement.excluded.content_hash,
+            'content_type': statement.excluded.content_type,
+            'byte_size': statement.excluded.byte_size,
+            'fetched_at': now,
+            'last_accessed_at': now
+        }
+    ))
+    db.session.commit()
+
+
+def get_cached_image(size, path):
+    """
+    Return a cached image variant, fetching it from TMDB on first use.
+
+    Only images linked from a roll or a cached TMDB lookup are fetched. The
+    cache is kept under IMAGE_CACHE_MAX_MB by the scheduled prune, not here.
+
+    Args:
+        size: One of IMAGE_SIZES
+        path: TMDB image path, e.g. "/abc.jpg"
+
+    Returns:
+        Tuple of (file path, content type, content hash)
+
+    Raises:
+        ImageNotFoundError: TMDB has no such image
+        ImageNotReferencedError: The image is not cached and nothing links to it
+        ImageUnavailableError: The image is not cached and TMDB could not be reached
+    """
+    entry = ImageCacheEntry.query.filter_by(size=size, source_path=path).first()
+    if entry is not None and os.path.exists(_blob_path(entry.content_hash)):
+        _count('hits')
+        if entry.last_accessed_at < datetime.utcnow() - ACCESS_UPDATE_INTERVAL:
+            entry.last_accessed_at = datetime.utcnow()
+            db.session.commit()
+        return _blob_path(entry.content_hash), entry.content_type, entry.content_hash
+
+    if entry is None and not _is_referenced(size, path):
+        _count('unreferenced')
+        raise ImageNotReferencedError(f'{size}{path} is not linked from any roll')
+
+    _count('misses')
+    # Release the connection while waiting on TMDB
+    db.session.commit()
+    try:
+        with timed('images'), upstream_call('images', 'download'):
+            content_hash, content_type, byte_size = _download(size, path)
+    except (ImageNotFoundError, ImageUnavailableError):
+        _count('errors')
+        raise
+    _store(size, path, content_hash, content_type, byte_size)
+    return _blob_path(content_hash), content_type, content_hash
+
+
+def _max_bytes():
+    return current_app.config['IMAGE_CACHE_MAX_MB'] * 1024 * 1024
+
+
+def _total_bytes():
+    return db.session.query(
+        func.coalesce(func.sum(ImageCacheEntry.byte_size), 0)
+    ).scalar()
+
+
+def get_image_cache_stats():
+    """
+    Get this worker's hit/miss counters and the size of the shared cache.
+
+    Returns:
+        Dictionary of counters, hit ratio, entry count and byte totals
+    """
+    with _counters_lock:
+        counters = dict(_counters)
+    lookups = counters.get('hits', 0) + counters.get('misses', 0)
+
+    entries, files = db.session.query(
+        func.count(ImageCacheEntry.id),
+        func.count(ImageCacheEntry.content_hash.distinct())
+    ).one()
+
+    return {
+        'hits': counters.get('hits', 0),
+        'misses': counters.get('misses', 0),
+        'errors': counters.get('errors', 0),
+        'unreferenced': counters.get('unreferenced', 0),
+        'hit_ratio': round(counters.get('hits', 0) / lookups, 3) if lookups else None,
+        'entries': entries,
+        'files': files,
+        'bytes': _total_bytes(),
+        'max_bytes': _max_bytes()
+    }
+
+
+def prune_image_cache(max_bytes=None):
+    """
+    Evict the least recently used images until the cache fits in max_bytes.
+
+    Entries are read oldest first, PRUNE_BATCH_SIZE at a time, and deleted
+    first and committed; files no other entry refers to
+    are removed afterwards. A file removed while another worker re-adds the
+    same image is simply fetched again on its next request.
+
+    Args:
+        max_bytes: Size to shrink to; defaults to IMAGE_CACHE_MAX_MB
+
+    Returns:
+        Dictionary with the number of evicted entries, removed files and
+        freed bytes, and the entries and bytes remaining
+    """
+    if max_bytes is None:
+        max_bytes = _max_bytes()
+
+    excess = _total_bytes() - max_bytes
+    evicted_ids, evicted_hashes, freed = [], set(), 0
+    while freed < excess:
+        least_recent = db.session.query(
+            ImageCacheEntry.id, ImageCacheEntry.content_hash, ImageCacheEntry.byte_size
+        ).order_by(ImageCacheEntry.last_accessed_at, ImageCacheEntry.id)\
+            .limit(PRUNE_BATCH_SIZE).all()
+        if not least_recent:
+            break
+        batch_ids = []
+        for entry_id, content_hash, byte_size in least_recent:
+            if freed >= excess:
+                break
+            batch_ids.append(entry_id)
+            evicted_hashes.add(content_hash)
+            freed += byte_size
+        ImageCacheEntry.query.filter(ImageCacheEntry.id.in_(batch_ids))\
+            .delete(synchronize_session=False)
+        evicted_ids.extend(batch_ids)
+
+    still_used = {
+        content_hash for (content_hash,) in db.session.query(ImageCacheEntry.content_hash)
+        .filter(ImageCacheEntry.content_hash.in_(evicted_hashes)).distinct()
+    } if evicted_hashes else set()
+    db.session.commit()
+
+    removed = 0
+    for content_hash in evicted_hashes - still_used:
+        try:
+            os.unlink(_blob_path(content_hash))
+            removed += 1
+        except FileNotFoundError:
+            pass
+
+    return {
+        'evicted': len(evicted_ids),
+        'files_removed': removed,
+        'freed_bytes': freed,
+        'entries': ImageCacheEntry.query.count(),
+        'bytes': _total_bytes()
+    }
+
+
+def run_scheduled_prune():
+    """Background task entry point: prune the cache and print a summary."""
+    result = prune_image_cache()
+    if result['evicted']:
+        print(f"Pruned image cache: {result['evicted']} evicted, "
+              f"{result['freed_bytes']} bytes freed, {result['bytes']} bytes remaining")
@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
 """Database initialization script for Movie Night Web."""
 
+import os
 import sys
+
+# Scripts share the web app's setup but must not start its background threads
+os.environ.setdefault('BACKGROUND_TASKS', 'false')
+
+# pylint: disable=wrong-import-position
 from app import app
 from database import init_db, seed_db, reset_db
 
@@ -0,0 +1,87 @@
+"""JSON provider writing ISO 8601 datetimes, backed by orjson when installed."""
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(o):
+    """Serialize dates and datetimes as ISO 8601, everything else as Flask does."""
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider, but with ISO 8601 dates instead of HTTP dates.
+
+    Models return datetimes from to_dict() and leave formatting to this
+    provider.
+    """
+
+    default = staticmethod(_default)
+
+    def response(self, *args, **kwargs):
+        """Serialize the arguments to a JSON response, timed as 'json'."""
+        with timed('json'):
+            return super().response(*args, **kwargs)
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider serializing with orjson.
+
+    orjson writes datetimes, dates and UUIDs itself, in the same ISO 8601
+    form as JSONProvider, and encodes straight to bytes. Keys are sorted
+    like the standard provider's, so responses only differ in writing
+    non-ASCII characters as UTF-8 rather than \\u escapes.
+    """
+
+    def _options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        """Serialize obj to a string; arguments orjson lacks use the stdlib."""
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        """Deserialize s; arguments orjson lacks use the stdlib."""
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Serialize the arguments to a JSON response without a str round trip."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        with timed('json'):
+            body = orjson.dumps(obj, default=_default, option=self._options(indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    """
+    Install the JSON provider selected by JSON_BACKEND.
+
+    'auto' uses orjson if it is installed, 'orjson' requires it and
+    'stdlib' always uses the json module.
+    """
+    backend = app.config['JSON_BACKEND']
+    if backend == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_BACKEND is 'orjson' but orjson is not installed")
+    use_orjson = backend == 'orjson' or (backend == 'auto' and orjson is not None)
+    app.json = OrjsonProvider(app) if use_orjson else JSONProvider(app)
@@ -0,0 +1,261 @@
+"""Prometheus metrics and a Server-Timing breakdown of every request."""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _prepare_multiprocess_dir():
+    """
+    Create PROMETHEUS_MULTIPROC_DIR if it is missing.
+
+    gunicorn.conf.py creates it for the server, but scripts importing the
+    app (init_db.py, dedupe_rolls.py, ...) would otherwise fail on their
+    first SQL statement. If it cannot be created, fall back to this
+    process's own registry. Must run before prometheus_client is imported,
+    which picks the value storage from the environment.
+    """
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not directory:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        del os.environ['PROMETHEUS_MULTIPROC_DIR']
+
+
+_prepare_multiprocess_dir()
+
+# pylint: disable=wrong-import-position
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+# pylint: enable=wrong-import-position
+
+
+# Route label of work done outside a request (background threads)
+BACKGROUND_ROUTE = 'background'
+
+_local = threading.local()
+
+
+class _Metrics:  # pylint: disable=too-few-public-methods
+    """
+    The app's Prometheus metrics.
+
+    Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py) so
+    every worker writes its values there and /metrics reports the sum over
+    all workers.
+    """
+
+    def __init__(self):
+        self.requests = prometheus_client.Counter(
+            'movie_night_requests_total', 'HTTP requests handled',
+            ['method', 'route', 'status']
+        )
+        self.request_seconds = prometheus_client.Histogram(
+            'movie_night_request_duration_seconds',
+            'Time from the start of a request to its response',
+            ['method', 'route']
+        )
+        self.upstream_seconds = prometheus_client.Histogram(
+            'movie_night_upstream_request_duration_seconds',
+            'Google Sheets and TMDB requests, one per attempt',
+            ['service', 'operation']
+        )
+        self.upstream_errors = prometheus_client.Counter(
+            'movie_night_upstream_errors_total',
+            'Google Sheets and TMDB requests that failed or answered an error',
+            ['service', 'operation']
+        )
+        self.db_queries = prometheus_client.Counter(
+            'movie_night_db_queries_total', 'SQL statements executed', ['route']
+        )
+        self.db_seconds = prometheus_client.Counter(
+            'movie_night_db_query_seconds_total', 'Time spent executing SQL statements',
+            ['route']
+        )
+        self.cache_lookups = prometheus_client.Counter(
+            'movie_night_cache_lookups_total',
+            "Cache outcomes as counted in each cache's own stats (hits, misses, ...)",
+            ['cache', 'result']
+        )
+
+
+_metrics = _Metrics() if prometheus_client is not None else None
+
+
+class _RequestTimings:
+    """Time spent in each part of one request, for the Server-Timing header."""
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, name, seconds):
+        """Add a timed section under name."""
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def header(self):
+        """Format the Server-Timing header value, ending with the total."""
+        entries = []
+        for name, seconds in self.durations.items():
+            entry = f'{name};dur={seconds * 1000:.1f}'
+            if name == 'db':
+                entry += f';desc="{self.counts[name]} queries"'
+            entries.append(entry)
+        total = time.perf_counter() - self.started
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def _current_timings():
+    """Timings of the request being handled on this thread, if any."""
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def timed(name):
+    """
+    Count the enclosed block under name in the current request's Server-Timing.
+
+    Outside a request this only runs the block. Sections may overlap, e.g.
+    'tmdb' includes the queries of the TMDB cache, which also count as 'db'.
+    """
+    timings = _current_timings()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def observe_upstream(service, operation, seconds, error=False):
+    """
+    Record one request to Google Sheets or TMDB.
+
+    Args:
+        service: 'sheets', 'tmdb' or 'images'
+        operation: API call, e.g. 'values.get' or 'search'
+        seconds: Duration of the request
+        error: Whether it failed or answered with an error status
+    """
+    if _metrics is None:
+        return
+    _metrics.upstream_seconds.labels(service, operation).observe(seconds)
+    if error:
+        _metrics.upstream_errors.labels(service, operation).inc()
+
+
+@contextmanager
+def upstream_call(service, operation):
+    """Time the enclosed request with observe_upstream(); exceptions count as errors."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        observe_upstream(service, operation, time.perf_counter() - started, error=True)
+        raise
+    observe_upstream(service, operation, time.perf_counter() - started)
+
+
+def record_cache(cache, result):
+    """
+    Count a cache lookup.
+
+    Args:
+        cache: Cache name, e.g. 'sheets'
+        result: Outcome as named in the cache's own stats, e.g. 'hits'
+    """
+    if _metrics is not None:
+        _metrics.cache_lookups.labels(cache, result).inc()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, _cursor, _statement, _parameters, _context, _executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _finish_statement(conn, _cursor, _statement, _parameters, _context, _executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    timings = _current_timings()
+    if timings is not None:
+        timings.add('db', seconds)
+    if _metrics is not None:
+        route = timings.route if timings is not None else BACKGROUND_ROUTE
+        _metrics.db_queries.labels(route).inc()
+        _metrics.db_seconds.labels(route).inc(seconds)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _fail_statement(context):
+    started = context.connection.info.get('metrics_started') if context.connection else None
+    if started:
+        started.pop()
+
+
+def render_metrics():
+    """
+    Render the metrics in the Prometheus text format.
+
+    Returns:
+        Tuple of (body, content type), or (None, None) if prometheus_client
+        is not installed or METRICS_ENABLED is off
+    """
+    if prometheus_client is None or not current_app.config['METRICS_ENABLED']:
+        return None, None
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def init_metrics(app):
+    """
+    Time every request for /metrics and the Server-Timing header.
+
+    Call before the other init_* hooks: after_request functions run in
+    reverse order, so the response is measured after compression. The
+    Server-Timing header is only added when SERVER_TIMING_HEADER is set.
+    """
+    @app.before_request
+    def start_request_timings():
+        rule = request.url_rule
+        _local.timings = _RequestTimings(rule.rule if rule is not None else 'unmatched')
+
+    @app.after_request
+    def finish_request_timings(response):
+        timings = _current_timings()
+        if timings is None:
+            return response
+        if app.config['SERVER_TIMING_HEADER']:
+            response.headers['Server-Timing'] = timings.header()
+        if _metrics is not None:
+            _metrics.requests.labels(request.method, timings.route,
+                                     str(response.status_code)).inc()
+            _metrics.request_seconds.labels(request.method, timings.route).observe(
+                time.perf_counter() - timings.started
+            )
+        return response
+
+    @app.teardown_request
+    def clear_request_timings(_exc):
+        _local.timings = None
@@ -0,0 +1,183 @@
+"""
+Schema migrations for databases created before a model change.
+
+db.create_all() creates missing tables (with their indexes) but never
+alters existing ones. Each change to an existing table is therefore also
+added here as a numbered migration. Migrations must be idempotent, because
+on a fresh database create_all() has usually done the work already.
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from image_cache import localize_image_urls
+from models import db, Roll, SchemaMigration, TMDBCacheEntry
+
+
+# Arbitrary key for the Postgres advisory lock that serializes gunicorn
+# workers migrating the same database at startup
+MIGRATION_LOCK_KEY = 4_640_002
+
+
+class MigrationError(RuntimeError):
+    """Raised when existing data has to be fixed by hand before a migration can run."""
+
+
+class Migration:  # pylint: disable=too-few-public-methods
+    """A numbered schema change applied with a database connection."""
+
+    def __init__(self, version, description, upgrade):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+
+
+def _001_roll_and_season_indexes(conn):
+    """Indexes for the roll history, roster, eligibility and active season queries."""
+    # The unique index allows one active season; which one stays active is
+    # for an operator to decide
+    active = conn.execute(text(
+        'SELECT id, name FROM seasons WHERE is_active ORDER BY id'
+    )).all()
+    if len(active) > 1:
+        listed = ', '.join(f'{season_id} ({name!r})' for season_id, name in active)
+        raise MigrationError(
+            f'{len(active)} seasons are active: {listed}. Deactivate all but one, '
+            'e.g. with "UPDATE seasons SET is_active = false WHERE id IN (...)", '
+            'then restart.'
+        )
+
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_rolls_season_roll_date '
+        'ON rolls (season_id, roll_date, id)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_rolls_roll_date ON rolls (roll_date, id)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_rolls_season_participant '
+        'ON rolls (season_id, participant_id)'
+    ))
+    # SQLite only uses a partial index whose predicate matches the query's
+    # "is_active = 1" literally; Postgres folds "is_active = true" itself
+    predicate = 'is_active' if conn.dialect.name == 'postgresql' else 'is_active = 1'
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_seasons_single_active '
+        f'ON seasons (is_active) WHERE {predicate}'
+    ))
+
+
+def _002_roll_enrichment_status(conn):
+    """Enrichment status columns on rolls; rolls with TMDB data count as done."""
+    columns = {column['name'] for column in inspect(conn).get_columns('rolls')}
+    if 'enrichment_status' not in columns:
+        conn.execute(text('ALTER TABLE rolls ADD COLUMN enrichment_status VARCHAR(20)'))
+    if 'enrichment_updated_at' not in columns:
+        conn.execute(text('ALTER TABLE rolls ADD COLUMN enrichment_updated_at TIMESTAMP'))
+    conn.execute(text(
+        "UPDATE rolls SET enrichment_status = 'done' "
+        "WHERE enrichment_status IS NULL AND tmdb_data IS NOT NULL"
+    ))
+
+
+def _003_local_image_urls(conn):
+    """Point image URLs stored on rolls and in the TMDB cache at the local image cache."""
+    for table, column in ((Roll.__table__, 'tmdb_data'),
+                          (TMDBCacheEntry.__table__, 'payload')):
+        rows = conn.execute(db.select(table.c.id, table.c[column])).all()
+        for row_id, data in rows:
+            localized = localize_image_urls(data)
+            if localized != data:
+                conn.execute(table.update().where(table.c.id == row_id)
+                             .values({column: localized}))
+
+
+def find_duplicate_rolls(conn):
+    """
+    Rolls repeating an earlier roll of the same participant in the same season.
+
+    Returns:
+        Rows of (id, season_id, participant_id, movie_title, roll_date,
+        has_tmdb_data, notes, kept_id), where kept_id is the participant's
+        first roll in the season
+    """
+    return conn.execute(text(
+        'SELECT r.id, r.season_id, r.participant_id, r.movie_title, r.roll_date, '
+        'r.tmdb_data IS NOT NULL AS has_tmdb_data, r.notes, kept.id AS kept_id '
+        'FROM rolls r JOIN ('
+        'SELECT season_id, participant_id, MIN(id) AS id FROM rolls '
+        'GROUP BY season_id, participant_id HAVING COUNT(*) > 1'
+        ') kept ON kept.season_id = r.season_id '
+        'AND kept.participant_id = r.participant_id AND r.id > kept.id '
+        'ORDER BY r.season_id, r.participant_id, r.id'
+    )).all()
+
+
+def _004_unique_season_participant(conn):
+    """Allow each participant one roll per season."""
+    duplicates = find_duplicate_rolls(conn)
+    if duplicates:
+        listed = '\n'.join(
+            f'  roll {row.id} (season {row.season_id}, participant {row.participant_id}) '
+            f'repeats roll {row.kept_id}'
+            for row in duplicates
+        )
+        raise MigrationError(
+            f'{len(duplicates)} roll(s) repeat a participant within a season:\n{listed}\n'
+            'Review them and remove the duplicates with '
+            '"python dedupe_rolls.py --delete", then restart.'
+        )
+
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_rolls_season_participant '
+        'ON rolls (season_id, participant_id)'
+    ))
+    conn.execute(text('DROP INDEX IF EXISTS ix_rolls_season_participant'))
+
+
+MIGRATIONS = [
+    Migration(1, 'Indexes for roll history, roster, eligibility and active season',
+              _001_roll_and_season_indexes),
+    Migration(2, 'Enrichment status of rolls', _002_roll_enrichment_status),
+    Migration(3, 'Local image cache URLs in TMDB data', _003_local_image_urls),
+    Migration(4, 'One roll per participant and season', _004_unique_season_participant),
+]
+
+
+def run_migrations():
+    """
+    Apply every migration not yet recorded in schema_migrations.
+
+    Runs in a single transaction; on Postgres an advisory lock keeps
+    concurrently starting workers from applying the same migration twice.
+
+    Returns:
+        List of applied migration versions
+
+    Raises:
+        MigrationError: A migration found data it must not change on its
+            own; nothing is applied
+    """
+    applied = []
+    with db.engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text('SELECT pg_advisory_xact_lock(:key)'),
+                         {'key': MIGRATION_LOCK_KEY})
+
+        done = {
+            version for (version,) in
+            conn.execute(db.select(SchemaMigration.version))
+        }
+        for migration in MIGRATIONS:
+            if migration.version in done:
+                continue
+            migration.upgrade(conn)
+            conn.execute(db.insert(SchemaMigration).values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow()
+            ))
+            applied.append(migration.version)
+            print(f"Applied migration {migration.version}: {migration.description}")
+
+    return applied
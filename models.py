@@ -1,13 +1,37 @@
-"""Database models for Movie Night Web application."""
+"""
+Database models for Movie Night Web application.
+
+to_dict() methods return datetimes as they are; the app's JSON provider
+(json_provider.py) writes them as ISO 8601 strings.
+"""
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
 
 db = SQLAlchemy()
 
 
+def dialect_insert(model):
+    """
+    Return an INSERT for model that supports on_conflict_do_* clauses.
+
+    Postgres and SQLite both implement upserts, but through their own
+    dialect-specific insert constructs.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
 class Season(db.Model):  # pylint: disable=too-few-public-methods
     """Represents a movie night season."""
     __tablename__ = 'seasons'
+    __table_args__ = (
+        # At most one active season; also serves the is_active = true lookup
+        db.Index('uq_seasons_single_active', 'is_active', unique=True,
+                 postgresql_where=text('is_active'), sqlite_where=text('is_active = 1')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -25,11 +49,11 @@ class Season(db.Model):  # pylint: disable=too-few-public-methods
         return {
             'id': self.id,
             'name': self.name,
-            'start_date': self.start_date.isoformat() if self.start_date else None,
-            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
             'is_active': self.is_active,
             'spreadsheet_tab': self.spreadsheet_tab,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
 
 
@@ -49,13 +73,22 @@ class Participant(db.Model):  # pylint: disable=too-few-public-methods
         return {
             'id': self.id,
             'name': self.name,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
 
 
 class Roll(db.Model):  # pylint: disable=too-few-public-methods
     """Represents a single movie night roll/selection."""
     __tablename__ = 'rolls'
+    __table_args__ = (
+        # Season history/roster, newest first, and keyset pagination
+        db.Index('ix_rolls_season_roll_date', 'season_id', 'roll_date', 'id'),
+        # Unfiltered history, newest first
+        db.Index('ix_rolls_roll_date', 'roll_date', 'id'),
+        # Eligibility: who has already been rolled this season. Unique, so a
+        # participant can never be rolled twice in one season
+        db.Index('uq_rolls_season_participant', 'season_id', 'participant_id', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     season_id = db.Column(db.Integer, db.ForeignKey('seasons.id'), nullable=False)
@@ -64,6 +97,9 @@ class Roll(db.Model):  # pylint: disable=too-few-public-methods
     roll_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     tmdb_id = db.Column(db.Integer, nullable=True)
     tmdb_data = db.Column(db.JSON, nullable=True)
+    # 'pending', 'done' or 'failed'; None if enrichment was never requested
+    enrichment_status = db.Column(db.String(20), nullable=True)
+    enrichment_updated_at = db.Column(db.DateTime, nullable=True)
     notes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -71,17 +107,144 @@ class Roll(db.Model):  # pylint: disable=too-few-public-methods
     season = db.relationship('Season', back_populates='rolls')
     participant = db.relationship('Participant', back_populates='rolls')
 
-    def to_dict(self):
-        """Convert Roll object to dictionary."""
-        return {
+    def to_dict(self, fields=None):
+        """
+        Convert Roll object to dictionary.
+
+        Args:
+            fields: Optional collection of keys to include (see ROLL_FIELDS);
+                relationships and large columns are only read when requested
+        """
+        data = {
             'id': self.id,
             'season_id': self.season_id,
             'participant_id': self.participant_id,
-            'participant_name': self.participant.name if self.participant else None,
             'movie_title': self.movie_title,
-            'roll_date': self.roll_date.isoformat() if self.roll_date else None,
+            'roll_date': self.roll_date,
             'tmdb_id': self.tmdb_id,
-            'tmdb_data': self.tmdb_data,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'enrichment_status': self.enrichment_status,
+            'enrichment_updated_at': self.enrichment_updated_at,
+            'created_at': self.created_at
         }
+        if fields is None or 'participant_name' in fields:
+            data['participant_name'] = self.participant.name if self.participant else None
+        if fields is None or 'tmdb_data' in fields:
+            data['tmdb_data'] = self.tmdb_data
+        if fields is None or 'notes' in fields:
+            data['notes'] = self.notes
+
+        if fields is not None:
+            data = {key: value for key, value in data.items() if key in fields}
+        return data
+
+
+ROLL_FIELDS = frozenset({
+    'id', 'season_id', 'participant_id', 'participant_name', 'movie_title',
+    'roll_date', 'tmdb_id', 'tmdb_data', 'enrichment_status', 'enrichment_updated_at',
+    'notes', 'created_at'
+})
+
+
+class Submission(db.Model):  # pylint: disable=too-few-public-methods
+    """Mirror of one movie row from a season's submissions sheet tab."""
+    __tablename__ = 'submissions'
+    __table_args__ = (
+        db.UniqueConstraint('spreadsheet_tab', 'row_position',
+                            name='uq_submissions_tab_row'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    spreadsheet_tab = db.Column(db.String(100), nullable=False)
+    movie_title = db.Column(db.String(255), nullable=False)
+    submitter = db.Column(db.String(100), nullable=False, default='')
+    row_position = db.Column(db.Integer, nullable=False)
+    content_hash = db.Column(db.String(40), nullable=False)
+    synced_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert Submission object to dictionary."""
+        return {
+            'id': self.id,
+            'spreadsheet_tab': self.spreadsheet_tab,
+            'movie_title': self.movie_title,
+            'submitter': self.submitter,
+            'row_position': self.row_position,
+            'synced_at': self.synced_at
+        }
+
+
+class SchemaMigration(db.Model):  # pylint: disable=too-few-public-methods
+    """Records which migrations in migrations.py have been applied."""
+    __tablename__ = 'schema_migrations'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ChangeVersion(db.Model):  # pylint: disable=too-few-public-methods
+    """Counter bumped whenever data in a scope changes, for cache invalidation."""
+    __tablename__ = 'change_versions'
+
+    scope = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class IdempotencyKey(db.Model):  # pylint: disable=too-few-public-methods
+    """Stored response to a mutating request sent with an Idempotency-Key header."""
+    __tablename__ = 'idempotency_keys'
+
+    key = db.Column(db.String(255), primary_key=True)
+    # SHA-256 of the request's method, path and body; repeats must match it
+    request_hash = db.Column(db.String(64), nullable=False)
+    # Response fields are empty while the first request is still running
+    status_code = db.Column(db.Integer, nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    response_body = db.Column(db.LargeBinary, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class TMDBCacheEntry(db.Model):  # pylint: disable=too-few-public-methods
+    """Cached TMDB enrichment payload, keyed by normalized title or TMDB ID."""
+    __tablename__ = 'tmdb_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(300), nullable=False, unique=True)
+    tmdb_id = db.Column(db.Integer, nullable=True)
+    payload = db.Column(db.JSON, nullable=False)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_accessed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                                 index=True)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        """Convert TMDBCacheEntry object to dictionary."""
+        return {
+            'cache_key': self.cache_key,
+            'tmdb_id': self.tmdb_id,
+            'fetched_at': self.fetched_at,
+            'last_accessed_at': self.last_accessed_at,
+            'hit_count': self.hit_count
+        }
+
+
+class ImageCacheEntry(db.Model):  # pylint: disable=too-few-public-methods
+    """A TMDB image variant stored in the local image cache directory."""
+    __tablename__ = 'image_cache'
+    __table_args__ = (
+        db.UniqueConstraint('size', 'source_path', name='uq_image_cache_size_path'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # TMDB size name (e.g. 'w342') and file path (e.g. '/abc.jpg')
+    size = db.Column(db.String(20), nullable=False)
+    source_path = db.Column(db.String(255), nullable=False)
+    # SHA-256 of the image, naming its file in IMAGE_CACHE_DIR
+    content_hash = db.Column(db.String(64), nullable=False, index=True)
+    content_type = db.Column(db.String(100), nullable=False)
+    byte_size = db.Column(db.Integer, nullable=False)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_accessed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                                 index=True)
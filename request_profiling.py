@@ -0,0 +1,172 @@
+"""Opt-in cProfile runs of single requests, kept on disk for download."""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import uuid
+from datetime import datetime
+
+from flask import current_app, g, request
+
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = 'profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_SUFFIX = '.prof'
+# <UTC time>-<view>-<random>, e.g. 20240101T200000-api_get_rolls-1a2b3c4d
+PROFILE_ID_PATTERN = re.compile(r'^\d{8}T\d{6}-(?P<endpoint>[\w.]+)-[0-9a-f]{8}$')
+# Sort orders accepted for text reports
+REPORT_SORTS = frozenset({'cumulative', 'tottime', 'calls'})
+
+
+def _requested():
+    """Whether the client asked for this request to be profiled."""
+    return request.headers.get(PROFILE_HEADER) == '1' or request.args.get(PROFILE_PARAM) == '1'
+
+
+def _allowed(app):
+    """Whether PROFILING lets this client profile requests."""
+    mode = app.config['PROFILING']
+    if mode == 'open':
+        return True
+    if mode != 'admin':
+        return False
+    token = app.config.get('ADMIN_TOKEN')
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def _profile_dir():
+    return current_app.config['PROFILE_DIR']
+
+
+def _profile_path(profile_id):
+    return os.path.join(_profile_dir(), profile_id + PROFILE_SUFFIX)
+
+
+def _save(profiler):
+    """Write a finished profile to PROFILE_DIR and prune old ones; returns its ID."""
+    os.makedirs(_profile_dir(), exist_ok=True)
+    profile_id = (f"{datetime.utcnow():%Y%m%dT%H%M%S}-{request.endpoint or 'unmatched'}"
+                  f"-{uuid.uuid4().hex[:8]}")
+    profiler.dump_stats(_profile_path(profile_id))
+    _prune(current_app.config['PROFILE_MAX_FILES'])
+    return profile_id
+
+
+def _prune(max_files):
+    """Delete all but the newest max_files profiles."""
+    for profile in list_profiles()[max_files:]:
+        try:
+            os.remove(_profile_path(profile['id']))
+        except FileNotFoundError:
+            # Pruned by another worker
+            pass
+
+
+def list_profiles():
+    """
+    Stored profiles, newest first.
+
+    Returns:
+        List of dictionaries with id, endpoint, created_at and bytes
+    """
+    try:
+        names = os.listdir(_profile_dir())
+    except FileNotFoundError:
+        return []
+
+    profiles = []
+    for name in names:
+        profile_id = name[:-len(PROFILE_SUFFIX)]
+        match = PROFILE_ID_PATTERN.match(profile_id)
+        if not name.endswith(PROFILE_SUFFIX) or match is None:
+            continue
+        try:
+            stat = os.stat(os.path.join(_profile_dir(), name))
+        except FileNotFoundError:
+            continue
+        profiles.append((stat.st_mtime_ns, {
+            'id': profile_id,
+            'endpoint': match.group('endpoint'),
+            'created_at': datetime.utcfromtimestamp(stat.st_mtime),
+            'bytes': stat.st_size,
+        }))
+    return [profile for _mtime, profile in sorted(profiles, key=lambda p: p[0], reverse=True)]
+
+
+def profile_file(profile_id):
+    """
+    Path of a stored profile, for download.
+
+    Returns:
+        The path, or None if profile_id is malformed or was pruned
+    """
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = _profile_path(profile_id)
+    return path if os.path.exists(path) else None
+
+
+def profile_report(profile_id, sort='cumulative', limit=50):
+    """
+    Render a stored profile as pstats text.
+
+    Args:
+        profile_id: ID from list_profiles()
+        sort: One of REPORT_SORTS
+        limit: Number of functions listed
+
+    Returns:
+        The report, or None if the profile does not exist
+    """
+    path = profile_file(profile_id)
+    if path is None:
+        return None
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def init_profiling(app):
+    """
+    Profile requests that ask for it with cProfile.
+
+    A request sent with an X-Profile: 1 header or ?profile=1, by a client
+    PROFILING allows, runs under cProfile from its first before_request
+    hook to its last after_request hook. The response names the stored
+    profile in an X-Profile-Id header. cProfile only sees the request's
+    own thread; under gevent workers other greenlets running meanwhile
+    show up in the profile too.
+
+    Call before the other init_* hooks so the profile covers them.
+    """
+    @app.before_request
+    def start_profiler():
+        if not _requested() or not _allowed(app):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running on this thread
+            return
+        g.profiler = profiler
+
+    @app.after_request
+    def save_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        response.headers[PROFILE_ID_HEADER] = _save(profiler)
+        return response
+
+    @app.teardown_request
+    def stop_profiler(_exc):
+        # Only still set if the request failed before after_request
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
@@ -0,0 +1,61 @@
+"""Brotli/gzip compression of JSON and HTML responses."""
+import gzip
+
+from flask import request
+
+from metrics import timed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = frozenset({'application/json', 'text/html'})
+# Fast settings suited to compressing every response on the fly
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings():
+    """Content codings this worker can produce, most preferred first."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress(data, encoding):
+    """Compress data with 'br' or 'gzip'."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def init_compression(app):
+    """
+    Compress JSON and HTML responses of at least COMPRESSION_MIN_SIZE bytes.
+
+    The coding is negotiated from Accept-Encoding, preferring brotli when
+    it is installed. Streamed and file responses, and responses that are
+    already encoded, are left alone.
+    """
+    @app.after_request
+    def compress_response(response):
+        if (not app.config['RESPONSE_COMPRESSION']
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < app.config['COMPRESSION_MIN_SIZE']:
+            return response
+
+        encoding = request.accept_encodings.best_match(available_encodings())
+        if encoding is None:
+            return response
+
+        with timed('compress'):
+            response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -1,16 +1,32 @@
 """Core movie roll logic adapted from movie_night_roll project."""
 import random
-from models import db, Season, Participant, Roll
-from sheets_integration import get_movies_from_sheet, get_participants_from_sheet
+from contextlib import nullcontext
+from datetime import datetime
 
+from sqlalchemy.exc import IntegrityError
 
-def get_eligible_participants(season_id, custom_participants=None):
+from db_instrumentation import unbudgeted
+from enrichment import mark_enrichment_pending, queue_enrichment
+from models import db, dialect_insert, Season, Participant, Roll
+from submissions import get_submission_snapshot
+from events import ROLL_CREATED, ROSTER_RESET, publish
+from season_roster import get_rolled_names, roster_changed
+from versions import rolls_changed
+
+
+# Attempts at a roll that lost a race for the same participant (only
+# possible where the season lock is unavailable, i.e. SQLite)
+ROLL_ATTEMPTS = 3
+
+
+def get_eligible_participants(season_id, custom_participants=None, snapshot=None):
     """
     Get list of eligible participants for a roll.
 
     Args:
         season_id: ID of the current season
         custom_participants: Optional list of specific participants to include
+        snapshot: Optional SheetSnapshot of the season's tab; loaded if omitted
 
     Returns:
         List of participant names eligible for rolling
@@ -19,62 +35,57 @@ def get_eligible_participants(season_id, custom_participants=None):
     if not season:
         return []
 
-    # Get all participants from Google Sheets
-    all_participants = get_participants_from_sheet(season.spreadsheet_tab)
-
     # Get participants who have already been rolled this season
-    rolled_participants = db.session.query(Participant.name).join(Roll).filter(
-        Roll.season_id == season_id
-    ).all()
-    rolled_names = {name for (name,) in rolled_participants}
+    rolled_names = set(get_rolled_names(season_id))
 
     # Filter based on custom list or use all
     if custom_participants:
         eligible = [p for p in custom_participants if p not in rolled_names]
     else:
-        eligible = [p for p in all_participants if p not in rolled_names]
+        if snapshot is None:
+            snapshot = get_submission_snapshot(season.spreadsheet_tab)
+        eligible = [p for p in snapshot.participants if p not in rolled_names]
 
     return eligible
 
 
-def perform_roll(season_id, custom_participants=None):
+def _lock_season(season_id):
     """
-    Perform a movie night roll.
+    Lock the season row until the transaction ends, serializing rolls of
+    that season only. A no-op on SQLite, which has no row locks.
+    """
+    db.session.query(Season.id).filter_by(id=season_id).with_for_update().one()
 
-    Args:
-        season_id: ID of the season to roll for
-        custom_participants: Optional list of specific participants
 
-    Returns:
-        Dictionary with roll results or None if error
+def _get_or_create_participant_id(name):
+    """ID of the participant called name, inserting them if needed without racing."""
+    db.session.execute(
+        dialect_insert(Participant).values(name=name, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=[Participant.name])
+    )
+    return db.session.query(Participant.id).filter_by(name=name).scalar()
+
+
+def _insert_roll(season_id, custom_participants, snapshot):
     """
-    season = Season.query.get(season_id)
-    if not season:
-        return {'error': 'Season not found'}
+    Pick and insert a roll inside the season lock; the caller commits.
 
-    # Get eligible participants
-    eligible = get_eligible_participants(season_id, custom_participants)
+    Returns:
+        Result dictionary, with an 'error' key if nothing was inserted
+    """
+    _lock_season(season_id)
 
+    rolled_names = set(get_rolled_names(season_id))
+    candidates = custom_participants or snapshot.participants
+    eligible = [p for p in candidates if p not in rolled_names]
     if not eligible:
         return {'error': 'No eligible participants available'}
 
     # Randomly select a participant
     selected_name = random.choice(eligible)
 
-    # Get or create participant in database
-    participant = Participant.query.filter_by(name=selected_name).first()
-    if not participant:
-        participant = Participant(name=selected_name)
-        db.session.add(participant)
-        db.session.flush()
-
     # Get movies from this participant
-    movies = get_movies_from_sheet(season.spreadsheet_tab)
-    participant_movies = [
-        movie for movie, submitter in movies
-        if submitter.strip().upper() == selected_name.upper()
-    ]
-
+    participant_movies = snapshot.movies_for(selected_name)
     if not participant_movies:
         return {'error': f'No movies found for {selected_name}'}
 
@@ -84,21 +95,77 @@ def perform_roll(season_id, custom_participants=None):
     # Create roll record
     roll = Roll(
         season_id=season_id,
-        participant_id=participant.id,
+        participant_id=_get_or_create_participant_id(selected_name),
         movie_title=selected_movie
     )
     db.session.add(roll)
-    db.session.commit()
+    mark_enrichment_pending(roll)
+    rolls_changed(season_id)
+    roster_changed(season_id)
+    db.session.flush()
+    publish(ROLL_CREATED, roll_id=roll.id, season_id=season_id)
 
     return {
         'success': True,
         'participant': selected_name,
         'movie': selected_movie,
         'roll_id': roll.id,
+        'enrichment_status': roll.enrichment_status,
         'eligible_count': len(eligible)
     }
 
 
+def perform_roll(season_id, custom_participants=None, snapshot=None):
+    """
+    Perform a movie night roll.
+
+    The season's submissions are loaded first, so no lock is held while
+    Google Sheets is read. The roll is then picked and inserted in one short
+    transaction holding a row lock on the season (Postgres), so concurrent
+    rolls of a season see each other's results while other seasons are not
+    blocked. The unique (season_id, participant_id) index backs this up;
+    a roll that still loses a race is retried. TMDB enrichment of the new
+    roll is queued in the background rather than awaited.
+
+    Args:
+        season_id: ID of the season to roll for
+        custom_participants: Optional list of specific participants
+        snapshot: Optional SheetSnapshot of the season's tab; loaded if omitted
+
+    Returns:
+        Dictionary with roll results or an 'error' key
+    """
+    season = Season.query.get(season_id)
+    if not season:
+        return {'error': 'Season not found'}
+
+    if snapshot is None:
+        snapshot = get_submission_snapshot(season.spreadsheet_tab)
+    # Don't keep the read transaction open while waiting for the lock
+    db.session.commit()
+
+    for attempt in range(ROLL_ATTEMPTS):
+        try:
+            # Retries depend on contention, not on the request
+            with unbudgeted() if attempt else nullcontext():
+                result = _insert_roll(season_id, custom_participants, snapshot)
+            if 'error' in result:
+                db.session.rollback()
+                return result
+            db.session.commit()
+            break
+        except IntegrityError:
+            db.session.rollback()
+    else:
+        return {'error': 'Another roll for this season is in progress, please try again',
+                'conflict': True}
+
+    if result['enrichment_status']:
+        queue_enrichment(result['roll_id'])
+
+    return result
+
+
 def get_season_roster(season_id):
     """
     Get the roster of participants who have been rolled this season.
@@ -107,10 +174,9 @@ def get_season_roster(season_id):
         season_id: ID of the season
 
     Returns:
-        List of participant names
+        List of participant names, in the order they were rolled
     """
-    rolls = Roll.query.filter_by(season_id=season_id).join(Participant).all()
-    return [roll.participant.name for roll in rolls]
+    return list(get_rolled_names(season_id))
 
 
 def reset_season_roster(season_id):
@@ -125,6 +191,9 @@ def reset_season_roster(season_id):
     """
     try:
         Roll.query.filter_by(season_id=season_id).delete()
+        rolls_changed(season_id)
+        roster_changed(season_id)
+        publish(ROSTER_RESET, season_id=season_id)
         db.session.commit()
         return True
     except Exception as e:  # pylint: disable=broad-exception-caught
@@ -0,0 +1,82 @@
+"""Per-worker cache of who has been rolled in each season, invalidated through change versions."""
+import threading
+
+from metrics import record_cache
+from models import db, Participant, Roll
+from versions import bump_version, get_version
+
+
+def season_roster_scope(season_id):
+    """
+    Scope bumped whenever a participant is added to or removed from a
+    season's roster, i.e. when one of its rolls is created or deleted.
+
+    Unlike season_rolls_scope() it is left alone by enrichment and edits.
+    """
+    return f'roster:{season_id}'
+
+
+class _RosterCache:
+    """Each season's rolled participant names, with the roster version they were read at."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, season_id):
+        """Return the season's rolled names, re-reading them only if the roster changed."""
+        version = get_version(season_roster_scope(season_id))
+        with self._lock:
+            entry = self._entries.get(season_id)
+        if entry is not None and entry['version'] == version:
+            record_cache('roster', 'hits')
+            return entry['names']
+        record_cache('roster', 'misses')
+
+        rolled = db.session.query(Participant.name).join(Roll).filter(
+            Roll.season_id == season_id
+        ).order_by(Roll.roll_date, Roll.id).all()
+        names = tuple(name for (name,) in rolled)
+
+        with self._lock:
+            self._entries[season_id] = {'version': version, 'names': names}
+        return names
+
+    def clear(self, season_id):
+        """Forget the cached roster of a season."""
+        with self._lock:
+            self._entries.pop(season_id, None)
+
+
+_cache = _RosterCache()
+
+
+def get_rolled_names(season_id):
+    """
+    Names of the participants rolled in a season, in the order they were rolled.
+
+    The season's roster version is read on every call (one primary key
+    lookup), and the rolls are only queried again after a roll of the
+    season was created or deleted, by any worker. Read inside the roll
+    transaction, after the season lock, the version is the latest one
+    committed.
+
+    Args:
+        season_id: ID of the season
+
+    Returns:
+        Tuple of participant names
+    """
+    return _cache.get(season_id)
+
+
+def roster_changed(season_id):
+    """
+    Record a change to a season's roster in the current transaction.
+
+    Call it whenever rolls of the season are created or deleted, alongside
+    rolls_changed(). Bumps the shared version so every worker re-reads the
+    roster, and drops this worker's copy straight away.
+    """
+    bump_version(season_roster_scope(season_id))
+    _cache.clear(season_id)
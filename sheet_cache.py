@@ -0,0 +1,152 @@
+"""In-process snapshot cache for Google Sheets tab reads."""
+import threading
+import time
+
+from metrics import record_cache
+
+
+class SheetsUnavailableError(Exception):
+    """Raised when a sheet tab cannot be read and no cached copy exists."""
+
+
+class _CacheEntry:  # pylint: disable=too-few-public-methods
+    """A cached tab value and the time it was fetched."""
+
+    __slots__ = ('value', 'fetched_at', 'refreshing')
+
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.refreshing = False
+
+
+class SheetCache:
+    """
+    Snapshot cache keyed by (spreadsheet_id, tab).
+
+    Entries younger than ``ttl`` seconds are served as-is. Entries older than
+    that but within ``ttl + stale_ttl`` are served immediately while a single
+    background thread refreshes them. Anything older is fetched synchronously.
+    Whenever the loader raises SheetsUnavailableError the last good copy is
+    served instead, so a Sheets outage does not look like an empty sheet.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'errors': 0,
+            'fallbacks': 0,
+        }
+
+    def get(self, key, loader, ttl, stale_ttl=0):
+        """
+        Return the cached value for key, loading it if needed.
+
+        Args:
+            key: Cache key, normally (spreadsheet_id, tab)
+            loader: Callable returning a fresh value or raising
+                SheetsUnavailableError
+            ttl: Seconds a value is considered fresh (0 disables caching)
+            stale_ttl: Extra seconds a value may be served while refreshing
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and ttl > 0:
+                age = time.monotonic() - entry.fetched_at
+                if age < ttl:
+                    self._count('hits')
+                    return entry.value
+                if age < ttl + stale_ttl:
+                    self._count('stale_hits')
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        threading.Thread(
+                            target=self._refresh,
+                            args=(key, loader, entry),
+                            daemon=True
+                        ).start()
+                    return entry.value
+            self._count('misses')
+
+        return self._load(key, loader, entry)
+
+    def _count(self, name):
+        """Count a lookup outcome; the caller holds the lock."""
+        self._counters[name] += 1
+        record_cache('sheets', name)
+
+    def put(self, key, value):
+        """Store a freshly fetched value for key."""
+        with self._lock:
+            self._entries[key] = _CacheEntry(value, time.monotonic())
+
+    def invalidate(self, key=None):
+        """Drop one cached key, or every key when none is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Return hit/miss counters and the age of every cached entry."""
+        now = time.monotonic()
+        with self._lock:
+            lookups = (self._counters['hits'] + self._counters['stale_hits']
+                       + self._counters['misses'])
+            return {
+                **self._counters,
+                'hit_ratio': (
+                    (self._counters['hits'] + self._counters['stale_hits']) / lookups
+                    if lookups else None
+                ),
+                'entries': [
+                    {
+                        'spreadsheet_id': key[0],
+                        'tab': key[1],
+                        'age_seconds': round(now - entry.fetched_at, 3),
+                        'refreshing': entry.refreshing
+                    }
+                    for key, entry in self._entries.items()
+                ]
+            }
+
+    def _load(self, key, loader, fallback):
+        """Fetch synchronously, falling back to the previous entry on error."""
+        try:
+            value = loader()
+        except SheetsUnavailableError:
+            with self._lock:
+                self._counters['errors'] += 1
+                if fallback is None:
+                    raise
+                self._counters['fallbacks'] += 1
+            return fallback.value
+
+        self.put(key, value)
+        return value
+
+    def _refresh(self, key, loader, entry):
+        """Background refresh of a stale entry."""
+        try:
+            value = loader()
+        except SheetsUnavailableError:
+            with self._lock:
+                self._counters['errors'] += 1
+                self._counters['fallbacks'] += 1
+            return
+        finally:
+            with self._lock:
+                entry.refreshing = False
+
+        with self._lock:
+            self._counters['refreshes'] += 1
+            self._entries[key] = _CacheEntry(value, time.monotonic())
@@ -1,82 +1,398 @@
 """Integration with Google Sheets API from movie_night_roll project."""
-import os
-import pickle
+import queue
+import threading
+from contextlib import contextmanager
+
+import httplib2
+from google.auth.exceptions import GoogleAuthError
 from google.auth.transport.requests import Request
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from flask import current_app
 
+from metrics import timed, upstream_call
+from sheet_cache import SheetCache, SheetsUnavailableError
+from single_flight import SingleFlight
+
+
+SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+SHEETS_REQUEST_TIMEOUT = 30
+# Authorized HTTP connections kept open to Google per worker
+SHEETS_HTTP_POOL_SIZE = 8
+
+_sheet_cache = SheetCache()
+# Concurrent reads of the same tab share one Sheets API request
+_sheet_fetches = SingleFlight()
+
+
+def normalize_name(name):
+    """Normalize a submitter name for case- and whitespace-insensitive matching."""
+    return name.strip().upper()
+
+
+class SheetSnapshot:  # pylint: disable=too-few-public-methods
+    """
+    Immutable view of one spreadsheet tab, indexed by submitter.
+
+    Built once per fetch so that participant lists and per-participant movie
+    lookups do not rescan the sheet rows.
+    """
+
+    def __init__(self, movies, row_numbers=None):
+        self.movies = tuple(movies)
+        # Sheet row of each movie; the header is row 1
+        self.row_numbers = tuple(
+            row_numbers if row_numbers is not None else range(2, len(self.movies) + 2)
+        )
+
+        movies_by_submitter = {}
+        participants = set()
+        for movie, submitter in self.movies:
+            movies_by_submitter.setdefault(normalize_name(submitter), []).append(movie)
+            if submitter and submitter.strip():
+                participants.add(submitter.strip())
+
+        self._movies_by_submitter = {
+            name: tuple(titles) for name, titles in movies_by_submitter.items()
+        }
+        self.participants = tuple(sorted(participants))
+
+    def movies_for(self, participant_name):
+        """Return the movie titles submitted by participant_name."""
+        return list(self._movies_by_submitter.get(normalize_name(participant_name), ()))
+
+    def rows(self):
+        """Yield (row_number, movie_title, participant_name) for every movie."""
+        for row_number, (movie, submitter) in zip(self.row_numbers, self.movies):
+            yield row_number, movie, submitter
+
+
+class _SheetsServiceHolder:
+    """
+    Process-wide Sheets API client.
+
+    The discovery-built service and the service account credentials are
+    created once per worker from the bundled static discovery document, and
+    credentials are only refreshed when they are about to expire. httplib2 is
+    not thread-safe, so each request checks an authorized HTTP connection
+    out of a small pool and returns it afterwards. A pool rather than a
+    connection per thread, because under gevent workers every request runs
+    on its own greenlet and would otherwise open a new TLS connection.
+    """
+
+    def __init__(self, pool_size=SHEETS_HTTP_POOL_SIZE):
+        self._lock = threading.Lock()
+        # One slot per connection, None until first used; most recently
+        # returned first, so idle connections beyond the load close by timeout
+        self._pool = queue.LifoQueue()
+        for _slot in range(pool_size):
+            self._pool.put(None)
+        self._service = None
+        self._credentials = None
+
+    def get_service(self):
+        """Return the shared service, building it on first use."""
+        with self._lock:
+            if self._service is None:
+                if self._credentials is None:
+                    self._credentials = self._load_credentials()
+                endpoint = current_app.config.get('GOOGLE_SHEETS_ENDPOINT')
+                self._service = build(
+                    'sheets', 'v4',
+                    credentials=self._credentials,
+                    static_discovery=True,
+                    cache_discovery=False,
+                    client_options={'api_endpoint': endpoint} if endpoint else None
+                )
+            elif not self._credentials.valid:
+                # google-auth reports credentials as invalid shortly before
+                # they actually expire, so this refreshes ahead of time.
+                self._credentials.refresh(Request())
+            return self._service
+
+    @contextmanager
+    def http(self):
+        """
+        Check out an authorized HTTP connection for one request.
+
+        Waits while all SHEETS_HTTP_POOL_SIZE connections are in use.
+
+        Raises:
+            TimeoutError: No connection was returned within SHEETS_REQUEST_TIMEOUT
+        """
+        try:
+            http = self._pool.get(timeout=SHEETS_REQUEST_TIMEOUT)
+        except queue.Empty as err:
+            raise TimeoutError('All Google Sheets connections are busy') from err
+        try:
+            if http is None or http.credentials is not self._credentials:
+                http = AuthorizedHttp(
+                    self._credentials,
+                    http=httplib2.Http(timeout=SHEETS_REQUEST_TIMEOUT)
+                )
+            yield http
+        finally:
+            self._pool.put(http)
+
+    def reset(self, credentials=None):
+        """Drop the cached client, optionally replacing the credentials."""
+        with self._lock:
+            self._service = None
+            self._credentials = credentials
+
+    @staticmethod
+    def _load_credentials():
+        """Load service account credentials from GOOGLE_CREDENTIALS_PATH."""
+        credentials_path = current_app.config.get('GOOGLE_CREDENTIALS_PATH', 'credentials.json')
+        creds = service_account.Credentials.from_service_account_file(
+            credentials_path
+        )
+        return creds.with_scopes(SHEETS_SCOPES)
+
+
+_service_holder = _SheetsServiceHolder()
+
 
 def get_sheets_service():
-    """Get authenticated Google Sheets service."""
-    creds = None
-    token_path = 'token.pickle'
+    """Get the authenticated Google Sheets service shared by this worker."""
+    return _service_holder.get_service()
+
+
+def reset_sheets_service(credentials=None):
+    """
+    Discard the shared Sheets service so the next call rebuilds it.
 
-    if os.path.exists(token_path):
-        with open(token_path, 'rb') as token:
-            creds = pickle.load(token)
+    Args:
+        credentials: Optional credentials to use instead of loading
+            GOOGLE_CREDENTIALS_PATH
+    """
+    _service_holder.reset(credentials)
+
+
+def _execute(request, operation):
+    """Execute a Sheets API request over a pooled connection."""
+    with _service_holder.http() as http, upstream_call('sheets', operation):
+        return request.execute(http=http)
+
+
+def _parse_rows(values):
+    """
+    Convert raw A:B values into movie tuples.
 
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+    Returns:
+        Tuple of (movies, row_numbers) where movies is a list of
+        (movie_title, participant_name) tuples and row_numbers holds the
+        sheet row each movie came from
+    """
+    movies = []
+    row_numbers = []
+
+    # Skip the header row (first row); sheet rows are numbered from 1
+    for row_number, row in enumerate(values[1:] if values else [], start=2):
+        if len(row) == 0:
+            continue
+        # Ensure each row has 2 columns
+        if len(row) == 1:
+            movies.append((row[0], ''))
         else:
-            credentials_path = current_app.config.get('GOOGLE_CREDENTIALS_PATH', 'credentials.json')
-            creds = service_account.Credentials.from_service_account_file(
-                credentials_path
-            )
-            creds = creds.with_scopes(['https://www.googleapis.com/auth/spreadsheets'])
+            movies.append((row[0], row[1]))
+        row_numbers.append(row_number)
 
-        with open(token_path, 'wb') as token:
-            pickle.dump(creds, token)
+    return movies, row_numbers
 
-    return build('sheets', 'v4', credentials=creds)
 
+def _fetch_snapshot(app, spreadsheet_id, spreadsheet_tab):
+    """
+    Read a tab straight from the Sheets API.
 
-def get_movies_from_sheet(spreadsheet_tab='General'):
+    Runs inside its own app context so it can also be used from the cache's
+    background refresh thread.
+
+    Raises:
+        SheetsUnavailableError: If the Sheets API request fails
     """
-    Fetch movies and participants from Google Sheets.
+    with app.app_context():
+        try:
+            service = get_sheets_service()
+            range_name = f'{spreadsheet_tab}!A:B'
+
+            sheet = service.spreadsheets()  #pylint: disable=no-member
+            result = _execute(sheet.values().get(
+                spreadsheetId=spreadsheet_id,
+                range=range_name
+            ), 'values.get')
+
+        except (HttpError, GoogleAuthError, httplib2.HttpLib2Error, OSError) as err:
+            print(f"Error fetching from Google Sheets: {err}")
+            raise SheetsUnavailableError(str(err)) from err
+
+    return SheetSnapshot(*_parse_rows(result.get('values', [])))
+
+
+def _fetch_snapshots(app, spreadsheet_id, spreadsheet_tabs):
+    """
+    Read several tabs with a single ``values.batchGet`` request.
+
+    Raises:
+        SheetsUnavailableError: If the Sheets API request fails
+    """
+    with app.app_context():
+        try:
+            service = get_sheets_service()
+            sheet = service.spreadsheets()  #pylint: disable=no-member
+            result = _execute(sheet.values().batchGet(
+                spreadsheetId=spreadsheet_id,
+                ranges=[f'{tab}!A:B' for tab in spreadsheet_tabs]
+            ), 'values.batchGet')
+
+        except (HttpError, GoogleAuthError, httplib2.HttpLib2Error, OSError) as err:
+            print(f"Error fetching from Google Sheets: {err}")
+            raise SheetsUnavailableError(str(err)) from err
+
+    # valueRanges come back in the same order as the requested ranges
+    value_ranges = result.get('valueRanges', [])
+    if len(value_ranges) < len(spreadsheet_tabs):
+        print(f"Google Sheets returned {len(value_ranges)} of "
+              f"{len(spreadsheet_tabs)} requested tabs")
+    return {
+        tab: SheetSnapshot(*_parse_rows(value_range.get('values', [])))
+        for tab, value_range in zip(spreadsheet_tabs, value_ranges)
+    }
+
+
+def _fetch_each_snapshot(app, spreadsheet_id, spreadsheet_tabs):
+    """
+    Read tabs one request each, skipping those that fail.
+
+    Raises:
+        SheetsUnavailableError: If every tab fails
+    """
+    snapshots, error = {}, None
+    for tab in spreadsheet_tabs:
+        try:
+            snapshots[tab] = _fetch_snapshot(app, spreadsheet_id, tab)
+        except SheetsUnavailableError as err:
+            print(f"Skipping sheet tab {tab!r}: {err}")
+            error = err
+    if not snapshots and error is not None:
+        raise error
+    return snapshots
+
+
+def get_sheet_snapshot(spreadsheet_tab='General'):
+    """
+    Fetch an indexed snapshot of a spreadsheet tab.
+
+    Results are cached per spreadsheet and tab for SHEETS_CACHE_TTL seconds;
+    a stale copy is served while it is refreshed in the background and
+    whenever Google Sheets returns an error. Requests that miss the cache
+    at the same time wait for a single Sheets API read of the tab.
 
     Args:
         spreadsheet_tab: The tab name in the spreadsheet
 
     Returns:
-        List of tuples (movie_title, participant_name)
+        SheetSnapshot for the tab
+
+    Raises:
+        SheetsUnavailableError: If the tab cannot be read and nothing is cached
     """
-    try:
-        service = get_sheets_service()
-        spreadsheet_id = current_app.config.get('GOOGLE_SPREADSHEET_ID')
-        range_name = f'{spreadsheet_tab}!A:B'
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    spreadsheet_id = app.config.get('GOOGLE_SPREADSHEET_ID')
+    key = (spreadsheet_id, spreadsheet_tab)
 
-        sheet = service.spreadsheets()  #pylint: disable=no-member
-        result = sheet.values().get(
-            spreadsheetId=spreadsheet_id,
-            range=range_name
-        ).execute()
+    with timed('sheets'):
+        return _sheet_cache.get(
+            key,
+            lambda: _sheet_fetches.do(
+                key, lambda: _fetch_snapshot(app, spreadsheet_id, spreadsheet_tab)
+            ),
+            ttl=app.config.get('SHEETS_CACHE_TTL', 0),
+            stale_ttl=app.config.get('SHEETS_CACHE_STALE_TTL', 0)
+        )
 
-        values = result.get('values', [])
 
-        if not values:
-            return []
+def refresh_sheet_snapshot(spreadsheet_tab='General'):
+    """
+    Fetch a tab from the Sheets API, bypassing and then updating the cache.
 
-        # Skip the header row (first row)
-        data_rows = values[1:] if len(values) > 1 else []
+    Args:
+        spreadsheet_tab: The tab name in the spreadsheet
 
-        # Ensure each row has 2 columns
-        movies = []
-        for row in data_rows:
-            if len(row) == 0:
-                continue
-            if len(row) == 1:
-                movies.append((row[0], ''))
-            else:
-                movies.append((row[0], row[1]))
+    Returns:
+        SheetSnapshot for the tab
+
+    Raises:
+        SheetsUnavailableError: If the Sheets API request fails
+    """
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    spreadsheet_id = app.config.get('GOOGLE_SPREADSHEET_ID')
+
+    with timed('sheets'):
+        snapshot = _fetch_snapshot(app, spreadsheet_id, spreadsheet_tab)
+    _sheet_cache.put((spreadsheet_id, spreadsheet_tab), snapshot)
+    return snapshot
 
-        return movies
 
-    except HttpError as err:
-        print(f"Error fetching from Google Sheets: {err}")
-        return []
+def refresh_sheet_snapshots(spreadsheet_tabs):
+    """
+    Fetch several tabs in one request, bypassing and then updating the cache.
+
+    The Sheets API fails a whole batch when one of its ranges is invalid,
+    e.g. because a tab was renamed or deleted. The tabs are then fetched
+    one request each, and those that still fail are left out.
+
+    Args:
+        spreadsheet_tabs: List of tab names in the spreadsheet
+
+    Returns:
+        Dictionary mapping tab name to SheetSnapshot, without tabs that
+        could not be read
+
+    Raises:
+        SheetsUnavailableError: If none of the tabs can be read
+    """
+    if not spreadsheet_tabs:
+        return {}
+
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    spreadsheet_id = app.config.get('GOOGLE_SPREADSHEET_ID')
+
+    with timed('sheets'):
+        try:
+            snapshots = _fetch_snapshots(app, spreadsheet_id, list(spreadsheet_tabs))
+        except SheetsUnavailableError:
+            snapshots = _fetch_each_snapshot(app, spreadsheet_id, spreadsheet_tabs)
+    for tab, snapshot in snapshots.items():
+        _sheet_cache.put((spreadsheet_id, tab), snapshot)
+    return snapshots
+
+
+def get_movies_from_sheet(spreadsheet_tab='General'):
+    """
+    Fetch movies and participants from Google Sheets.
+
+    Args:
+        spreadsheet_tab: The tab name in the spreadsheet
+
+    Returns:
+        List of tuples (movie_title, participant_name)
+    """
+    return list(get_sheet_snapshot(spreadsheet_tab).movies)
+
+
+def get_sheet_cache_stats():
+    """Return hit/miss counters and entry ages for the Sheets cache."""
+    stats = _sheet_cache.stats()
+    stats['fetches'] = _sheet_fetches.stats()
+    return stats
+
+
+def clear_sheet_cache():
+    """Drop every cached sheet tab."""
+    _sheet_cache.invalidate()
 
 
 def get_participants_from_sheet(spreadsheet_tab='General'):
@@ -89,30 +405,18 @@ def get_participants_from_sheet(spreadsheet_tab='General'):
     Returns:
         List of unique participant names
     """
-    movies = get_movies_from_sheet(spreadsheet_tab)
-    participants = set()
+    return list(get_sheet_snapshot(spreadsheet_tab).participants)
 
-    for _movie, participant in movies:
-        if participant and participant.strip():
-            participants.add(participant.strip())
 
-    return sorted(list(participants))
-
-
-def get_movies_by_participant(participant_name, spreadsheet_tab='General'):
+def get_movies_by_participant(participant_name, snapshot):
     """
     Get all movies submitted by a specific participant.
 
     Args:
         participant_name: Name of the participant
-        spreadsheet_tab: The tab name in the spreadsheet
+        snapshot: SheetSnapshot of the tab to look in
 
     Returns:
         List of movie titles
     """
-    movies = get_movies_from_sheet(spreadsheet_tab)
-    participant_movies = [
-        movie for movie, participant in movies
-        if participant.strip().upper() == participant_name.upper()
-    ]
-    return participant_movies
+    return snapshot.movies_for(participant_name)
@@ -0,0 +1,72 @@
+"""Coalescing of concurrent identical calls within a worker (single-flight)."""
+import threading
+
+
+class _Call:  # pylint: disable=too-few-public-methods
+    """One in-flight call and, once done, its result or error."""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time.
+
+    The first caller for a key runs the function; callers arriving while
+    it is still running wait for it and get the same result, or the same
+    exception. Nothing is remembered once the call finishes, so this only
+    collapses a burst of identical requests and is no substitute for a
+    cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {'calls': 0, 'shared': 0}
+
+    def do(self, key, func):
+        """
+        Return func(), sharing the call with concurrent callers using key.
+
+        Args:
+            key: Hashable identity of the call
+            func: Callable taking no arguments
+
+        Returns:
+            func's return value, possibly from another thread's call
+        """
+        with self._lock:
+            self._counters['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._counters['shared'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = func()
+            return call.value
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Return call counters and the number of calls in flight."""
+        with self._lock:
+            return {**self._counters, 'in_flight': len(self._calls)}
@@ -2,20 +2,84 @@
 
 let allRolls = [];
 let currentRollId = null;
+let nextCursor = null;
+let loadingMore = false;
+let liveEvents = null;
+
+// Fields needed to render the list; details are fetched when a roll is opened
+const LIST_FIELDS = 'id,movie_title,participant_name,roll_date,tmdb_id';
 
 // Load initial data
 document.addEventListener('DOMContentLoaded', async () => {
     await loadSeasons();
     await loadHistory();
     setupEventListeners();
+    setupInfiniteScroll();
+    liveEvents = subscribeToEvents(historyEventHandlers(), async () => {
+        await loadSeasons();
+        await loadHistory(selectedSeasonId());
+    });
 });
 
+// Update the list (and an open roll) in place as rolls change
+function historyEventHandlers() {
+    const isOpen = (rollId) => rollId === currentRollId
+        && document.getElementById('rollModal').style.display === 'flex';
+    const updateRoll = (roll) => {
+        const item = historyItem(roll.id);
+        if (item) {
+            item.outerHTML = historyItemHtml(roll);
+            bindHistoryItems();
+        }
+        if (isOpen(roll.id)) {
+            renderRollDetails(roll);
+        }
+    };
+    
+    return {
+        roll_created: (roll) => {
+            const seasonId = selectedSeasonId();
+            if ((seasonId && roll.season_id !== seasonId) || historyItem(roll.id)) return;
+            allRolls.unshift(roll);
+            if (allRolls.length === 1) {
+                displayHistory(allRolls);
+            } else {
+                document.getElementById('historyList')
+                    .insertAdjacentHTML('afterbegin', historyItemHtml(roll));
+                bindHistoryItems();
+            }
+        },
+        roll_updated: updateRoll,
+        roll_enriched: updateRoll,
+        roll_deleted: (data) => {
+            allRolls = allRolls.filter(roll => roll.id !== data.roll_id);
+            const item = historyItem(data.roll_id);
+            if (item) item.remove();
+            if (isOpen(data.roll_id)) {
+                document.getElementById('rollModal').style.display = 'none';
+            }
+        },
+        roster_reset: () => loadHistory(selectedSeasonId()),
+        seasons_changed: loadSeasons
+    };
+}
+
+// The list item of a roll, if it is shown
+function historyItem(rollId) {
+    return document.querySelector(`.history-item[data-roll-id="${rollId}"]`);
+}
+
 // Load seasons for filter
 async function loadSeasons() {
     try {
         const seasons = await apiCall('/api/seasons');
         const seasonFilter = document.getElementById('seasonFilter');
+        const selected = seasonFilter.value;
         
+        // Keep "All Seasons" and rebuild the rest
+        while (seasonFilter.options.length > 1) {
+            seasonFilter.remove(1);
+        }
         seasons.forEach(season => {
             const option = document.createElement('option');
             option.value = season.id;
@@ -25,17 +89,27 @@ async function loadSeasons() {
             }
             seasonFilter.appendChild(option);
         });
+        seasonFilter.value = selected;
         
     } catch (error) {
         showNotification('Error loading seasons: ' + error.message, 'error');
     }
 }
 
-// Load history
+// Build the rolls endpoint for a page of history
+function historyEndpoint(seasonId, cursor) {
+    const params = new URLSearchParams({ fields: LIST_FIELDS });
+    if (seasonId) params.set('season_id', seasonId);
+    if (cursor) params.set('cursor', cursor);
+    return `/api/rolls?${params}`;
+}
+
+// Load the first page of history
 async function loadHistory(seasonId = null) {
     try {
-        const endpoint = seasonId ? `/api/rolls?season_id=${seasonId}` : '/api/rolls';
-        allRolls = await apiCall(endpoint);
+        const page = await apiCall(historyEndpoint(seasonId));
+        allRolls = page.rolls;
+        nextCursor = page.next_cursor;
         
         displayHistory(allRolls);
         
@@ -44,26 +118,80 @@ async function loadHistory(seasonId = null) {
     }
 }
 
-// Display history
-function displayHistory(rolls) {
-    const historyList = document.getElementById('historyList');
+// Load the next page of history and append it
+async function loadMoreHistory() {
+    if (!nextCursor || loadingMore) return;
     
-    if (rolls.length === 0) {
-        historyList.innerHTML = '<p>No rolls found.</p>';
-        return;
+    loadingMore = true;
+    try {
+        const page = await apiCall(historyEndpoint(selectedSeasonId(), nextCursor));
+        allRolls = allRolls.concat(page.rolls);
+        nextCursor = page.next_cursor;
+        
+        appendHistoryItems(page.rolls);
+        
+    } catch (error) {
+        showNotification('Error loading history: ' + error.message, 'error');
+    } finally {
+        loadingMore = false;
     }
+}
+
+// Currently selected season filter
+function selectedSeasonId() {
+    const seasonFilter = document.getElementById('seasonFilter');
+    return seasonFilter.value ? parseInt(seasonFilter.value) : null;
+}
+
+// Load more history when the end of the list scrolls into view
+function setupInfiniteScroll() {
+    const sentinel = document.getElementById('historySentinel');
+    const observer = new IntersectionObserver((entries) => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadMoreHistory();
+        }
+    }, { rootMargin: '200px' });
     
-    historyList.innerHTML = rolls.map(roll => `
+    observer.observe(sentinel);
+}
+
+// Render one history item
+function historyItemHtml(roll) {
+    return `
         <div class="history-item" data-roll-id="${roll.id}">
             <h3>${roll.movie_title}</h3>
             <p><strong>Participant:</strong> ${roll.participant_name}</p>
             <p><strong>Date:</strong> ${formatDate(roll.roll_date)}</p>
-            ${roll.tmdb_data ? '<p>✓ TMDB data available</p>' : ''}
+            ${roll.tmdb_id ? '<p>✓ TMDB data available</p>' : ''}
         </div>
-    `).join('');
+    `;
+}
+
+// Display history
+function displayHistory(rolls) {
+    const historyList = document.getElementById('historyList');
     
-    // Add click handlers
-    document.querySelectorAll('.history-item').forEach(item => {
+    if (rolls.length === 0) {
+        historyList.innerHTML = '<p>No rolls found.</p>';
+        return;
+    }
+    
+    historyList.innerHTML = '';
+    appendHistoryItems(rolls);
+}
+
+// Append history items and wire up their click handlers
+function appendHistoryItems(rolls) {
+    const historyList = document.getElementById('historyList');
+    historyList.insertAdjacentHTML('beforeend', rolls.map(historyItemHtml).join(''));
+    bindHistoryItems();
+}
+
+// Wire up click handlers of history items added since the last call
+function bindHistoryItems() {
+    const historyList = document.getElementById('historyList');
+    historyList.querySelectorAll('.history-item:not([data-bound])').forEach(item => {
+        item.dataset.bound = 'true';
         item.addEventListener('click', () => {
             const rollId = parseInt(item.dataset.rollId);
             showRollDetails(rollId);
@@ -76,51 +204,53 @@ async function showRollDetails(rollId) {
     try {
         const roll = await apiCall(`/api/rolls/${rollId}`);
         currentRollId = rollId;
-        
-        const modal = document.getElementById('rollModal');
-        const detailsDiv = document.getElementById('rollDetails');
-        
-        let detailsHtml = `
-            <p><strong>Movie:</strong> ${roll.movie_title}</p>
-            <p><strong>Participant:</strong> ${roll.participant_name}</p>
-            <p><strong>Date:</strong> ${formatDate(roll.roll_date)}</p>
-        `;
-        
-        if (roll.tmdb_data) {
-            const data = roll.tmdb_data;
-            detailsHtml += `
-                <div class="movie-details">
-                    ${data.poster_url ? `<img src="${data.poster_url}" alt="${data.title} poster">` : ''}
-                    <h3>${data.title}</h3>
-                    ${data.release_date ? `<p><strong>Release Date:</strong> ${data.release_date}</p>` : ''}
-                    ${data.runtime ? `<p><strong>Runtime:</strong> ${data.runtime} minutes</p>` : ''}
-                    ${data.genres && data.genres.length > 0 ? `<p><strong>Genres:</strong> ${data.genres.join(', ')}</p>` : ''}
-                    ${data.vote_average ? `<p><strong>Rating:</strong> ${data.vote_average}/10</p>` : ''}
-                    ${data.overview ? `<p><strong>Overview:</strong> ${data.overview}</p>` : ''}
-                </div>
-            `;
-        } else {
-            detailsHtml += '<p><em>No TMDB data available. Click "Fetch TMDB Data" to retrieve it.</em></p>';
-        }
-        
-        if (roll.notes) {
-            detailsHtml += `<p><strong>Notes:</strong> ${roll.notes}</p>`;
-        }
-        
-        detailsDiv.innerHTML = detailsHtml;
-        modal.style.display = 'flex';
+        renderRollDetails(roll);
+        document.getElementById('rollModal').style.display = 'flex';
         
     } catch (error) {
         showNotification('Error loading roll details: ' + error.message, 'error');
     }
 }
 
+// Render a roll's details into the modal
+function renderRollDetails(roll) {
+    const detailsDiv = document.getElementById('rollDetails');
+    
+    let detailsHtml = `
+        <p><strong>Movie:</strong> ${roll.movie_title}</p>
+        <p><strong>Participant:</strong> ${roll.participant_name}</p>
+        <p><strong>Date:</strong> ${formatDate(roll.roll_date)}</p>
+    `;
+    
+    if (roll.tmdb_data) {
+        const data = roll.tmdb_data;
+        detailsHtml += `
+            <div class="movie-details">
+                ${data.poster_url ? `<img src="${data.poster_thumb_url || data.poster_url}" alt="${data.title} poster">` : ''}
+                <h3>${data.title}</h3>
+                ${data.release_date ? `<p><strong>Release Date:</strong> ${data.release_date}</p>` : ''}
+                ${data.runtime ? `<p><strong>Runtime:</strong> ${data.runtime} minutes</p>` : ''}
+                ${data.genres && data.genres.length > 0 ? `<p><strong>Genres:</strong> ${data.genres.join(', ')}</p>` : ''}
+                ${data.vote_average ? `<p><strong>Rating:</strong> ${data.vote_average}/10</p>` : ''}
+                ${data.overview ? `<p><strong>Overview:</strong> ${data.overview}</p>` : ''}
+            </div>
+        `;
+    } else {
+        detailsHtml += '<p><em>No TMDB data available. Click "Fetch TMDB Data" to retrieve it.</em></p>';
+    }
+    
+    if (roll.notes) {
+        detailsHtml += `<p><strong>Notes:</strong> ${roll.notes}</p>`;
+    }
+    
+    detailsDiv.innerHTML = detailsHtml;
+}
+
 // Setup event listeners
 function setupEventListeners() {
     // Season filter
-    document.getElementById('seasonFilter').addEventListener('change', (e) => {
-        const seasonId = e.target.value ? parseInt(e.target.value) : null;
-        loadHistory(seasonId);
+    document.getElementById('seasonFilter').addEventListener('change', () => {
+        loadHistory(selectedSeasonId());
     });
     
     // Modal close
@@ -159,10 +289,10 @@ async function deleteRoll() {
         
         document.getElementById('rollModal').style.display = 'none';
         
-        // Reload history
-        const seasonFilter = document.getElementById('seasonFilter');
-        const seasonId = seasonFilter.value ? parseInt(seasonFilter.value) : null;
-        await loadHistory(seasonId);
+        // Reload history, unless roll_deleted already removed it
+        if (!eventsConnected(liveEvents)) {
+            await loadHistory(selectedSeasonId());
+        }
         
         showNotification('Roll deleted successfully!', 'success');
         
@@ -180,19 +310,27 @@ async function enrichRoll() {
     enrichButton.textContent = 'Fetching...';
     
     try {
-        await apiCall(`/api/rolls/${currentRollId}/enrich`, {
+        let result = await apiCall(`/api/rolls/${currentRollId}/enrich`, {
             method: 'POST'
         });
         
+        if (result.enrichment_status === 'pending') {
+            result = await waitForEnrichment(currentRollId);
+        }
+        
         // Reload roll details
         await showRollDetails(currentRollId);
         
-        // Reload history to show updated indicator
-        const seasonFilter = document.getElementById('seasonFilter');
-        const seasonId = seasonFilter.value ? parseInt(seasonFilter.value) : null;
-        await loadHistory(seasonId);
+        // Reload history to show updated indicator, unless roll_enriched did
+        if (!eventsConnected(liveEvents)) {
+            await loadHistory(selectedSeasonId());
+        }
         
-        showNotification('Movie details fetched successfully!', 'success');
+        if (result.tmdb_data) {
+            showNotification('Movie details fetched successfully!', 'success');
+        } else {
+            showNotification('Could not fetch movie details', 'error');
+        }
         
     } catch (error) {
         showNotification('Error fetching movie details: ' + error.message, 'error');
@@ -1,28 +1,109 @@
 // Main JavaScript utilities and shared functions
 
-// API helper function
+// Bodies of GET responses by endpoint, with the ETag they were sent with
+const etagCache = new Map();
+
+// Idempotency-Key of each idempotent request not yet answered, by method,
+// endpoint and body, so retrying it after a failure cannot repeat it
+const idempotencyKeys = new Map();
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// API helper function. GET requests revalidate earlier responses with
+// If-None-Match, and a 304 reuses the cached body. Pass idempotent: true
+// to send an Idempotency-Key that is reused until the server answers with
+// anything but 409 or 5xx.
 async function apiCall(endpoint, options = {}) {
     try {
+        const { idempotent, ...fetchOptions } = options;
+        const method = (options.method || 'GET').toUpperCase();
+        const cached = method === 'GET' ? etagCache.get(endpoint) : undefined;
+        const requestId = `${method} ${endpoint} ${options.body || ''}`;
+        if (idempotent && !idempotencyKeys.has(requestId)) {
+            idempotencyKeys.set(requestId, newIdempotencyKey());
+        }
         const response = await fetch(endpoint, {
+            ...fetchOptions,
             headers: {
                 'Content-Type': 'application/json',
+                ...(cached ? { 'If-None-Match': cached.etag } : {}),
+                ...(idempotent ? { 'Idempotency-Key': idempotencyKeys.get(requestId) } : {}),
                 ...options.headers
-            },
-            ...options
+            }
         });
         
+        if (response.status === 304 && cached) {
+            return cached.data;
+        }
+        
+        if (idempotent && response.status !== 409 && response.status < 500) {
+            idempotencyKeys.delete(requestId);
+        }
+        
         if (!response.ok) {
             const error = await response.json();
             throw new Error(error.error || 'API request failed');
         }
         
-        return await response.json();
+        const data = await response.json();
+        const etag = response.headers.get('ETag');
+        if (method === 'GET' && etag) {
+            etagCache.set(endpoint, { etag, data });
+        }
+        return data;
     } catch (error) {
         console.error('API Error:', error);
         throw error;
     }
 }
 
+// Live updates from /api/events. handlers maps event names (roll_created,
+// roll_updated, roll_enriched, roll_deleted, roster_reset, seasons_changed)
+// to callbacks taking the event data. resync is called when the stream
+// reconnects or the server reports missed events, to reload the page's
+// data; GETs are revalidated with ETags, so unchanged data costs a 304.
+function subscribeToEvents(handlers, resync) {
+    if (!window.EventSource) return null;
+    
+    const source = new EventSource('/api/events');
+    let opened = false;
+    source.addEventListener('open', () => {
+        // Events sent before this connection, or while it was down, were missed
+        if (opened) resync();
+        opened = true;
+    });
+    source.addEventListener('resync', () => resync());
+    Object.entries(handlers).forEach(([name, handler]) => {
+        source.addEventListener(name, (e) => handler(JSON.parse(e.data)));
+    });
+    return source;
+}
+
+// Whether a live event stream is currently connected
+function eventsConnected(source) {
+    return Boolean(source) && source.readyState === EventSource.OPEN;
+}
+
+// Poll a roll until background TMDB enrichment is no longer pending.
+// Resolves with {enrichment_status, tmdb_data}.
+async function waitForEnrichment(rollId, { interval = 1000, timeout = 30000 } = {}) {
+    const deadline = Date.now() + timeout;
+    while (true) {
+        const roll = await apiCall(
+            `/api/rolls/${rollId}?fields=id,enrichment_status,tmdb_data`
+        );
+        if (roll.enrichment_status !== 'pending' || Date.now() >= deadline) {
+            return roll;
+        }
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+}
+
 // Show notification
 function showNotification(message, type = 'info') {
     // Create notification element
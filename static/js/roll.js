@@ -2,6 +2,9 @@
 
 let currentSeason = null;
 let currentRollId = null;
+let eligibleNames = [];
+let rosterNames = [];
+let liveEvents = null;
 
 // Load initial data
 document.addEventListener('DOMContentLoaded', async () => {
@@ -9,8 +12,58 @@ document.addEventListener('DOMContentLoaded', async () => {
     await loadEligibleParticipants();
     await loadSeasonRoster();
     setupEventListeners();
+    liveEvents = subscribeToEvents(rollPageEventHandlers(), reloadRollPage);
 });
 
+// Reload everything shown on the page
+async function reloadRollPage() {
+    await loadActiveSeason();
+    await loadEligibleParticipants();
+    await loadSeasonRoster();
+}
+
+// Update the page in place as anyone rolls, enriches or resets
+function rollPageEventHandlers() {
+    const inCurrentSeason = (data) => currentSeason && data.season_id === currentSeason.id;
+    const showRollDetails = (roll) => {
+        if (roll.id === currentRollId && roll.tmdb_data) {
+            displayMovieDetails(roll.tmdb_data);
+        }
+    };
+    
+    return {
+        roll_created: (roll) => {
+            if (!inCurrentSeason(roll)) return;
+            if (!rosterNames.includes(roll.participant_name)) {
+                renderRoster([...rosterNames, roll.participant_name]);
+            }
+            renderEligible(eligibleNames.filter(name => name !== roll.participant_name));
+            if (roll.id !== currentRollId) {
+                currentRollId = roll.id;
+                document.getElementById('movieDetails').style.display = 'none';
+                displayRollResult({ participant: roll.participant_name, movie: roll.movie_title });
+            }
+        },
+        roll_updated: showRollDetails,
+        roll_enriched: showRollDetails,
+        roll_deleted: async (data) => {
+            if (!inCurrentSeason(data)) return;
+            if (data.roll_id === currentRollId) {
+                document.getElementById('rollResult').style.display = 'none';
+            }
+            await loadEligibleParticipants();
+            await loadSeasonRoster();
+        },
+        roster_reset: async (data) => {
+            if (!inCurrentSeason(data)) return;
+            document.getElementById('rollResult').style.display = 'none';
+            await loadEligibleParticipants();
+            await loadSeasonRoster();
+        },
+        seasons_changed: reloadRollPage
+    };
+}
+
 // Load active season
 async function loadActiveSeason() {
     try {
@@ -37,52 +90,63 @@ async function loadActiveSeason() {
 async function loadEligibleParticipants() {
     try {
         const data = await apiCall('/api/eligible');
-        const eligibleInfo = document.getElementById('eligibleInfo');
-        
-        if (data.eligible.length === 0) {
-            eligibleInfo.innerHTML = `
-                <h3>Eligible Participants</h3>
-                <p>No eligible participants remaining this season!</p>
-            `;
-        } else {
-            eligibleInfo.innerHTML = `
-                <h3>Eligible Participants (${data.count})</h3>
-                <p>${data.eligible.join(', ')}</p>
-            `;
-        }
-        
-        // Populate checkboxes for custom selection
-        const checkboxContainer = document.getElementById('participantCheckboxes');
-        checkboxContainer.innerHTML = data.eligible.map(name => `
-            <label>
-                <input type="checkbox" name="participant" value="${name}">
-                ${name}
-            </label>
-        `).join('');
-        
+        renderEligible(data.eligible);
     } catch (error) {
         showNotification('Error loading participants: ' + error.message, 'error');
     }
 }
 
+// Render the eligible participants and their checkboxes
+function renderEligible(names) {
+    eligibleNames = names;
+    const eligibleInfo = document.getElementById('eligibleInfo');
+    
+    if (names.length === 0) {
+        eligibleInfo.innerHTML = `
+            <h3>Eligible Participants</h3>
+            <p>No eligible participants remaining this season!</p>
+        `;
+    } else {
+        eligibleInfo.innerHTML = `
+            <h3>Eligible Participants (${names.length})</h3>
+            <p>${names.join(', ')}</p>
+        `;
+    }
+    
+    // Populate checkboxes for custom selection
+    const checkboxContainer = document.getElementById('participantCheckboxes');
+    checkboxContainer.innerHTML = names.map(name => `
+        <label>
+            <input type="checkbox" name="participant" value="${name}">
+            ${name}
+        </label>
+    `).join('');
+}
+
 // Load season roster
 async function loadSeasonRoster() {
     try {
         if (!currentSeason) return;
         
         const data = await apiCall(`/api/seasons/${currentSeason.id}/roster`);
-        const rosterList = document.getElementById('rosterList');
-        
-        if (data.roster.length === 0) {
-            rosterList.innerHTML = '<li>No one selected yet</li>';
-        } else {
-            rosterList.innerHTML = data.roster.map(name => `<li>${name}</li>`).join('');
-        }
+        renderRoster(data.roster);
     } catch (error) {
         showNotification('Error loading roster: ' + error.message, 'error');
     }
 }
 
+// Render the participants already rolled this season
+function renderRoster(names) {
+    rosterNames = names;
+    const rosterList = document.getElementById('rosterList');
+    
+    if (names.length === 0) {
+        rosterList.innerHTML = '<li>No one selected yet</li>';
+    } else {
+        rosterList.innerHTML = names.map(name => `<li>${name}</li>`).join('');
+    }
+}
+
 // Setup event listeners
 function setupEventListeners() {
     // Roll type radio buttons
@@ -128,6 +192,7 @@ async function performRoll() {
         
         const result = await apiCall('/api/rolls', {
             method: 'POST',
+            idempotent: true,
             body: JSON.stringify({
                 season_id: currentSeason?.id,
                 participants: participants
@@ -137,9 +202,17 @@ async function performRoll() {
         if (result.success) {
             currentRollId = result.roll_id;
             displayRollResult(result);
-            await loadEligibleParticipants();
-            await loadSeasonRoster();
+            // With live events connected, roll_created updates the lists
+            // and roll_enriched shows the movie details
+            if (!eventsConnected(liveEvents)) {
+                await loadEligibleParticipants();
+                await loadSeasonRoster();
+            }
             showNotification('Roll successful!', 'success');
+
+            if (result.enrichment_status === 'pending' && !eventsConnected(liveEvents)) {
+                showEnrichmentWhenReady(result.roll_id);
+            }
         }
         
     } catch (error) {
@@ -163,6 +236,18 @@ function displayRollResult(result) {
     resultDiv.scrollIntoView({ behavior: 'smooth', block: 'center' });
 }
 
+// Display movie details once background enrichment of a new roll finishes
+async function showEnrichmentWhenReady(rollId) {
+    try {
+        const roll = await waitForEnrichment(rollId);
+        if (roll.tmdb_data && rollId === currentRollId) {
+            displayMovieDetails(roll.tmdb_data);
+        }
+    } catch (error) {
+        console.error('Enrichment polling failed:', error);
+    }
+}
+
 // Enrich movie with TMDB data
 async function enrichMovie() {
     if (!currentRollId) return;
@@ -172,13 +257,19 @@ async function enrichMovie() {
     enrichButton.textContent = 'Fetching...';
     
     try {
-        const result = await apiCall(`/api/rolls/${currentRollId}/enrich`, {
+        let result = await apiCall(`/api/rolls/${currentRollId}/enrich`, {
             method: 'POST'
         });
         
+        if (result.enrichment_status === 'pending') {
+            result = await waitForEnrichment(currentRollId);
+        }
+        
         if (result.tmdb_data) {
             displayMovieDetails(result.tmdb_data);
             showNotification('Movie details fetched successfully!', 'success');
+        } else {
+            showNotification('Could not fetch movie details', 'error');
         }
         
     } catch (error) {
@@ -194,7 +285,7 @@ function displayMovieDetails(data) {
     const detailsDiv = document.getElementById('movieDetails');
     
     detailsDiv.innerHTML = `
-        ${data.poster_url ? `<img src="${data.poster_url}" alt="${data.title} poster">` : ''}
+        ${data.poster_url ? `<img src="${data.poster_thumb_url || data.poster_url}" alt="${data.title} poster">` : ''}
         <h3>${data.title}</h3>
         ${data.release_date ? `<p><strong>Release Date:</strong> ${data.release_date}</p>` : ''}
         ${data.runtime ? `<p><strong>Runtime:</strong> ${data.runtime} minutes</p>` : ''}
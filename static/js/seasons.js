@@ -141,6 +141,7 @@ async function handleFormSubmit(e) {
             // Create new season
             await apiCall('/api/seasons', {
                 method: 'POST',
+                idempotent: true,
                 body: JSON.stringify(formData)
             });
             showNotification('Season created successfully!', 'success');
@@ -0,0 +1,252 @@
+"""Mirror of the Google Sheets submissions tabs in the database."""
+import hashlib
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import text
+
+from conditional_get import mark_unversioned
+from metrics import record_cache
+from models import db, Season, Submission
+from sheets_integration import (
+    SheetSnapshot,
+    get_sheet_snapshot,
+    refresh_sheet_snapshot,
+    refresh_sheet_snapshots
+)
+from versions import bump_version, get_version, SUBMISSIONS_SCOPE
+
+
+# Arbitrary key for the Postgres advisory lock that keeps gunicorn workers
+# from syncing at the same time
+SYNC_LOCK_KEY = 4_640_001
+
+
+class _SnapshotCache:
+    """Each tab's snapshot of the synced rows, with the submissions version it was read at."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, spreadsheet_tab):
+        """
+        Return the tab's snapshot, re-reading the rows only if submissions changed.
+
+        None means the tab has no synced rows.
+        """
+        version = get_version(SUBMISSIONS_SCOPE)
+        with self._lock:
+            entry = self._entries.get(spreadsheet_tab)
+        if entry is not None and entry['version'] == version:
+            record_cache('submissions', 'hits')
+            return entry['snapshot']
+        record_cache('submissions', 'misses')
+
+        rows = db.session.query(
+            Submission.row_position, Submission.movie_title, Submission.submitter
+        ).filter(
+            Submission.spreadsheet_tab == spreadsheet_tab
+        ).order_by(Submission.row_position).all()
+        snapshot = SheetSnapshot(
+            [(movie_title, submitter) for _row, movie_title, submitter in rows],
+            [row_position for row_position, _title, _submitter in rows]
+        ) if rows else None
+
+        with self._lock:
+            self._entries[spreadsheet_tab] = {'version': version, 'snapshot': snapshot}
+        return snapshot
+
+    def clear(self):
+        """Forget every cached snapshot."""
+        with self._lock:
+            self._entries.clear()
+
+
+_snapshots = _SnapshotCache()
+
+
+def content_hash(movie_title, submitter):
+    """Hash of a submission row, used to detect edited rows."""
+    return hashlib.sha1(f'{movie_title}\x1f{submitter}'.encode('utf-8')).hexdigest()
+
+
+def sync_submissions(spreadsheet_tab='General', snapshot=None):
+    """
+    Bring the submissions table in line with one sheet tab.
+
+    Rows are matched on their sheet row position, so only inserted, removed
+    or edited rows are written.
+
+    Args:
+        spreadsheet_tab: The tab name in the spreadsheet
+        snapshot: Optional freshly fetched SheetSnapshot of the tab
+
+    Returns:
+        Dictionary with the number of rows inserted, updated, deleted and
+        unchanged, plus the sync duration in milliseconds
+
+    Raises:
+        SheetsUnavailableError: If the tab cannot be read
+    """
+    started = time.perf_counter()
+    if snapshot is None:
+        snapshot = refresh_sheet_snapshot(spreadsheet_tab)
+
+    existing = {
+        submission.row_position: submission
+        for submission in Submission.query.filter_by(spreadsheet_tab=spreadsheet_tab)
+    }
+    now = datetime.utcnow()
+    inserted = updated = unchanged = 0
+
+    for row_position, movie_title, submitter in snapshot.rows():
+        row_hash = content_hash(movie_title, submitter)
+        submission = existing.pop(row_position, None)
+
+        if submission is None:
+            db.session.add(Submission(
+                spreadsheet_tab=spreadsheet_tab,
+                movie_title=movie_title,
+                submitter=submitter,
+                row_position=row_position,
+                content_hash=row_hash,
+                synced_at=now
+            ))
+            inserted += 1
+        elif submission.content_hash != row_hash:
+            submission.movie_title = movie_title
+            submission.submitter = submitter
+            submission.content_hash = row_hash
+            submission.synced_at = now
+            updated += 1
+        else:
+            unchanged += 1
+
+    for submission in existing.values():
+        db.session.delete(submission)
+
+    if inserted or updated or existing:
+        bump_version(SUBMISSIONS_SCOPE)
+        _snapshots.clear()
+    db.session.commit()
+
+    return {
+        'spreadsheet_tab': spreadsheet_tab,
+        'inserted': inserted,
+        'updated': updated,
+        'deleted': len(existing),
+        'unchanged': unchanged,
+        'rows_changed': inserted + updated + len(existing),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+def get_season_tabs(active_only=False):
+    """Return the distinct spreadsheet tabs used by any (or the active) season."""
+    query = db.session.query(Season.spreadsheet_tab).distinct()
+    if active_only:
+        query = query.filter(Season.is_active.is_(True))
+    return sorted(tab for (tab,) in query if tab)
+
+
+def _sync_tabs(tabs):
+    """Fetch every tab in one batch request and sync each of those that were read."""
+    snapshots = refresh_sheet_snapshots(tabs)
+    reports = []
+    for tab in tabs:
+        snapshot = snapshots.get(tab)
+        if snapshot is None:
+            print(f"Not syncing submissions for {tab}: the tab could not be read")
+            continue
+        reports.append(sync_submissions(tab, snapshot))
+    return reports
+
+
+def warm_season_tabs(active_only=False):
+    """
+    Load every season tab into the Sheets cache with one batch request.
+
+    Args:
+        active_only: Only warm the active season's tab
+
+    Returns:
+        Dictionary with the number of movies per tab read (tabs that could
+        not be read are left out) and the duration in
+        milliseconds
+    """
+    started = time.perf_counter()
+    snapshots = refresh_sheet_snapshots(get_season_tabs(active_only))
+    return {
+        'tabs': {tab: len(snapshot.movies) for tab, snapshot in snapshots.items()},
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+def sync_all_submissions(tabs=None):
+    """
+    Sync every season tab, one worker at a time.
+
+    All tabs are fetched with a single batch request. On Postgres an
+    advisory lock makes concurrent calls from other workers return
+    immediately instead of syncing the same tabs twice.
+
+    Args:
+        tabs: Optional list of tabs; defaults to every season's tab
+
+    Returns:
+        List of per-tab reports, without tabs that could not be read, or
+        None if another process holds the lock
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return _sync_tabs(tabs or get_season_tabs())
+
+    with db.engine.connect() as lock_conn:
+        locked = lock_conn.execute(
+            text('SELECT pg_try_advisory_lock(:key)'), {'key': SYNC_LOCK_KEY}
+        ).scalar()
+        if not locked:
+            return None
+        try:
+            return _sync_tabs(tabs or get_season_tabs())
+        finally:
+            lock_conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': SYNC_LOCK_KEY})
+
+
+def run_scheduled_sync():
+    """Background task entry point: sync all tabs and print a summary."""
+    reports = sync_all_submissions()
+    if reports is None:
+        return
+    for report in reports:
+        if report['rows_changed']:
+            print(f"Synced submissions for {report['spreadsheet_tab']}: "
+                  f"{report['rows_changed']} rows changed in {report['duration_ms']} ms")
+
+
+def get_submission_snapshot(spreadsheet_tab='General'):
+    """
+    Get an indexed snapshot of a tab's submissions.
+
+    Reads the synced copy when SUBMISSIONS_SOURCE is 'database' and the tab
+    has been synced, otherwise falls back to Google Sheets. Each worker
+    keeps the snapshot built from the synced rows and only reads them again
+    after a sync changed any tab, so a call costs one primary key lookup of
+    the submissions version. Change versions do not cover a never-synced
+    tab, so such a fallback keeps the response from being given an ETag.
+
+    Args:
+        spreadsheet_tab: The tab name in the spreadsheet
+
+    Returns:
+        SheetSnapshot for the tab
+    """
+    if current_app.config.get('SUBMISSIONS_SOURCE') == 'database':
+        snapshot = _snapshots.get(spreadsheet_tab)
+        if snapshot is not None:
+            return snapshot
+        mark_unversioned()
+
+    return get_sheet_snapshot(spreadsheet_tab)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Sync the Google Sheets submissions tabs into the database."""
+
+import argparse
+import os
+import sys
+
+# Scripts share the web app's setup but must not start its background threads
+os.environ.setdefault('BACKGROUND_TASKS', 'false')
+
+# pylint: disable=wrong-import-position
+from app import app
+from sheet_cache import SheetsUnavailableError
+from submissions import sync_all_submissions
+
+
+def main():
+    """Main sync function."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--tab', action='append', dest='tabs',
+        help='Spreadsheet tab to sync (repeatable, defaults to every season tab)'
+    )
+    args = parser.parse_args()
+
+    with app.app_context():
+        try:
+            reports = sync_all_submissions(args.tabs)
+        except SheetsUnavailableError as e:
+            print(f"✗ Could not read Google Sheets: {e}")
+            sys.exit(1)
+
+    if reports is None:
+        print("Another process is already syncing submissions.")
+        return
+
+    total_changed = 0
+    for report in reports:
+        total_changed += report['rows_changed']
+        print(f"✓ {report['spreadsheet_tab']}: "
+              f"+{report['inserted']} ~{report['updated']} -{report['deleted']} "
+              f"({report['unchanged']} unchanged) in {report['duration_ms']} ms")
+
+    print(f"\n🎉 Sync complete: {total_changed} rows changed across {len(reports)} tabs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Fixtures running the app in its testing config.
+
+app.py builds the app when it is imported, so the environment is set up
+here, before any test imports it: a scratch SQLite database, the
+submissions mirror as the roll source, and the benchmark stand-ins in
+place of Google Sheets and TMDB. TMDB_API_KEY stays empty (no
+enrichment) unless a test uses the tmdb_enabled fixture.
+
+Tests that need Postgres (its planner or row locks) use postgres_app,
+built on the scratch database in TEST_POSTGRES_URL, and are skipped when
+it is unset or unreachable. Everything in its public schema is dropped.
+"""
+import os
+import tempfile
+
+import pytest
+
+from benchmarks.stand_ins import FakeSheetsServer, FakeTMDBServer, make_sheet_rows
+
+TAB = 'General'
+PARTICIPANTS = 10
+
+sheets = FakeSheetsServer({TAB: make_sheet_rows(participants=PARTICIPANTS, submissions=200)})
+tmdb = FakeTMDBServer(movies=200)
+sheets.start()
+tmdb.start()
+
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL', '')
+
+_scratch = tempfile.mkdtemp()
+os.environ.update({
+    'FLASK_ENV': 'testing',
+    'DATABASE_URL': 'sqlite:///' + os.path.join(_scratch, 'test.db'),
+    'ADMIN_TOKEN': '',
+    'SUBMISSIONS_SOURCE': 'database',
+    'GOOGLE_SHEETS_ENDPOINT': sheets.url,
+    'TMDB_API_KEY': '',
+    'TMDB_BASE_URL': tmdb.url,
+    'TMDB_RATE_LIMIT': '0',
+    'IMAGE_SOURCE_URL': tmdb.image_url,
+    'IMAGE_CACHE_DIR': os.path.join(_scratch, 'images'),
+    'PROFILE_DIR': os.path.join(_scratch, 'profiles'),
+})
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The app, talking to the stand-in Sheets server."""
+    # pylint: disable=import-outside-toplevel
+    from google.auth.credentials import AnonymousCredentials
+
+    from app import app as flask_app
+    from sheets_integration import reset_sheets_service
+
+    with flask_app.app_context():
+        reset_sheets_service(AnonymousCredentials())
+    return flask_app
+
+
+def _empty_database():
+    """
+    Delete every row but the schema migrations and change versions.
+
+    Rows are deleted the way the app would delete them, bumping change
+    versions, so the per-worker caches notice. The change versions
+    themselves are kept so they keep increasing from test to test.
+    """
+    # pylint: disable=import-outside-toplevel
+    from active_season import seasons_changed
+    from models import db, ChangeVersion, SchemaMigration, Season
+    from season_roster import roster_changed
+    from versions import bump_version, rolls_changed, SUBMISSIONS_SCOPE
+
+    kept = {SchemaMigration.__tablename__, ChangeVersion.__tablename__}
+    season_ids = [season_id for (season_id,) in db.session.query(Season.id)]
+    for table in reversed(db.metadata.sorted_tables):
+        if table.name not in kept:
+            db.session.execute(table.delete())
+    seasons_changed()
+    rolls_changed(*season_ids)
+    bump_version(SUBMISSIONS_SCOPE)
+    for season_id in season_ids:
+        roster_changed(season_id)
+    db.session.commit()
+
+
+@pytest.fixture(scope='session')
+def migrated_postgres_app(app):  # pylint: disable=redefined-outer-name
+    """A second app on the TEST_POSTGRES_URL database, emptied and migrated."""
+    # pylint: disable=import-outside-toplevel
+    from flask import Flask
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import OperationalError
+
+    from database import init_db
+
+    if not POSTGRES_URL:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+    engine = create_engine(POSTGRES_URL)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text('DROP SCHEMA public CASCADE'))
+            conn.execute(text('CREATE SCHEMA public'))
+    except OperationalError as err:
+        pytest.skip(f'Postgres is not available: {err}')
+    finally:
+        engine.dispose()
+
+    pg_app = Flask(__name__)
+    pg_app.config.from_mapping(app.config)
+    pg_app.config['SQLALCHEMY_DATABASE_URI'] = POSTGRES_URL
+    init_db(pg_app)
+    return pg_app
+
+
+@pytest.fixture
+def postgres_app(migrated_postgres_app):  # pylint: disable=redefined-outer-name
+    """
+    The Postgres app with its database emptied.
+
+    It has no routes (they are registered on app.app), so tests call the
+    app's functions inside its app context.
+    """
+    with migrated_postgres_app.app_context():
+        _empty_database()
+    return migrated_postgres_app
+
+
+@pytest.fixture
+def client(app):
+    """A test client against an emptied database with the Sheets tab synced."""
+    # pylint: disable=import-outside-toplevel
+    from sheets_integration import clear_sheet_cache
+    from submissions import sync_all_submissions
+
+    with app.app_context():
+        _empty_database()
+        clear_sheet_cache()
+        sync_all_submissions([TAB])
+    yield app.test_client()
+    sheets.reset_hits()
+    tmdb.reset_hits()
+
+
+@pytest.fixture
+def seeded(app, client):  # pylint: disable=redefined-outer-name,unused-argument
+    """
+    Two finished seasons and a half-rolled active one, all on the synced tab.
+
+    Returns:
+        Dictionary with the IDs of the past and active seasons
+    """
+    # pylint: disable=import-outside-toplevel
+    from active_season import seasons_changed
+    from models import db, Participant, Roll, Season
+    from season_roster import roster_changed
+    from versions import rolls_changed
+
+    with app.app_context():
+        participants = [Participant(name=f'Participant {i:03d}') for i in range(PARTICIPANTS)]
+        seasons = [Season(name=f'Season {i}', spreadsheet_tab=TAB, is_active=i == 2)
+                   for i in range(3)]
+        db.session.add_all(participants + seasons)
+        db.session.flush()
+        for season in seasons:
+            rolled = participants if not season.is_active else participants[:PARTICIPANTS // 2]
+            db.session.add_all(
+                Roll(season_id=season.id, participant_id=participant.id,
+                     movie_title=f'Movie {season.id:02d}{i:03d} (2000)')
+                for i, participant in enumerate(rolled)
+            )
+            roster_changed(season.id)
+        rolls_changed(*(season.id for season in seasons))
+        seasons_changed()
+        db.session.commit()
+        return {'past_season_ids': [seasons[0].id, seasons[1].id],
+                'active_season_id': seasons[2].id}
+
+
+@pytest.fixture
+def tmdb_enabled(app):
+    """
+    Enrich against the TMDB stand-in, inline since ENRICHMENT_WORKERS is 0.
+
+    The shared TMDB client is reset on both sides, so it reads the key
+    from the config and later tests do not reuse its connections.
+    """
+    # pylint: disable=import-outside-toplevel
+    from tmdb_integration import reset_tmdb_client
+
+    app.config['TMDB_API_KEY'] = 'test'
+    reset_tmdb_client()
+    yield tmdb
+    app.config['TMDB_API_KEY'] = ''
+    reset_tmdb_client()
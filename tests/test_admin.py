@@ -0,0 +1,23 @@
+"""Access to the /api/admin/* endpoints."""
+import pytest
+
+PATH = '/api/admin/tmdb-client'
+
+
+@pytest.fixture
+def admin_token(app):
+    """Configure an ADMIN_TOKEN for the duration of a test."""
+    app.config['ADMIN_TOKEN'] = 'secret'
+    yield 'secret'
+    app.config['ADMIN_TOKEN'] = ''
+
+
+def test_admin_api_is_disabled_without_a_token(client):
+    assert client.get(PATH).status_code == 503
+    assert client.get(PATH, headers={'X-Admin-Token': ''}).status_code == 503
+
+
+def test_admin_api_requires_the_token(client, admin_token):
+    assert client.get(PATH).status_code == 403
+    assert client.get(PATH, headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.get(PATH, headers={'X-Admin-Token': admin_token}).status_code == 200
@@ -0,0 +1,124 @@
+"""
+No participant is rolled twice in a season, however rolls race.
+
+On the SQLite test database there is no season row lock, so concurrent
+POST /api/rolls requests are kept apart by the unique (season_id,
+participant_id) index and perform_roll's retries alone. On Postgres the
+season row lock serializes them.
+"""
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from conftest import PARTICIPANTS, TAB
+from models import db, Participant, Roll, Season
+from roll_logic import perform_roll
+from season_roster import roster_changed
+from sheets_integration import SheetSnapshot
+
+THREADS = 8
+# Roll requests per season, enough to use up every participant under races
+REQUESTS = 3 * PARTICIPANTS
+
+
+def _create_seasons(app, count):
+    with app.app_context():
+        seasons = [Season(name=f'Stress {i}', spreadsheet_tab=TAB, is_active=i == 0)
+                   for i in range(count)]
+        db.session.add_all(seasons)
+        db.session.commit()
+        return [season.id for season in seasons]
+
+
+def _fire(season_ids, roll):
+    """Call roll(season_id) REQUESTS times per season from THREADS threads at once."""
+    local = threading.local()
+    barrier = threading.Barrier(THREADS)
+
+    def call(season_id):
+        if not getattr(local, 'started', False):
+            local.started = True
+            barrier.wait()
+        return roll(season_id)
+
+    jobs = [season_ids[n % len(season_ids)] for n in range(REQUESTS * len(season_ids))]
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        return Counter(executor.map(call, jobs))
+
+
+def _assert_everyone_rolled_once(app, season_ids):
+    with app.app_context():
+        per_pair = Counter(db.session.query(Roll.season_id, Roll.participant_id)
+                           .filter(Roll.season_id.in_(season_ids)))
+    assert max(per_pair.values()) == 1
+    per_season = Counter(season_id for season_id, _participant in per_pair)
+    assert per_season == {season_id: PARTICIPANTS for season_id in season_ids}
+
+
+def test_concurrent_roll_requests(app, client):  # pylint: disable=unused-argument
+    season_ids = _create_seasons(app, 2)
+    local = threading.local()
+
+    def roll(season_id):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        try:
+            return local.client.post('/api/rolls', json={'season_id': season_id}).status_code
+        except Exception:  # pylint: disable=broad-except
+            # The test client re-raises unhandled errors; count them as a 500
+            return 500
+
+    statuses = _fire(season_ids, roll)
+
+    assert set(statuses) <= {201, 400, 409}, statuses
+    _assert_everyone_rolled_once(app, season_ids)
+
+
+def test_concurrent_rolls_under_the_season_lock(postgres_app):
+    season_ids = _create_seasons(postgres_app, 2)
+    snapshot = SheetSnapshot([(f'Movie {n}', f'Participant {n:03d}')
+                              for n in range(PARTICIPANTS)])
+
+    def roll(season_id):
+        with postgres_app.app_context():
+            result = perform_roll(season_id, snapshot=snapshot)
+        return 'conflict' if result.get('conflict') else result.get('error', 'rolled')
+
+    # The roster cache is per process; drop anything cached for these
+    # season IDs by the SQLite app, before and after
+    with postgres_app.app_context():
+        for season_id in season_ids:
+            roster_changed(season_id)
+        db.session.commit()
+    try:
+        outcomes = _fire(season_ids, roll)
+    finally:
+        with postgres_app.app_context():
+            for season_id in season_ids:
+                roster_changed(season_id)
+            db.session.commit()
+
+    # The lock leaves no races to lose
+    assert outcomes == {'rolled': 2 * PARTICIPANTS,
+                        'No eligible participants available': 2 * (REQUESTS - PARTICIPANTS)}
+    _assert_everyone_rolled_once(postgres_app, season_ids)
+
+
+def test_duplicate_roll_is_rejected(app, client):  # pylint: disable=unused-argument
+    (season_id,) = _create_seasons(app, 1)
+    with app.app_context():
+        participant = Participant(name='Participant 000')
+        db.session.add(participant)
+        db.session.flush()
+        db.session.add(Roll(season_id=season_id, participant_id=participant.id,
+                            movie_title='Movie 00000 (2000)'))
+        db.session.commit()
+
+        db.session.add(Roll(season_id=season_id, participant_id=participant.id,
+                            movie_title='Movie 00001 (2000)'))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
@@ -0,0 +1,26 @@
+"""ETags and 304 responses of GET /api/eligible."""
+from models import db, Submission
+from versions import bump_version, SUBMISSIONS_SCOPE
+
+PATH = '/api/eligible'
+
+
+def test_synced_tab_is_revalidated(client, seeded):  # pylint: disable=unused-argument
+    response = client.get(PATH)
+    etag = response.headers['ETag']
+
+    assert client.get(PATH, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_unsynced_tab_is_not_tagged(app, client, seeded):  # pylint: disable=unused-argument
+    # The tab then falls back to Google Sheets, which no change version covers
+    with app.app_context():
+        Submission.query.delete()
+        bump_version(SUBMISSIONS_SCOPE)
+        db.session.commit()
+
+    response = client.get(PATH)
+
+    assert response.status_code == 200
+    assert response.get_json()['count'] == 5
+    assert 'ETag' not in response.headers
@@ -0,0 +1,101 @@
+"""Enriching a roll without holding a transaction or overwriting edits."""
+import pytest
+
+from models import db, Roll
+
+MANUAL_DATA = {'tmdb_id': 42, 'title': 'Picked by hand'}
+
+
+@pytest.fixture
+def pending_roll_id(app, seeded):
+    """ID of an active-season roll waiting for enrichment."""
+    # pylint: disable=import-outside-toplevel
+    from enrichment import ENRICHMENT_PENDING
+
+    with app.app_context():
+        roll = Roll.query.filter_by(season_id=seeded['active_season_id']).first()
+        roll.enrichment_status = ENRICHMENT_PENDING
+        db.session.commit()
+        return roll.id
+
+
+def _lookup(edit=None):
+    """Stand-in for enrich_movie_data, applying edit to the roll mid-lookup."""
+    calls = []
+
+    def lookup(title, tmdb_id=None):
+        calls.append(db.session().in_transaction())
+        if edit:
+            edit()
+        return {'tmdb_id': 7, 'title': title}
+
+    return lookup, calls
+
+
+def test_lookup_runs_outside_a_transaction(app, pending_roll_id, monkeypatch):
+    # pylint: disable=import-outside-toplevel
+    from enrichment import enrich_roll, ENRICHMENT_DONE
+
+    lookup, calls = _lookup()
+    monkeypatch.setattr('enrichment.enrich_movie_data', lookup)
+    with app.app_context():
+        assert enrich_roll(pending_roll_id) == ENRICHMENT_DONE
+        assert db.session.get(Roll, pending_roll_id).tmdb_id == 7
+    assert calls == [False]
+
+
+def test_edit_during_lookup_is_kept(app, pending_roll_id, monkeypatch):
+    # pylint: disable=import-outside-toplevel
+    from enrichment import enrich_roll, ENRICHMENT_DONE
+
+    def edit():
+        with app.app_context():
+            roll = db.session.get(Roll, pending_roll_id)
+            roll.tmdb_id = MANUAL_DATA['tmdb_id']
+            roll.tmdb_data = MANUAL_DATA
+            roll.enrichment_status = ENRICHMENT_DONE
+            db.session.commit()
+
+    lookup, _calls = _lookup(edit)
+    monkeypatch.setattr('enrichment.enrich_movie_data', lookup)
+    with app.app_context():
+        assert enrich_roll(pending_roll_id) == ENRICHMENT_DONE
+        roll = db.session.get(Roll, pending_roll_id)
+        assert (roll.tmdb_id, roll.tmdb_data) == (MANUAL_DATA['tmdb_id'], MANUAL_DATA)
+
+
+def test_backfill_skips_rolls_queued_meanwhile(app, seeded, monkeypatch):  # pylint: disable=unused-argument
+    # pylint: disable=import-outside-toplevel
+    from enrichment import backfill_enrichment, ENRICHMENT_PENDING
+
+    with app.app_context():
+        first = db.session.query(Roll).order_by(Roll.id).first()
+        queued_id, queued_title = first.id, first.movie_title
+
+    def lookup(title, tmdb_id=None):  # pylint: disable=unused-argument
+        if title == queued_title:
+            # POST /api/rolls/<id>/enrich while the backfill looks it up
+            with app.app_context():
+                db.session.get(Roll, queued_id).enrichment_status = ENRICHMENT_PENDING
+                db.session.commit()
+        return None
+
+    monkeypatch.setattr('enrichment.enrich_movie_data', lookup)
+    with app.app_context():
+        report = backfill_enrichment(limit=3, concurrency=1)
+
+        assert (report['enriched'], report['failed'], report['skipped']) == (0, 2, 1)
+        assert db.session.get(Roll, queued_id).enrichment_status == ENRICHMENT_PENDING
+
+
+def test_inline_enrichment_failure_is_not_polled(app, seeded, tmdb_enabled, monkeypatch):  # pylint: disable=unused-argument
+    # ENRICHMENT_WORKERS is 0, so the request enriches before responding
+    monkeypatch.setattr('enrichment.enrich_movie_data', lambda title, tmdb_id=None: None)
+    with app.app_context():
+        roll_id = Roll.query.filter_by(season_id=seeded['active_season_id']).first().id
+
+    response = app.test_client().post(f'/api/rolls/{roll_id}/enrich')
+
+    assert response.status_code == 200
+    assert 'Location' not in response.headers
+    assert response.get_json()['enrichment_status'] == 'failed'
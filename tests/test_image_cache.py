@@ -0,0 +1,110 @@
+"""The /images route and the image cache behind it."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import tmdb
+from db_instrumentation import assert_max_queries
+
+POSTER = '/poster.jpg'
+URL = f'/images/w342{POSTER}'
+
+
+def _image_downloads():
+    return sum(hits for path, hits in tmdb.hits.items() if path.startswith('/t/p/'))
+
+
+@pytest.fixture
+def linked_poster(app, seeded):
+    """Link POSTER from an enriched roll of the active season."""
+    # pylint: disable=import-outside-toplevel
+    from image_cache import image_url, POSTER_SIZE, POSTER_THUMB_SIZE
+    from models import db, Roll
+    from versions import rolls_changed
+
+    with app.app_context():
+        roll = Roll.query.filter_by(season_id=seeded['active_season_id']).first()
+        roll.tmdb_data = {'title': 'Poster',
+                          'poster_url': image_url(POSTER, POSTER_SIZE),
+                          'poster_thumb_url': image_url(POSTER, POSTER_THUMB_SIZE)}
+        rolls_changed(roll.season_id)
+        db.session.commit()
+
+
+def test_unlinked_images_are_redirected_to_tmdb(client):
+    response = client.get(URL)
+
+    assert response.status_code == 302
+    assert response.location == f'{tmdb.image_url}/w342{POSTER}'
+    assert _image_downloads() == 0
+
+
+@pytest.mark.usefixtures('linked_poster')
+def test_linked_images_are_downloaded_once(client):
+    first = client.get(URL)
+    second = client.get(URL)
+
+    assert first.status_code == second.status_code == 200
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert _image_downloads() == 1
+
+
+def test_link_check_is_kept_between_misses(client):
+    client.get(URL)
+
+    with assert_max_queries(2) as counter:
+        response = client.get('/images/w342/other.jpg')
+    assert response.status_code == 302
+    # The image cache entry and the rolls version; no payload scan
+    assert not [statement for statement in counter.statements if 'FROM rolls' in statement]
+
+
+@pytest.mark.usefixtures('linked_poster')
+def test_download_runs_outside_a_transaction(client, monkeypatch):
+    # pylint: disable=import-outside-toplevel
+    import image_cache
+    from models import db
+
+    download = image_cache._download  # pylint: disable=protected-access
+    in_transaction = []
+
+    def tracked_download(size, path):
+        in_transaction.append(db.session().in_transaction())
+        return download(size, path)
+
+    monkeypatch.setattr(image_cache, '_download', tracked_download)
+    assert client.get(URL).status_code == 200
+    assert in_transaction == [False]
+
+
+def test_pruned_file_is_redirected_to_tmdb(client, monkeypatch):
+    monkeypatch.setattr('app.get_cached_image',
+                        lambda size, path: ('/nonexistent/image', 'image/jpeg', 'hash'))
+
+    response = client.get(URL)
+
+    assert response.status_code == 302
+    assert response.location == f'{tmdb.image_url}/w342{POSTER}'
+
+
+def test_prune_evicts_least_recently_used_in_batches(app, client, monkeypatch):  # pylint: disable=unused-argument
+    # pylint: disable=import-outside-toplevel
+    from image_cache import prune_image_cache
+    from models import db, ImageCacheEntry
+
+    monkeypatch.setattr('image_cache.PRUNE_BATCH_SIZE', 2)
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add_all(
+            ImageCacheEntry(size='w342', source_path=f'/{i}.jpg', content_hash=f'{i:064d}',
+                            content_type='image/jpeg', byte_size=100,
+                            last_accessed_at=now - timedelta(hours=5 - i))
+            for i in range(5)
+        )
+        db.session.commit()
+
+        result = prune_image_cache(max_bytes=150)
+
+        assert result['evicted'] == 4
+        assert result['bytes'] == 100
+        assert [entry.source_path for entry in ImageCacheEntry.query] == ['/4.jpg']
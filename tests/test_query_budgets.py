@@ -0,0 +1,102 @@
+"""
+SQL statements per request on the hot endpoints.
+
+The testing config makes every @query_budget strict, so a view going over
+its own budget fails the request. The limits here cover the whole request
+with cold per-worker caches, including the change-version reads of
+conditional GETs and the active season lookup, and must not grow
+with the number of rolls: the seeded seasons hold 25 rolls, so an N+1
+query shows up as dozens of statements.
+"""
+import pytest
+
+from db_instrumentation import (
+    QueryBudgetExceeded, _slow_query, assert_max_queries, query_budget
+)
+from models import db, Roll, Season
+
+HISTORY_FIELDS = 'id,movie_title,participant_name,roll_date,tmdb_id'
+# POST /api/rolls, and the TMDB cache and roll updates of enriching it
+ROLL_QUERIES = 14
+INLINE_ENRICHMENT_QUERIES = 9
+WARM_ELIGIBLE_QUERIES = 4
+
+
+def _get(client, path, max_queries):
+    with assert_max_queries(max_queries):
+        response = client.get(path)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def test_history(client, seeded):
+    past = seeded['past_season_ids'][0]
+
+    assert len(_get(client, '/api/rolls', 2)['rolls']) == 25
+    assert _get(client, f'/api/rolls?season_id={past}', 2)['rolls'][0]['participant_name']
+    _get(client, f'/api/rolls?fields={HISTORY_FIELDS}', 2)
+    assert len(_get(client, f'/api/seasons/{past}/roster', 3)['roster']) == 10
+
+
+def test_eligible(client, seeded):
+    assert _get(client, '/api/eligible', 8)['count'] == 5
+    assert _get(client, f"/api/eligible?season_id={seeded['active_season_id']}", 8)['count'] == 5
+
+
+def test_eligible_reuses_the_submissions_snapshot(client, seeded):  # pylint: disable=unused-argument
+    _get(client, '/api/eligible', 8)
+
+    # Warm: the change versions, the season and the roster and submissions
+    # versions; the submissions rows are not read again
+    with assert_max_queries(WARM_ELIGIBLE_QUERIES) as counter:
+        response = client.get('/api/eligible')
+    assert response.status_code == 200
+    assert not [statement for statement in counter.statements if 'FROM submissions' in statement]
+
+
+def test_roll(client, seeded):
+    for body in ({}, {'season_id': seeded['active_season_id']}):
+        with assert_max_queries(ROLL_QUERIES):
+            response = client.post('/api/rolls', json=body)
+        assert response.status_code == 201, response.get_data(as_text=True)
+
+    assert _get(client, '/api/eligible', 8)['count'] == 3
+
+
+def test_roll_with_inline_enrichment(app, client, seeded, tmdb_enabled):  # pylint: disable=unused-argument
+    # The view's own budget still holds (strict in testing); enrichment run
+    # inline is left out of it but counts here
+    for _ in range(2):
+        with assert_max_queries(ROLL_QUERIES + INLINE_ENRICHMENT_QUERIES):
+            response = client.post('/api/rolls', json={})
+        assert response.status_code == 201, response.get_data(as_text=True)
+
+        with app.app_context():
+            roll = db.session.get(Roll, response.get_json()['roll_id'])
+            assert roll.enrichment_status in ('done', 'failed')
+
+
+def test_strict_budget_fails_the_request(app):
+    @query_budget(1)
+    def two_queries():
+        db.session.query(Season).all()
+        db.session.query(Season).all()
+
+    with app.test_request_context('/'):
+        with pytest.raises(QueryBudgetExceeded):
+            two_queries()
+
+
+def test_assert_max_queries_lists_statements(app):
+    with app.app_context(), pytest.raises(QueryBudgetExceeded, match='FROM seasons'):
+        with assert_max_queries(0):
+            db.session.query(Season).all()
+
+
+def test_slow_query_log_leaves_out_parameters(app, caplog, monkeypatch):
+    monkeypatch.setitem(_slow_query, 'seconds', 1e-9)
+    with app.app_context(), caplog.at_level('WARNING', logger='db_instrumentation'):
+        db.session.query(Season).filter_by(name='Secret title').all()
+
+    assert 'Slow query' in caplog.text
+    assert 'Secret title' not in caplog.text
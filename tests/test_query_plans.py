@@ -0,0 +1,106 @@
+"""
+The hot roll and season queries use the indexes added for them.
+
+Runs EXPLAIN on the queries behind the history, roster, eligibility and
+active-season lookups over a seeded database: the test SQLite database,
+and Postgres when TEST_POSTGRES_URL is set (after ANALYZE, so its planner
+sees realistic table sizes).
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Participant, Roll, Season
+
+SEASONS = 40
+PARTICIPANTS = 600
+ROLLS = 20000
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def database_app(request):
+    """The app on a seeded database of each kind."""
+    if request.param == 'sqlite':
+        request.getfixturevalue('client')
+        app = request.getfixturevalue('app')
+    else:
+        app = request.getfixturevalue('postgres_app')
+    with app.app_context():
+        _seed()
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+    return app
+
+
+def _seed():
+    """Insert seasons, participants and rolls into the emptied database."""
+    rng = random.Random(1)
+    start = datetime(2015, 1, 1)
+    db.session.execute(db.insert(Season), [
+        {'name': f'Season {i}', 'spreadsheet_tab': f'Tab {i}', 'is_active': i == SEASONS - 1,
+         'start_date': start, 'created_at': start + timedelta(days=i)}
+        for i in range(SEASONS)
+    ])
+    db.session.execute(db.insert(Participant), [
+        {'name': f'Participant {i:03d}', 'created_at': start} for i in range(PARTICIPANTS)
+    ])
+    season_ids = [i for (i,) in db.session.query(Season.id)]
+    participant_ids = [i for (i,) in db.session.query(Participant.id)]
+    # Each participant is rolled at most once per season
+    pairs = rng.sample([(s, p) for s in season_ids for p in participant_ids], ROLLS)
+    db.session.execute(db.insert(Roll), [
+        {'season_id': season_id, 'participant_id': participant_id,
+         'movie_title': f'Movie {i}', 'roll_date': start + timedelta(hours=i),
+         'created_at': start + timedelta(hours=i)}
+        for i, (season_id, participant_id) in enumerate(pairs)
+    ])
+    db.session.commit()
+
+
+def _hot_queries():
+    """
+    (name, statement, acceptable index names, small table) for each hot query.
+
+    Postgres rightly scans small tables sequentially, so for those the test
+    only checks that the index can serve the query.
+    """
+    season_id = db.session.query(Season.id).filter_by(is_active=True).scalar()
+    return [
+        ('history_by_season',
+         db.select(Roll).filter_by(season_id=season_id)
+         .order_by(Roll.roll_date.desc(), Roll.id.desc()).limit(51),
+         {'ix_rolls_season_roll_date'}, False),
+        ('history_all',
+         db.select(Roll).order_by(Roll.roll_date.desc(), Roll.id.desc()).limit(51),
+         {'ix_rolls_roll_date'}, False),
+        ('rolled_participants',
+         db.select(Participant.name).join(Roll).where(Roll.season_id == season_id)
+         .order_by(Roll.roll_date, Roll.id),
+         {'uq_rolls_season_participant', 'ix_rolls_season_roll_date'}, False),
+        ('active_season',
+         db.select(Season).filter_by(is_active=True).limit(1),
+         {'uq_seasons_single_active'}, True),
+    ]
+
+
+def _explain(statement, small_table):
+    """The query plan of statement as text."""
+    sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text(f"SET enable_seqscan = {'off' if small_table else 'on'}"))
+        return '\n'.join(row[0] for row in db.session.execute(db.text(f'EXPLAIN {sql}')))
+    rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))
+    return '\n'.join(row[-1] for row in rows)
+
+
+def test_hot_queries_use_their_indexes(database_app):
+    with database_app.app_context():
+        plans = {name: (_explain(statement, small_table), indexes)
+                 for name, statement, indexes, small_table in _hot_queries()}
+        db.session.rollback()
+
+    missing = {name: plan for name, (plan, indexes) in plans.items()
+               if not any(index in plan for index in indexes)}
+    assert not missing, missing
@@ -0,0 +1,56 @@
+"""
+Concurrent identical Sheets and TMDB fetches share one upstream request.
+
+Each burst releases its threads together through a barrier while the
+stand-in answers slowly, so every call misses the empty cache while the
+first fetch is still in flight.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import TAB, sheets
+from sheets_integration import clear_sheet_cache, get_sheet_snapshot
+from tmdb_integration import enrich_movie_data
+
+CALLERS = 10
+LATENCY = 0.2
+
+
+def _burst(app, func):
+    """Run func from CALLERS threads at once and return their results."""
+    barrier = threading.Barrier(CALLERS)
+
+    def call(_):
+        with app.app_context():
+            barrier.wait()
+            return func()
+
+    with ThreadPoolExecutor(CALLERS) as executor:
+        return list(executor.map(call, range(CALLERS)))
+
+
+def test_concurrent_sheet_reads_fetch_once(app):
+    with app.app_context():
+        clear_sheet_cache()
+    sheets.latency = LATENCY
+    sheets.reset_hits()
+    try:
+        snapshots = _burst(app, lambda: get_sheet_snapshot(TAB))
+    finally:
+        sheets.latency = 0.0
+
+    assert sheets.total_hits == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+
+
+def test_concurrent_enrichments_fetch_once(app, client, tmdb_enabled):  # pylint: disable=unused-argument
+    tmdb_enabled.latency = LATENCY
+    tmdb_enabled.reset_hits()
+    try:
+        results = _burst(app, lambda: enrich_movie_data('Movie 00042 (1992)'))
+    finally:
+        tmdb_enabled.latency = 0.0
+
+    assert dict(tmdb_enabled.hits) == {'/3/search/movie': 1, '/3/movie/42': 1}
+    assert results[0] is not None
+    assert all(result == results[0] for result in results)
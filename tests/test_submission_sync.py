@@ -0,0 +1,48 @@
+"""Syncing and warming several season tabs when one of them is broken."""
+import pytest
+
+from benchmarks.stand_ins import make_sheet_rows
+from conftest import TAB, sheets
+from models import db, Season, Submission
+
+EXTRA_TAB = 'Extra'
+# Renamed in the spreadsheet: the Sheets API answers 400 for its range
+MISSING_TAB = 'Renamed'
+
+
+@pytest.fixture
+def season_tabs(app, client):  # pylint: disable=unused-argument
+    """Seasons on two readable tabs and one the spreadsheet no longer has."""
+    # pylint: disable=import-outside-toplevel
+    from sheets_integration import clear_sheet_cache
+
+    sheets.tabs[EXTRA_TAB] = make_sheet_rows(participants=3, submissions=12, seed=2)
+    with app.app_context():
+        db.session.add_all(Season(name=tab, spreadsheet_tab=tab, is_active=False)
+                           for tab in (TAB, EXTRA_TAB, MISSING_TAB))
+        db.session.commit()
+        clear_sheet_cache()
+    yield
+    del sheets.tabs[EXTRA_TAB]
+
+
+@pytest.mark.usefixtures('season_tabs')
+def test_sync_skips_unreadable_tab(app):
+    # pylint: disable=import-outside-toplevel
+    from submissions import sync_all_submissions
+
+    with app.app_context():
+        reports = sync_all_submissions()
+
+        assert sorted(report['spreadsheet_tab'] for report in reports) == [EXTRA_TAB, TAB]
+        synced = {tab for (tab,) in db.session.query(Submission.spreadsheet_tab).distinct()}
+        assert synced == {EXTRA_TAB, TAB}
+
+
+@pytest.mark.usefixtures('season_tabs')
+def test_warm_up_skips_unreadable_tab(app):
+    # pylint: disable=import-outside-toplevel
+    from submissions import warm_season_tabs
+
+    with app.app_context():
+        assert sorted(warm_season_tabs()['tabs']) == [EXTRA_TAB, TAB]
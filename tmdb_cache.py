@@ -0,0 +1,178 @@
+"""Database cache of TMDB enrichment payloads shared by every worker."""
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+
+from metrics import record_cache
+from models import db, dialect_insert, TMDBCacheEntry
+
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+    record_cache('tmdb', name)
+
+
+def normalize_title(title):
+    """Case-fold a title and collapse its whitespace for use as a cache key."""
+    return ' '.join(title.casefold().split())
+
+
+def title_key(title, year=None):
+    """Cache key of a title search, optionally narrowed to a release year."""
+    key = f'title:{normalize_title(title)}'
+    return f'{key}|{year}' if year else key
+
+
+def id_key(tmdb_id):
+    """Cache key of a TMDB movie ID."""
+    return f'id:{tmdb_id}'
+
+
+def _expiry_cutoff():
+    """Entries fetched before this time are treated as missing."""
+    return datetime.utcnow() - timedelta(days=current_app.config['TMDB_CACHE_TTL_DAYS'])
+
+
+def lookup(key):
+    """
+    Return the cached payload for key, or None if missing or expired.
+
+    A hit bumps the entry's access time and hit count in the caller's
+    transaction.
+
+    Args:
+        key: Key built with title_key() or id_key()
+
+    Returns:
+        The enrichment payload dictionary or None
+    """
+    entry = TMDBCacheEntry.query.filter_by(cache_key=key).first()
+    if entry is None:
+        _count('misses')
+        return None
+    if entry.fetched_at < _expiry_cutoff():
+        _count('expired')
+        return None
+
+    _count('hits')
+    entry.last_accessed_at = datetime.utcnow()
+    entry.hit_count = TMDBCacheEntry.hit_count + 1
+    return entry.payload
+
+
+def store(payload, *keys):
+    """
+    Cache payload under each key, replacing older or expired entries.
+
+    The write joins the caller's transaction.
+
+    Args:
+        payload: Trimmed enrichment dictionary including 'tmdb_id'
+        keys: Keys built with title_key() or id_key()
+    """
+    now = datetime.utcnow()
+    for key in keys:
+        statement = dialect_insert(TMDBCacheEntry).values(
+            cache_key=key,
+            tmdb_id=payload.get('tmdb_id'),
+            payload=payload,
+            fetched_at=now,
+            last_accessed_at=now,
+            hit_count=0
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[TMDBCacheEntry.cache_key],
+            set_={
+                'tmdb_id': statement.excluded.tmdb_id,
+                'payload': statement.excluded.payload,
+                'fetched_at': now,
+                'last_accessed_at': now
+            }
+        ))
+
+
+def get_tmdb_cache_stats():
+    """
+    Get this worker's hit/miss counters and the size of the shared table.
+
+    Returns:
+        Dictionary of counters, hit ratio, entry counts and TTL settings
+    """
+    with _counters_lock:
+        counters = dict(_counters)
+    lookups = sum(counters.values())
+
+    entries, total_hits, oldest_access = db.session.query(
+        func.count(TMDBCacheEntry.id),
+        func.coalesce(func.sum(TMDBCacheEntry.hit_count), 0),
+        func.min(TMDBCacheEntry.last_accessed_at)
+    ).one()
+    expired = TMDBCacheEntry.query.filter(
+        TMDBCacheEntry.fetched_at < _expiry_cutoff()
+    ).count()
+
+    return {
+        'hits': counters.get('hits', 0),
+        'misses': counters.get('misses', 0),
+        'expired_lookups': counters.get('expired', 0),
+        'hit_ratio': round(counters.get('hits', 0) / lookups, 3) if lookups else None,
+        'entries': entries,
+        'expired_entries': expired,
+        'total_hits': total_hits,
+        'oldest_access': oldest_access.isoformat() if oldest_access else None,
+        'ttl_days': current_app.config['TMDB_CACHE_TTL_DAYS'],
+        'max_entries': current_app.config['TMDB_CACHE_MAX_ENTRIES']
+    }
+
+
+def prune_tmdb_cache(max_entries=None):
+    """
+    Delete expired entries, then the least recently used beyond max_entries.
+
+    Args:
+        max_entries: Entries to keep; defaults to TMDB_CACHE_MAX_ENTRIES
+
+    Returns:
+        Dictionary with the number of expired and evicted entries and the
+        number remaining
+    """
+    if max_entries is None:
+        max_entries = current_app.config['TMDB_CACHE_MAX_ENTRIES']
+
+    expired = TMDBCacheEntry.query.filter(
+        TMDBCacheEntry.fetched_at < _expiry_cutoff()
+    ).delete(synchronize_session=False)
+
+    evicted = 0
+    excess = TMDBCacheEntry.query.count() - max_entries
+    if excess > 0:
+        least_recent = db.session.query(TMDBCacheEntry.id)\
+            .order_by(TMDBCacheEntry.last_accessed_at, TMDBCacheEntry.id)\
+            .limit(excess)\
+            .scalar_subquery()
+        evicted = TMDBCacheEntry.query.filter(
+            TMDBCacheEntry.id.in_(least_recent)
+        ).delete(synchronize_session=False)
+
+    db.session.commit()
+    return {
+        'expired': expired,
+        'evicted': evicted,
+        'entries': TMDBCacheEntry.query.count()
+    }
+
+
+def run_scheduled_prune():
+    """Background task entry point: prune the cache and print a summary."""
+    result = prune_tmdb_cache()
+    if result['expired'] or result['evicted']:
+        print(f"Pruned TMDB cache: {result['expired']} expired, "
+              f"{result['evicted']} evicted, {result['entries']} remaining")
@@ -1,21 +1,233 @@
 """Integration with The Movie Database (TMDB) API."""
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from difflib import SequenceMatcher
+from email.utils import parsedate_to_datetime
+
 import requests
 from flask import current_app
+from requests.adapters import HTTPAdapter
+
+import tmdb_cache
+from metrics import observe_upstream, timed
+from image_cache import image_url, BACKDROP_SIZE, POSTER_SIZE, POSTER_THUMB_SIZE
+from single_flight import SingleFlight
+
+
+# Responses worth retrying: rate limited or a transient server error
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# "Alien (1979)" -> title "Alien", year 1979
+TITLE_YEAR_PATTERN = re.compile(r'^\s*(?P<title>.+?)\s*\((?P<year>\d{4})\)\s*$')
+# Search results considered when matching a title, and the title similarity
+# (0-1) below which a result is never chosen
+MATCH_CANDIDATES = 10
+MATCH_MIN_SIMILARITY = 0.6
+
+
+class TokenBucket:  # pylint: disable=too-few-public-methods
+    """
+    Thread-safe token bucket allowing ``rate`` calls per second on average
+    with bursts of up to ``capacity`` calls.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, sleeping until one is available.
+
+        Returns:
+            Seconds spent waiting
+        """
+        if self.rate <= 0:
+            return 0.0
 
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
 
-class TMDBClient:
-    """Client for interacting with TMDB API."""
+
+class RequestStats:
+    """Per-endpoint request, retry and latency counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(lambda: {
+            'requests': 0, 'errors': 0, 'retries': 0, 'throttled': 0,
+            'total_ms': 0.0, 'max_ms': 0.0, 'rate_limit_wait_ms': 0.0
+        })
+
+    def record(self, endpoint, seconds, status=None):
+        """Record one HTTP attempt; status is None for connection errors."""
+        observe_upstream('tmdb', endpoint, seconds, error=status is None or status >= 400)
+        elapsed_ms = seconds * 1000
+        with self._lock:
+            stats = self._endpoints[endpoint]
+            stats['requests'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if status is None or status >= 400:
+                stats['errors'] += 1
+            if status == 429:
+                stats['throttled'] += 1
+
+    def record_retry(self, endpoint):
+        """Record that a failed attempt is being retried."""
+        with self._lock:
+            self._endpoints[endpoint]['retries'] += 1
+
+    def record_wait(self, endpoint, seconds):
+        """Record time spent waiting on the rate limiter."""
+        with self._lock:
+            self._endpoints[endpoint]['rate_limit_wait_ms'] += seconds * 1000
+
+    def snapshot(self):
+        """Return the counters with average latency, rounded for display."""
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self._endpoints.items()}
+        for stats in endpoints.values():
+            stats['avg_ms'] = round(stats['total_ms'] / stats['requests'], 1) \
+                if stats['requests'] else None
+            for key in ('total_ms', 'max_ms', 'rate_limit_wait_ms'):
+                stats[key] = round(stats[key], 1)
+        return endpoints
+
+
+class TMDBClient:  # pylint: disable=too-many-instance-attributes
+    """
+    Client for interacting with TMDB API.
+
+    Each instance keeps a pooled HTTP session, so use the shared
+    get_tmdb_client() rather than building one per call.
+    """
 
     def __init__(self):
         self.api_key = None
         self.base_url = None
+        self.timeout = None
+        self.max_retries = None
+        self.backoff = None
+        self.max_backoff = None
+        self.rate_limiter = None
+        self.session = None
+        self.stats = RequestStats()
+        self._config_lock = threading.Lock()
 
     def _get_config(self):
-        """Get configuration from Flask app context."""
-        if not self.api_key:
-            self.api_key = current_app.config.get('TMDB_API_KEY')
-        if not self.base_url:
-            self.base_url = current_app.config.get('TMDB_BASE_URL')
+        """Get configuration from Flask app context and open the session."""
+        if self.session is not None:
+            return
+        with self._config_lock:
+            if self.session is not None:
+                return
+            config = current_app.config
+            self.api_key = config.get('TMDB_API_KEY')
+            self.base_url = config.get('TMDB_BASE_URL')
+            self.timeout = config.get('TMDB_TIMEOUT')
+            self.max_retries = config.get('TMDB_MAX_RETRIES')
+            self.backoff = config.get('TMDB_RETRY_BACKOFF')
+            self.max_backoff = config.get('TMDB_RETRY_MAX_BACKOFF')
+            self.rate_limiter = TokenBucket(
+                config.get('TMDB_RATE_LIMIT'), config.get('TMDB_RATE_BURST')
+            )
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=config.get('TMDB_POOL_SIZE'))
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({
+                'Authorization': f'Bearer {self.api_key}',
+                'accept': 'application/json'
+            })
+            self.session = session
+
+    def reset(self):
+        """Close pooled connections and clear the counters and configuration."""
+        with self._config_lock:
+            if self.session is not None:
+                self.session.close()
+            self.session = None
+            self.stats = RequestStats()
+
+    def _retry_delay(self, attempt, retry_after):
+        """
+        Seconds to wait before retry number attempt + 1.
+
+        Honors a Retry-After header (seconds or HTTP date), otherwise uses
+        exponential backoff with full jitter. Both are capped at max_backoff.
+        """
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0.0), self.max_backoff)
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _get(self, endpoint, path, params=None):
+        """
+        GET a TMDB API path, retrying rate limited and transient failures.
+
+        Args:
+            endpoint: Name the request is counted under in stats
+            path: Path below TMDB_BASE_URL
+            params: Query parameters
+
+        Returns:
+            Decoded JSON response
+
+        Raises:
+            requests.exceptions.RequestException: After the last failed attempt
+        """
+        url = f"{self.base_url}{path}"
+        attempt = 0
+        while True:
+            self.stats.record_wait(endpoint, self.rate_limiter.acquire())
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.stats.record(endpoint, time.perf_counter() - started)
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = None
+            else:
+                self.stats.record(endpoint, time.perf_counter() - started,
+                                  response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+                retry_after = response.headers.get('Retry-After')
+
+            self.stats.record_retry(endpoint)
+            time.sleep(self._retry_delay(attempt, retry_after))
+            attempt += 1
 
     def search_movie(self, title, year=None):
         """
@@ -34,11 +246,6 @@ class TMDBClient:
             print("TMDB API key not configured")
             return None
 
-        url = f"{self.base_url}/search/movie"
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'accept': 'application/json'
-        }
         params = {
             'query': title
         }
@@ -47,9 +254,7 @@ class TMDBClient:
             params['year'] = year
 
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._get('search', '/search/movie', params)
         except requests.exceptions.RequestException as e:
             print(f"Error searching TMDB: {e}")
             return None
@@ -70,19 +275,12 @@ class TMDBClient:
             print("TMDB API key not configured")
             return None
 
-        url = f"{self.base_url}/movie/{tmdb_id}"
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'accept': 'application/json'
-        }
         params = {
             'append_to_response': 'credits,videos'
         }
 
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            return response.json()
+            return self._get('details', f'/movie/{tmdb_id}', params)
         except requests.exceptions.RequestException as e:
             print(f"Error fetching movie details from TMDB: {e}")
             return None
@@ -103,42 +301,182 @@ class TMDBClient:
 
         return f"https://image.tmdb.org/t/p/{size}{poster_path}"
 
+    def trim_details(self, details):
+        """
+        Reduce a movie details response to the fields stored on a roll.
 
-# Stub functions for future implementation
-def enrich_movie_data(movie_title):
-    """
-    Stub: Fetch and return enriched movie data from TMDB.
-
-    Args:
-        movie_title: Title of the movie to enrich
-
-    Returns:
-        Dictionary with movie data or None
-    """
-    client = TMDBClient()
-    search_results = client.search_movie(movie_title)
-
-    if not search_results or not search_results.get('results'):
-        return None
-
-    # Get the first result (most relevant)
-    movie = search_results['results'][0]
-    tmdb_id = movie.get('id')
+        Image URLs point at the local image cache, with a poster thumbnail
+        for list views.
 
-    # Get detailed information
-    details = client.get_movie_details(tmdb_id)
+        Args:
+            details: Response of get_movie_details()
 
-    if details:
+        Returns:
+            Dictionary with movie data
+        """
         return {
-            'tmdb_id': tmdb_id,
+            'tmdb_id': details.get('id'),
             'title': details.get('title'),
             'overview': details.get('overview'),
             'release_date': details.get('release_date'),
-            'poster_url': client.get_movie_poster_url(details.get('poster_path')),
-            'backdrop_url': client.get_movie_poster_url(details.get('backdrop_path'), 'original'),
+            'poster_url': image_url(details.get('poster_path'), POSTER_SIZE),
+            'poster_thumb_url': image_url(details.get('poster_path'), POSTER_THUMB_SIZE),
+            'backdrop_url': image_url(details.get('backdrop_path'), BACKDROP_SIZE),
             'vote_average': details.get('vote_average'),
             'runtime': details.get('runtime'),
             'genres': [g['name'] for g in details.get('genres', [])],
         }
 
-    return None
+    def best_match(self, results, title, year=None):
+        """
+        Pick the search result that best matches a title and optional year.
+
+        Candidates are scored on title similarity (against both the title and
+        the original title), with a bonus when the release year matches and a
+        small one for TMDB's own ranking.
+
+        Args:
+            results: 'results' list of a search_movie() response
+            title: Movie title without the year
+            year: Optional release year
+
+        Returns:
+            The best result, or None if no title is similar enough
+        """
+        wanted = tmdb_cache.normalize_title(title)
+        best, best_score = None, None
+        for rank, candidate in enumerate(results[:MATCH_CANDIDATES]):
+            names = [name for name in (candidate.get('title'), candidate.get('original_title'))
+                     if name]
+            similarity = max(
+                (SequenceMatcher(None, wanted, tmdb_cache.normalize_title(name)).ratio()
+                 for name in names),
+                default=0.0
+            )
+            if similarity < MATCH_MIN_SIMILARITY:
+                continue
+
+            score = similarity - rank * 0.01
+            release_year = (candidate.get('release_date') or '')[:4]
+            if year and release_year.isdigit():
+                difference = abs(int(release_year) - year)
+                score += 0.3 if difference == 0 else 0.1 if difference == 1 else 0.0
+
+            if best_score is None or score > best_score:
+                best, best_score = candidate, score
+        return best
+
+    def enrich(self, title, tmdb_id=None):
+        """
+        Get enriched movie data, consulting the TMDB cache first.
+
+        With a known tmdb_id the search is skipped. Otherwise a trailing year
+        such as "Alien (1979)" is split off the title, the search results are
+        scored with best_match(), and only the winner's details are fetched.
+        Network results are added to the cache under both the title and the
+        TMDB ID, in the caller's transaction.
+
+        Args:
+            title: Movie title to enrich, optionally ending in "(year)"
+            tmdb_id: Optional TMDB ID known to be correct
+
+        Returns:
+            Dictionary with movie data or None
+        """
+        if tmdb_id:
+            return self._enrich_by_id(tmdb_id)
+
+        title, year = parse_title_year(title)
+        search_key = tmdb_cache.title_key(title, year)
+        cached = tmdb_cache.lookup(search_key)
+        if cached is not None:
+            return cached
+
+        search_results = self.search_movie(title)
+        if not search_results or not search_results.get('results'):
+            return None
+
+        match = self.best_match(search_results['results'], title, year)
+        if match is None:
+            return None
+
+        return self._enrich_by_id(match.get('id'), search_key)
+
+    def _enrich_by_id(self, tmdb_id, *extra_keys):
+        """Cached or fetched movie data for tmdb_id, also stored under extra_keys."""
+        id_key = tmdb_cache.id_key(tmdb_id)
+        cached = tmdb_cache.lookup(id_key)
+        if cached is not None:
+            if extra_keys:
+                tmdb_cache.store(cached, *extra_keys)
+            return cached
+
+        details = self.get_movie_details(tmdb_id)
+        if not details:
+            return None
+
+        movie_data = self.trim_details(details)
+        tmdb_cache.store(movie_data, id_key, *extra_keys)
+        return movie_data
+
+
+def parse_title_year(title):
+    """
+    Split a trailing release year off a sheet title.
+
+    Args:
+        title: Title such as "Alien (1979)"
+
+    Returns:
+        Tuple of (title, year or None)
+    """
+    match = TITLE_YEAR_PATTERN.match(title)
+    if match:
+        return match.group('title'), int(match.group('year'))
+    return title.strip(), None
+
+
+_client = TMDBClient()
+# Concurrent lookups of the same movie share one search and details fetch
+_lookups = SingleFlight()
+
+
+def get_tmdb_client():
+    """Get the TMDB client shared by this worker."""
+    return _client
+
+
+def reset_tmdb_client():
+    """Close the shared client's connections so it reconnects with current config."""
+    _client.reset()
+
+
+def get_tmdb_client_stats():
+    """
+    Get per-endpoint request, retry and latency counters of the shared
+    client, plus the enrichment lookups shared between concurrent callers
+    under 'lookups'.
+    """
+    return {**get_tmdb_client().stats.snapshot(), 'lookups': _lookups.stats()}
+
+
+def enrich_movie_data(movie_title, tmdb_id=None):
+    """
+    Fetch and return enriched movie data from TMDB.
+
+    Calls made while another thread of this worker is already looking up
+    the same movie (same TMDB ID, or same normalized title and year) wait
+    for that lookup and return its result; only that thread writes the
+    TMDB cache entries.
+
+    Args:
+        movie_title: Title of the movie to enrich
+        tmdb_id: Optional TMDB ID to fetch directly instead of searching
+
+    Returns:
+        Dictionary with movie data or None
+    """
+    key = tmdb_cache.id_key(tmdb_id) if tmdb_id \
+        else tmdb_cache.title_key(*parse_title_year(movie_title))
+    with timed('tmdb'):
+        return _lookups.do(key, lambda: get_tmdb_client().enrich(movie_title, tmdb_id))
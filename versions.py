@@ -0,0 +1,61 @@
+"""Change version counters shared by every worker through the database."""
+from datetime import datetime
+
+from models import db, dialect_insert, ChangeVersion
+
+
+# Bumped by every roll change; season_rolls_scope() narrows it to one season
+ROLLS_SCOPE = 'rolls'
+# Any synced submission row changed
+SUBMISSIONS_SCOPE = 'submissions'
+
+
+def bump_version(*scopes):
+    """
+    Increment the change version of each scope.
+
+    The update joins the caller's transaction, so other workers see the new
+    version exactly when the change itself is committed.
+
+    Args:
+        scopes: Scope names, e.g. 'seasons'
+    """
+    now = datetime.utcnow()
+    # A fixed order keeps concurrent transactions from deadlocking on the rows
+    for scope in sorted(set(scopes)):
+        statement = dialect_insert(ChangeVersion).values(
+            scope=scope, version=1, updated_at=now
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[ChangeVersion.scope],
+            set_={'version': ChangeVersion.version + 1, 'updated_at': now}
+        ))
+
+
+def get_version(scope):
+    """Return the current version of scope (0 if it never changed)."""
+    version = db.session.query(ChangeVersion.version).filter_by(scope=scope).scalar()
+    return version or 0
+
+
+def get_versions(*scopes):
+    """Return {scope: version} for scopes in one query (0 for scopes never changed)."""
+    rows = db.session.query(ChangeVersion.scope, ChangeVersion.version)\
+        .filter(ChangeVersion.scope.in_(scopes))
+    versions = dict.fromkeys(scopes, 0)
+    versions.update(rows)
+    return versions
+
+
+def season_rolls_scope(season_id):
+    """Scope bumped whenever a roll of season_id changes."""
+    return f'{ROLLS_SCOPE}:{season_id}'
+
+
+def rolls_changed(*season_ids):
+    """
+    Record a change to rolls of the given seasons in the current transaction.
+
+    Bumps the global 'rolls' scope and the scope of each season.
+    """
+    bump_version(ROLLS_SCOPE, *(season_rolls_scope(season_id) for season_id in season_ids))